@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+from urllib.parse import urlparse
+
+import aiohttp
+
+from content_fetcher import fetch_content_from_url_async, iter_article_links
+from crawl_state import CHANGED, UNCHANGED, content_hash
+from url_utils import strip_tracking_params
+from metadata_generator import generate_metadata_async, close_async_client
+from openai_batch import DeferredToBatch
+from markdown_chunker import chunk_article
+from local_metadata import local_metadata_enabled, resolve_article
+from output_writer import write_result
+from metrics import incr, observe, span, TimedIterator
+
+
+class ConcurrencyLimits:
+    """
+    Semaphores shared by every task of an async run.
+
+    - `host(url)` limits concurrent fetches of pages on the same site.
+    - `jina` and `openai` limit concurrent calls to each API.
+    """
+
+    def __init__(self, per_host: int, jina: int, openai: int):
+        self.per_host = per_host
+        self.jina = asyncio.Semaphore(jina)
+        self.openai = asyncio.Semaphore(openai)
+        self._hosts = {}
+
+    def host(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+
+async def handle_url_input_async(session, url: str, user_id: str, limits: ConcurrencyLimits, crawl_state=None,
+                                 dedup=None, feed_hints=None) -> dict | list | None:
+    """
+    Fetches a URL through Jina and enriches it with metadata, the async counterpart of main.fetch_url_document
+    followed by main.enrich_url_batch for a single article.
+
+    Args:
+        session (aiohttp.ClientSession): Shared HTTP session.
+        url (str): The URL to process.
+        user_id (str): ID of the user initiating the request.
+        limits (ConcurrencyLimits): Per-host and per-API semaphores.
+        crawl_state (CrawlState, optional): Skips articles unchanged since they were last ingested.
+        dedup (Deduplicator, optional): Skips articles already processed in this run.
+        feed_hints (content_fetcher.FeedHints, optional): Feed dates and authors found by discovery.
+
+    Returns:
+        dict: Enriched metadata dictionary with title, content, type, etc. (None if skipped),
+        or a list of chunk items with --article_chunk_size.
+    """
+    url = strip_tracking_params(url)
+    if dedup is not None and not dedup.claim_url(url):
+        print(f"Already queued, skipping: {url}")
+        return None
+
+    refresh = False
+    if crawl_state is not None:
+        # The conditional HEAD request is blocking, keep it off the event loop
+        async with limits.host(url):
+            with span("crawl_check"):
+                decision = await asyncio.to_thread(crawl_state.check, url, feed_hints.updated(url) if feed_hints is not None else None)
+        if decision == UNCHANGED:
+            print(f"Unchanged since last run, skipping: {url}")
+            return None
+        refresh = decision == CHANGED
+
+    async with limits.host(url), limits.jina:
+        content_data = await fetch_content_from_url_async(session, url, refresh=refresh)
+
+    digest = content_hash(content_data["content"])
+    if crawl_state is not None and not crawl_state.content_changed(url, digest):
+        print(f"Content unchanged since last run, skipping: {url}")
+        return None
+
+    # MinHash signatures are CPU work, keep them off the event loop
+    if dedup is not None:
+        with span("dedup"):
+            unique = await asyncio.to_thread(dedup.claim_content, content_data["source_url"], content_data["content"])
+        if not unique:
+            return None
+
+    # Meta tags and feed authors often make the LLM call unnecessary; "html" mode fetches the page, off the event loop
+    local_metadata = None
+    if local_metadata_enabled():
+        async with limits.host(url):
+            local_metadata = await asyncio.to_thread(resolve_article, content_data,
+                                                   feed_hints.author(url) if feed_hints is not None else None)
+
+    # Only articles the local tier could not resolve wait for an OpenAI slot
+    async with limits.openai if local_metadata is None else contextlib.nullcontext():
+        enriched = await generate_metadata_async(
+            markdown=content_data["content"],
+            url=content_data["source_url"],
+            title=content_data["title"],
+            published_time=content_data.get("published_time", ""),
+            local_metadata=local_metadata
+        )
+    enriched["user_id"] = user_id
+
+    if crawl_state is not None:
+        crawl_state.mark_ingested(url, digest)
+    return chunk_article(enriched)
+
+
+async def process_url_async(session, url, user_id, limits, crawl_state=None, dedup=None, feed_hints=None):
+    """
+    Wrapper for async URL processing with exception handling.
+    """
+    try:
+        print(f"Processing URL: {url}")
+        return await handle_url_input_async(session, url, user_id, limits, crawl_state, dedup, feed_hints)
+    except DeferredToBatch:
+        print(f"Metadata request deferred to the batch file, not writing: {url}")
+        return None
+    except Exception as e:
+        print(f"Failed to process URL {url}: {e}")
+        incr("errors_fetch")
+        return None
+
+
+async def run_async_pipeline(args, writer, process_local_pdf, process_gdrive_pdf, pdf_executor=None, crawl_state=None,
+                             dedup=None, feed_hints=None):
+    """
+    Runs an ingestion with asyncio instead of a thread per job.
+
+    - A producer queues URLs, PDFs and GDrive links, then streams blog index links into the queue as they are discovered.
+    - `args.max_in_flight` workers drain the bounded queue, so memory stays bounded however many URLs there are.
+    - URL jobs use aiohttp and AsyncOpenAI under the per-host and per-API semaphores; the AsyncOpenAI
+      client belongs to this run's event loop and is closed when the run ends.
+    - PDF jobs are blocking (PyMuPDF, tiktoken) and run in worker threads.
+
+    Args:
+        args: Parsed CLI arguments.
+        writer: Output writer that receives each result as soon as it is ready.
+        process_local_pdf (callable): Blocking handler for local PDF paths.
+        process_gdrive_pdf (callable): Blocking handler for Google Drive links.
+        pdf_executor (ProcessPoolExecutor, optional): Pool used to shard PDF extraction.
+        crawl_state (CrawlState, optional): With --incremental, only new or changed URLs and PDFs are ingested.
+        dedup (Deduplicator, optional): Run-wide URL and near-duplicate content filter.
+        feed_hints (content_fetcher.FeedHints, optional): Collects the job's feed dates and authors during discovery.
+    """
+    limits = ConcurrencyLimits(args.per_host_limit, args.jina_concurrency, args.openai_concurrency)
+    num_workers = max(1, args.max_in_flight)
+    queue = asyncio.Queue(maxsize=num_workers * 2)
+
+    timeout = aiohttp.ClientTimeout(total=30)
+    connector = aiohttp.TCPConnector(limit=num_workers)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+        async def producer():
+            for url in args.urls or []:
+                await queue.put(("url", url))
+            for pdf_path in args.pdfs or []:
+                await queue.put(("pdf", pdf_path))
+            for link in args.gdrive_links or []:
+                await queue.put(("gdrive", link))
+
+            # Index discovery is blocking (requests, Selenium), so each link is pulled off the event loop
+            # and queued as soon as it is discovered
+            for index_url in args.blog_indexes or []:
+                print(f"Extracting blog/article links from: {index_url}")
+                links = TimedIterator("discovery", iter_article_links(index_url, args.js_discovery, feed_hints))
+                found = 0
+                while (url := await asyncio.to_thread(next, links, None)) is not None:
+                    await queue.put(("url", url))
+                    found += 1
+                print(f"Found {found} articles")
+
+            for _ in range(num_workers):
+                await queue.put(None)
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                observe("queue_jobs", queue.qsize())
+
+                kind, value = job
+                if kind == "url":
+                    result = await process_url_async(session, value, args.user_id, limits, crawl_state, dedup, feed_hints)
+                elif kind == "pdf":
+                    result = await asyncio.to_thread(process_local_pdf, value, args.user_id, pdf_executor, crawl_state)
+                else:
+                    result = await asyncio.to_thread(process_gdrive_pdf, value, args.user_id, pdf_executor, crawl_state)
+
+                write_result(writer, result)
+
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(num_workers)))
+        finally:
+            await close_async_client()
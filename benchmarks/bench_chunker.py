@@ -0,0 +1,100 @@
+"""
+Benchmark for pdf_chunker.chunk_paragraphs_by_tokens on a synthetic 10k-paragraph corpus.
+
+Compares the incremental chunker against the original implementation (which re-encoded the
+whole growing chunk for every paragraph) and checks that both produce the same chunks.
+
+Usage:
+    python benchmarks/bench_chunker.py --paragraphs 10000 --chunk_size 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_chunker import chunk_paragraphs_by_tokens, get_encoder  # noqa: E402
+
+WORDS = (
+    "interview engineer system design hiring process candidate recruiter offer salary "
+    "algorithm graph tree array latency throughput cache queue database index shard "
+    "the a of and to in is for on with as by at from that this it be are was"
+).split()
+
+
+def build_corpus(num_paragraphs: int, seed: int = 42) -> list:
+    """
+    Builds a deterministic list of paragraphs with realistic length variation.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(num_paragraphs):
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            words = rng.choices(WORDS, k=rng.randint(4, 24))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", "!", "?", ":"]))
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def legacy_chunk_paragraphs_by_tokens(paragraphs: list, chunk_size: int = 2000) -> list:
+    """
+    The original chunker, kept here as the reference for speed and chunk boundaries.
+    """
+    enc = get_encoder()
+    chunks = []
+    current_chunk = ""
+    for para in paragraphs:
+        para_tokens = len(enc.encode(para))
+        current_tokens = len(enc.encode(current_chunk))
+        if current_tokens + para_tokens < chunk_size:
+            current_chunk += "\n\n" + para
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = para
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def time_call(fn, *args, repeat: int = 3):
+    """
+    Runs `fn` `repeat` times and returns (best seconds, last result).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the token chunker.")
+    parser.add_argument("--paragraphs", type=int, default=10000, help="Number of synthetic paragraphs.")
+    parser.add_argument("--chunk_size", type=int, default=2000, help="Max tokens per chunk.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation (best is reported).")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.paragraphs)
+    get_encoder()  # load the tokenizer outside the timed region
+
+    legacy_seconds, legacy_chunks = time_call(legacy_chunk_paragraphs_by_tokens, corpus, args.chunk_size, repeat=args.repeat)
+    new_seconds, new_chunks = time_call(chunk_paragraphs_by_tokens, corpus, args.chunk_size, repeat=args.repeat)
+
+    print(f"Paragraphs: {len(corpus)}  chunk_size: {args.chunk_size}  chunks: {len(new_chunks)}")
+    print(f"legacy:      {legacy_seconds:8.3f}s")
+    print(f"incremental: {new_seconds:8.3f}s  ({legacy_seconds / new_seconds:.1f}x faster)")
+
+    if new_chunks != legacy_chunks:
+        print("Chunk boundaries differ from the legacy chunker!")
+        sys.exit(1)
+    print("Chunk boundaries match the legacy chunker.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares two run_suite.py reports, e.g. from the main branch and from a change.
+
+Prints throughput, p50/p95 latency and peak RSS of every benchmark in both reports with the
+relative change, and exits with status 1 if any of them regressed by more than --threshold percent.
+
+Usage:
+    python benchmarks/compare_reports.py base_report.json new_report.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# (report field, label, True if higher is better)
+FIELDS = (
+    ("throughput_per_s", "throughput", True),
+    ("p50_ms", "p50 ms", False),
+    ("p95_ms", "p95 ms", False),
+    ("peak_rss_mb", "peak RSS MB", False)
+)
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change_percent(base: float, new: float) -> float | None:
+    if not base:
+        return None
+    return (new - base) / base * 100
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    """
+    Prints the comparison table.
+
+    Returns:
+        list: (benchmark, field label, change percent) of every regression above `threshold`.
+    """
+    regressions = []
+    print(f"{'benchmark':<40}{'metric':<14}{'base':>12}{'new':>12}{'change':>10}")
+    for name, new_result in new["benchmarks"].items():
+        base_result = base["benchmarks"].get(name)
+        if base_result is None or "throughput_per_s" not in base_result or "throughput_per_s" not in new_result:
+            status = new_result.get("skipped") or new_result.get("error") or "not in base report"
+            print(f"{name:<40}{status}")
+            continue
+        for field, label, higher_is_better in FIELDS:
+            change = change_percent(base_result[field], new_result[field])
+            shown = f"{change:+.1f}%" if change is not None else "n/a"
+            print(f"{name:<40}{label:<14}{base_result[field]:>12.1f}{new_result[field]:>12.1f}{shown:>10}")
+            worse = change is not None and (-change if higher_is_better else change) > threshold
+            if worse:
+                regressions.append((name, label, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("base", help="Report of the reference version.")
+    parser.add_argument("new", help="Report of the version being checked.")
+    parser.add_argument("--threshold", type=float, default=10, help="Percent change counted as a regression.")
+    args = parser.parse_args()
+
+    base = load_report(args.base)
+    new = load_report(args.new)
+    print(f"base: {base.get('commit')} ({base.get('created_at')})  new: {new.get('commit')} ({new.get('created_at')})")
+    if base.get("config") != new.get("config"):
+        print("Warning: the reports were made with different settings")
+
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%:")
+        for name, label, change in regressions:
+            print(f"  {name} {label} {change:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
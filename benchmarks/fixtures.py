@@ -0,0 +1,195 @@
+"""
+Synthetic inputs for the offline benchmark suite: PDFs of several sizes and blog indexes in
+every shape the link discovery handles (plain HTML, paginated RSS, sitemap only, JS only).
+
+Everything is generated from a seed, so two runs (or two versions of the code) see the same input.
+"""
+import hashlib
+import json
+import os
+import random
+
+import fitz  # PyMuPDF, already a dependency of pdf_chunker
+
+# Canned Jina Reader pages and LLM answers replayed by the stand-in servers
+RESPONSES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "responses.json")
+
+# Blog index variants served by the stand-in site
+SITE_VARIANTS = ("html", "rss", "sitemap", "js")
+
+# Articles per RSS page, so bigger indexes exercise feed pagination
+RSS_PAGE_SIZE = 10
+
+WORDS = (
+    "interview engineer system design hiring process candidate recruiter offer salary "
+    "algorithm graph tree array latency throughput cache queue database index shard "
+    "the a of and to in is for on with as by at from that this it be are was"
+).split()
+
+
+def load_responses() -> dict:
+    with open(RESPONSES_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthetic_paragraphs(count: int, seed) -> list:
+    """
+    Deterministic paragraphs of 1-6 sentences, different for every seed.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            words = rng.choices(WORDS, k=rng.randint(4, 24))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", "!", "?", ":"]))
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def synthetic_markdown(url: str) -> str:
+    """
+    Article body served by the Jina stand-in for a URL it has no canned page for. The text depends
+    on the URL, so the near-duplicate filter keeps every article.
+    """
+    seed = int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest()[:8], "little")
+    return "\n\n".join(synthetic_paragraphs(12, seed))
+
+
+def synthetic_items(count: int, chunks_per_document: int = 20, seed: int = 42) -> list:
+    """
+    Knowledge base items shaped like PDF chunks: every chunk of a document repeats its title,
+    author, source URL and content type, as in real outputs.
+    """
+    rng = random.Random(seed)
+    content_types = ("blog", "book", "podcast_transcript", "call_transcript", "other")
+    items = []
+    for i in range(count):
+        document = i // chunks_per_document
+        items.append({
+            "title": f"Synthetic Document {document}",
+            "content": "\n\n".join(synthetic_paragraphs(8, rng.random())),
+            "content_type": content_types[document % len(content_types)],
+            "source_url": f"https://drive.google.com/file/d/synthetic-{document}/view",
+            "author": f"Author {document % 7}",
+            "user_id": "benchmark",
+            "chunk_id": hashlib.sha256(f"{seed}-{i}".encode("utf-8")).hexdigest()[:16],
+            "position": i % chunks_per_document
+        })
+    return items
+
+
+def write_pdf(path: str, pages: int, seed: int = 42) -> str:
+    """
+    Writes a text PDF with `pages` pages of synthetic paragraphs.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = f"Synthetic Benchmark Report\n\nPage {page_number + 1}\n\n"
+        text += "\n\n".join(synthetic_paragraphs(6, rng.random()))
+        page.insert_textbox(fitz.Rect(50, 50, 545, 800), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def write_pdfs(directory: str, sizes: list) -> dict:
+    """
+    Writes one PDF per page count in `sizes`.
+
+    Returns:
+        dict: page count -> PDF path
+    """
+    os.makedirs(directory, exist_ok=True)
+    return {pages: write_pdf(os.path.join(directory, f"synthetic_{pages}p.pdf"), pages, seed=pages) for pages in sizes}
+
+
+def post_author(path: str) -> str:
+    return f"Author {sum(path.encode('utf-8')) % 7}"
+
+
+def page_meta_tags(path: str) -> dict:
+    """
+    <meta> tags Jina Reader reports for an article: every post is an og:type article, and only
+    even-numbered posts name their author, so --local_metadata on resolves about half of them.
+    """
+    tags = {"og:type": "article"}
+    number = path.rsplit("-", 1)[-1]
+    if number.isdigit() and int(number) % 2 == 0:
+        tags["author"] = post_author(path)
+    return tags
+
+
+def article_paths(variant: str, count: int) -> list:
+    return [f"/{variant}/posts/post-{i}" for i in range(count)]
+
+
+def _rss_page(base_url: str, variant: str, count: int, page: int) -> str:
+    paths = article_paths(variant, count)[(page - 1) * RSS_PAGE_SIZE:page * RSS_PAGE_SIZE]
+    items = "".join(
+        f"<item><title>Post {path.rsplit('-', 1)[1]}</title><link>{base_url}{path}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item>"
+        for path in paths
+    )
+    # The WordPress generator tag makes the fetcher page through ?paged=N
+    return (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>Benchmark feed</title>'
+        f"<generator>https://wordpress.org/?v=6.4</generator>{items}</channel></rss>"
+    )
+
+
+def _urlset(base_url: str, paths: list) -> str:
+    urls = "".join(f"<url><loc>{base_url}{path}</loc><lastmod>2024-02-01</lastmod></url>" for path in paths)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+
+def site_page(base_url: str, path: str, query: dict, articles: int):
+    """
+    Renders a page of the synthetic blog site.
+
+    - /html/: index page with plain anchor links
+    - /rss/: index page whose links only appear in its paginated RSS feed
+    - /sitemap/: index page without links; /robots.txt points at a sitemap listing them
+    - /js/: index page whose links are rendered by a script (needs Chrome to discover)
+
+    Returns:
+        tuple: (content type, body) or None for an unknown path.
+    """
+    for variant in SITE_VARIANTS:
+        if path.startswith(f"/{variant}/posts/"):
+            title = path.rsplit("/", 1)[1].replace("-", " ").title()
+            body = "".join(f"<p>{p}</p>" for p in synthetic_paragraphs(5, path))
+            # JSON-LD like most blog engines emit, found by --local_metadata html
+            json_ld = json.dumps({"@context": "https://schema.org", "@type": "BlogPosting", "headline": title,
+                                  "author": {"@type": "Person", "name": post_author(path)}})
+            head = f'<title>{title}</title><script type="application/ld+json">{json_ld}</script>'
+            return "text/html", f"<html><head>{head}</head><body><h1>{title}</h1>{body}</body></html>"
+
+    if path == "/html/":
+        links = "".join(f'<li><a href="{p}">Post {p.rsplit("-", 1)[1]}</a></li>' for p in article_paths("html", articles))
+        return "text/html", f"<html><body><h1>Blog</h1><ul>{links}</ul></body></html>"
+    if path == "/rss/":
+        return "text/html", '<html><head><link rel="alternate" type="application/rss+xml" href="/rss/feed"></head><body><h1>Blog</h1></body></html>'
+    if path == "/rss/feed":
+        page = int(query.get("paged", ["1"])[0])
+        if (page - 1) * RSS_PAGE_SIZE >= articles:
+            return None
+        return "application/rss+xml", _rss_page(base_url, "rss", articles, page)
+    if path == "/sitemap/":
+        return "text/html", "<html><body><h1>Blog</h1><p>Nothing linked here.</p></body></html>"
+    if path == "/robots.txt":
+        return "text/plain", f"User-agent: *\nSitemap: {base_url}/sitemap.xml\n"
+    if path == "/sitemap.xml":
+        return "application/xml", _urlset(base_url, article_paths("sitemap", articles))
+    if path == "/js/":
+        titles = json.dumps([f"Post {i}" for i in range(articles)])
+        script = (
+            f"const titles = {titles};"
+            "const list = document.getElementById('posts');"
+            "titles.forEach((t, i) => { const a = document.createElement('a');"
+            "a.href = '/js/posts/post-' + i; a.textContent = t; list.appendChild(a); });"
+        )
+        return "text/html", f'<html><body><h1>Blog</h1><div id="posts"></div><script>{script}</script></body></html>'
+    return None
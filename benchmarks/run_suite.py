@@ -0,0 +1,506 @@
+"""
+Offline benchmark suite: replays canned Jina/OpenAI responses and serves a synthetic blog site and
+Drive files from a local stand-in server (see standins.py), so runs need no network or API keys
+and can be compared between versions of the code.
+
+Benchmarks:
+- chunk_paragraphs_by_tokens on a synthetic corpus
+- extract_paragraphs_from_pdf on generated PDFs of each --pdf_pages size
+- extract_article_links on the html, rss, sitemap and js blog index variants (js needs Chrome)
+- writing and reading back --output_items synthetic chunk items in every --format (the read keeps one content type)
+- main.main end to end (URLs, blog indexes, local PDFs, Drive links) for each --engines engine
+- startup of `main.py --help` and of PDF-only and URL-only runs, under `python -X importtime`
+
+Each benchmark runs in its own process, so its peak RSS is its own. The report records throughput,
+p50/p95/mean latency, peak RSS and, for main, per-stage timings; diff two reports with
+compare_reports.py. End-to-end and startup runs fail when they record errors or write fewer items
+than expected, so a broken run is never reported as a fast one.
+
+The tokenizer is loaded from benchmarks/data/tiktoken (TIKTOKEN_CACHE_DIR); seed it once with
+--seed_tiktoken while online, and later runs need no network at all.
+
+Usage:
+    python benchmarks/run_suite.py --report bench_report.json
+    python benchmarks/run_suite.py --only main --latency_ms 50 --rate_limit 0.05
+    python benchmarks/run_suite.py --seed_tiktoken
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# Repo-local tiktoken cache, inherited by every child and main.py process of the suite
+TIKTOKEN_CACHE_DIR = os.path.join(BENCH_DIR, "data", "tiktoken")
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR)
+
+from output_writer import OUTPUT_FORMATS  # noqa: E402
+from fixtures import SITE_VARIANTS, load_responses, synthetic_items, synthetic_paragraphs, write_pdf, write_pdfs  # noqa: E402
+
+# Marks the child's result line among the pipeline's own output
+RESULT_MARKER = "BENCHMARK_RESULT "
+
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+# Dependencies only some code paths need; each startup benchmark fails if its run imports one it must not
+BROWSER_MODULES = ("selenium", "webdriver_manager", "markdownify")
+DISCOVERY_MODULES = ("feedparser", "bs4")
+OPTIONAL_MODULES = ("pyarrow", "zstandard")
+LLM_MODULES = ("openai", "aiohttp")  # openai loads aiohttp itself when it is installed
+STARTUP_FORBIDDEN_MODULES = {
+    "cli": BROWSER_MODULES + DISCOVERY_MODULES + OPTIONAL_MODULES + LLM_MODULES + ("fitz", "tiktoken"),
+    "pdf": BROWSER_MODULES + DISCOVERY_MODULES + OPTIONAL_MODULES,
+    "url": BROWSER_MODULES + DISCOVERY_MODULES + OPTIONAL_MODULES + ("fitz",)
+}
+
+
+class StandIns:
+    """
+    The stand-in server (standins.py), running in its own process for the length of a benchmark.
+    """
+
+    def __init__(self, args, drive_dir: str):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "standins.py"), "--articles", str(args.articles),
+             "--latency_ms", str(args.latency_ms), "--jitter_ms", str(args.jitter_ms), "--rate_limit", str(args.rate_limit),
+             "--retry_after_ms", str(args.retry_after_ms), "--seed", str(args.seed), "--drive_dir", drive_dir],
+            stdout=subprocess.PIPE, text=True
+        )
+        # Its first JSON line says where it listens (PyMuPDF may print a warning before it)
+        info = None
+        for line in self.process.stdout:
+            if line.startswith("{"):
+                info = json.loads(line)
+                break
+        if info is None:
+            self.process.wait()
+            raise RuntimeError(f"Stand-in server exited with code {self.process.returncode}")
+        self.base_url = info["base_url"]
+        self.env = info["env"]
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.base_url}/_stats") as response:
+            return json.load(response)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process and its finished children, in MB.
+    """
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def latency_stats(samples: list) -> dict:
+    return {
+        "p50_ms": percentile(samples, 0.5) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0
+    }
+
+
+def time_calls(fn, repeat: int) -> tuple:
+    """
+    Calls `fn` `repeat` times.
+
+    Returns:
+        tuple: (per-call seconds, result of the last call)
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def call_result(samples: list, items_per_call: int, unit: str) -> dict:
+    """
+    Report entry for a function benchmark: latency per call and items processed per second.
+    """
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "items_per_call": items_per_call,
+        "unit": unit,
+        "throughput_per_s": items_per_call * len(samples) / total if total else 0.0,
+        **latency_stats(samples)
+    }
+
+
+def load_encoder():
+    """
+    Loads cl100k_base from TIKTOKEN_CACHE_DIR, failing with a hint rather than a network error when it was never seeded.
+    """
+    from pdf_chunker import get_encoder
+
+    try:
+        return get_encoder()
+    except Exception as e:
+        raise RuntimeError(f"cl100k_base could not be loaded from {os.environ['TIKTOKEN_CACHE_DIR']} ({e}); "
+                           "run `python benchmarks/run_suite.py --seed_tiktoken` once with network access") from e
+
+
+def check_run(counters: dict, items: int, expected_items: int):
+    """
+    Fails a pipeline run that recorded any errors_* counter or wrote fewer than `expected_items` items.
+    """
+    errors = {name: count for name, count in counters.items() if name.startswith("errors_") and count}
+    if errors:
+        raise RuntimeError("The run recorded errors: " + ", ".join(f"{name}={count:g}" for name, count in sorted(errors.items())))
+    if items < expected_items:
+        raise RuntimeError(f"The run wrote {items} items, expected at least {expected_items}")
+
+
+def count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def bench_chunker(args, workdir, server) -> dict:
+    from pdf_chunker import chunk_paragraphs_by_tokens
+
+    corpus = synthetic_paragraphs(args.paragraphs, 42)
+    load_encoder()  # outside the timed region
+    samples, chunks = time_calls(lambda: chunk_paragraphs_by_tokens(corpus), args.repeat)
+    return dict(call_result(samples, len(corpus), "paragraphs"), chunks=len(chunks))
+
+
+def bench_pdf_extract(pages: int):
+    def run(args, workdir, server) -> dict:
+        from pdf_chunker import extract_paragraphs_from_pdf
+
+        path = write_pdf(os.path.join(workdir, f"synthetic_{pages}p.pdf"), pages, seed=pages)
+        samples, paragraphs = time_calls(lambda: extract_paragraphs_from_pdf(path), args.repeat)
+        return dict(call_result(samples, pages, "pages"), paragraphs=len(paragraphs))
+    return run
+
+
+def bench_article_links(variant: str):
+    def run(args, workdir, server) -> dict:
+        if variant == "js" and not any(shutil.which(name) for name in CHROME_BINARIES):
+            return {"skipped": "Chrome is not installed"}
+        from content_fetcher import extract_article_links
+
+        index_url = f"{server.base_url}/{variant}/"
+        samples, links = time_calls(lambda: extract_article_links(index_url), args.repeat)
+        return dict(call_result(samples, len(links), "links"), expected_links=args.articles)
+    return run
+
+
+def bench_main(engine: str):
+    def run(args, workdir, server) -> dict:
+        import main
+        import output_writer
+
+        # The same PDFs are read locally and downloaded through the Drive stand-in
+        pdfs = write_pdfs(os.path.join(workdir, "pdfs"), args.pdf_pages)
+        drive_ids = [os.path.splitext(os.path.basename(path))[0] for path in pdfs.values()]
+        out_path = os.path.join(workdir, "out.ndjson")
+        metrics_path = os.path.join(workdir, "metrics.json")
+
+        urls = [f"{server.base_url}{path}" for path in load_responses()["jina"]]
+        indexes = [f"{server.base_url}/{variant}/" for variant in ("html", "rss", "sitemap")]
+        argv = [
+            "main.py", "--team_id", "benchmark", "--user_id", "benchmark",
+            "--urls", *urls,
+            "--blog_indexes", *indexes,
+            "--pdfs", *pdfs.values(),
+            "--gdrive_links", *(f"https://drive.google.com/file/d/{file_id}/view" for file_id in drive_ids),
+            "--engine", engine, "--format", "ndjson", "--out", out_path,
+            "--no-cache", "--cache_dir", os.path.join(workdir, "cache"),
+            "--metrics_out", metrics_path, *args.main_args
+        ]
+
+        # Time each URL item from its first Jina request to the moment it is written
+        written = {}
+        original_write = output_writer.NdjsonWriter.write
+
+        def timed_write(self, item):
+            original_write(self, item)
+            written.setdefault(item.get("source_url", ""), time.monotonic())
+        output_writer.NdjsonWriter.write = timed_write
+
+        sys.argv = argv
+        start = time.perf_counter()
+        main.main()
+        seconds = time.perf_counter() - start
+
+        stats = server.stats()
+        first_requested = stats.pop("first_requested")
+        latencies = [written[url] - requested for url, requested in first_requested.items() if url in written]
+        items = count_lines(out_path)
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+        # One item per article at least, and one per local and per Drive PDF
+        check_run(metrics["counters"], items, len(urls) + len(indexes) * args.articles + 2 * len(pdfs))
+        return {
+            "seconds": seconds,
+            "items": items,
+            "unit": "items",
+            "throughput_per_s": items / seconds if seconds else 0.0,
+            "url_items": len(latencies),
+            **latency_stats(latencies),
+            "stages": {
+                name: {"count": span["count"], "p50_ms": span["p50_seconds"] * 1000, "p95_ms": span["p95_seconds"] * 1000,
+                       "total_s": span["total_seconds"]}
+                for name, span in metrics["spans"].items()
+            },
+            "counters": metrics["counters"],
+            "standins": stats
+        }
+    return run
+
+
+def parse_importtime(stderr: str) -> tuple:
+    """
+    Reads the `python -X importtime` lines of a process.
+
+    Returns:
+        tuple: (seconds spent importing, set of top-level package names imported)
+    """
+    total_us = 0
+    packages = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        # Only outermost imports count towards the total, nested ones are part of their cumulative time
+        if len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+        packages.add(name.strip().split(".")[0])
+    return total_us / 1e6, packages
+
+
+def bench_startup(path: str):
+    """
+    Runs main.py in fresh interpreters, so each one pays the full import cost of its code path.
+    """
+    def run(args, workdir, server) -> dict:
+        argv = ["--help"]
+        out_path = os.path.join(workdir, "out.ndjson")
+        metrics_path = os.path.join(workdir, "metrics.json")
+        if path != "cli":
+            argv = ["--team_id", "benchmark", "--user_id", "benchmark", "--format", "ndjson", "--out", out_path,
+                    "--no-cache", "--cache_dir", os.path.join(workdir, "cache"), "--metrics_out", metrics_path]
+        if path == "pdf":
+            argv += ["--pdfs", write_pdf(os.path.join(workdir, "startup.pdf"), 5)]
+        elif path == "url":
+            argv += ["--urls", f"{server.base_url}{next(iter(load_responses()['jina']))}"]
+
+        samples, import_samples, loaded = [], [], set()
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT_DIR, "main.py"), *argv],
+                                     cwd=workdir, env=dict(os.environ, **server.env), capture_output=True, text=True)
+            samples.append(time.perf_counter() - start)
+            if process.returncode != 0:
+                raise RuntimeError(f"main.py {' '.join(argv)} exited with code {process.returncode}")
+            if path != "cli":
+                with open(metrics_path, "r", encoding="utf-8") as f:
+                    check_run(json.load(f)["counters"], count_lines(out_path), 1)
+            import_seconds, packages = parse_importtime(process.stderr)
+            import_samples.append(import_seconds)
+            loaded |= packages
+
+        forbidden = sorted(loaded.intersection(STARTUP_FORBIDDEN_MODULES[path]))
+        if forbidden:
+            raise RuntimeError(f"The {path} code path imported {', '.join(forbidden)}")
+        import_p50_ms = percentile(import_samples, 0.5) * 1000
+        if path == "cli" and import_p50_ms > args.max_startup_ms:
+            raise RuntimeError(f"Importing main took {import_p50_ms:.0f} ms, over --max_startup_ms {args.max_startup_ms:.0f}")
+        return dict(call_result(samples, 1, "runs"), import_p50_ms=import_p50_ms,
+                    heavy_modules=sorted(loaded.intersection(STARTUP_FORBIDDEN_MODULES["cli"] + ("requests",))))
+    return run
+
+
+def _write_output(fmt: str, path: str, items: list):
+    from output_writer import open_writer
+
+    writer = open_writer(fmt, path, "benchmark")
+    for item in items:
+        writer.write(item)
+    writer.close()
+
+
+def bench_write_output(fmt: str):
+    def run(args, workdir, server) -> dict:
+        items = synthetic_items(args.output_items)
+        path = os.path.join(workdir, f"kb.{fmt}")
+        samples, _ = time_calls(lambda: _write_output(fmt, path, items), args.repeat)
+        return dict(call_result(samples, len(items), "items"), file_mb=os.path.getsize(path) / (1024 * 1024))
+    return run
+
+
+def bench_read_output(fmt: str):
+    def run(args, workdir, server) -> dict:
+        from kb_reader import iter_items
+
+        # Written once outside the timed region, and dropped from memory before reading
+        path = os.path.join(workdir, f"kb.{fmt}")
+        items = synthetic_items(args.output_items)
+        total = len(items)
+        _write_output(fmt, path, items)
+        del items
+        samples, matched = time_calls(lambda: sum(1 for _ in iter_items(path, content_type="book", fmt=fmt)), args.repeat)
+        return dict(call_result(samples, total, "items"), matched=matched)
+    return run
+
+
+def benchmarks(args) -> dict:
+    """
+    Every benchmark of the suite, by report name.
+    """
+    suite = {"chunk_paragraphs_by_tokens": bench_chunker}
+    for pages in args.pdf_pages:
+        suite[f"extract_paragraphs_from_pdf[{pages}p]"] = bench_pdf_extract(pages)
+    for variant in SITE_VARIANTS:
+        suite[f"extract_article_links[{variant}]"] = bench_article_links(variant)
+    for fmt in OUTPUT_FORMATS:
+        suite[f"write_output[{fmt}]"] = bench_write_output(fmt)
+        suite[f"read_output[{fmt}]"] = bench_read_output(fmt)
+    for engine in args.engines:
+        suite[f"main[{engine}]"] = bench_main(engine)
+    for path in STARTUP_FORBIDDEN_MODULES:
+        suite[f"startup[{path}]"] = bench_startup(path)
+    return suite
+
+
+def run_child(args):
+    """
+    Runs one benchmark in this process and prints its result after RESULT_MARKER.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        drive_dir = os.path.join(workdir, "pdfs")
+        os.makedirs(drive_dir)
+        server = StandIns(args, drive_dir)
+        try:
+            # The pipeline reads these when it is imported
+            os.environ.update(server.env)
+            baseline_rss = peak_rss_mb()
+            result = benchmarks(args)[args.child](args, workdir, server)
+            if "skipped" not in result:
+                result["peak_rss_mb"] = peak_rss_mb()
+                result["baseline_rss_mb"] = baseline_rss
+        finally:
+            server.close()
+    print(RESULT_MARKER + json.dumps(result))
+
+
+def run_benchmark(name: str, argv: list) -> dict:
+    """
+    Runs a benchmark in a child process and returns its result.
+    """
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, *argv],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    tail = "\n".join((process.stdout + process.stderr).strip().splitlines()[-15:])
+    return {"error": f"exit code {process.returncode}", "output": tail}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name: str, result: dict):
+    if "skipped" in result:
+        print(f"{name:<40} skipped: {result['skipped']}")
+    elif "error" in result:
+        print(f"{name:<40} FAILED ({result['error']})\n{result['output']}")
+    else:
+        print(f"{name:<40}{result['throughput_per_s']:>12.1f} {result['unit']}/s  p50 {result['p50_ms']:>9.1f} ms  "
+              f"p95 {result['p95_ms']:>9.1f} ms  peak RSS {result['peak_rss_mb']:>7.1f} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--report", default="bench_report.json", help="Where to write the JSON report.")
+    parser.add_argument("--only", nargs="+", help="Run only the benchmarks whose name starts with one of these.")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls per function benchmark.")
+    parser.add_argument("--paragraphs", type=int, default=10000, help="Paragraphs in the chunker corpus.")
+    parser.add_argument("--pdf_pages", type=int, nargs="+", default=[5, 50, 200], help="Page counts of the generated PDFs.")
+    parser.add_argument("--articles", type=int, default=40, help="Articles per synthetic blog index.")
+    parser.add_argument("--output_items", type=int, default=20000, help="Items written and read back by the output format benchmarks.")
+    parser.add_argument("--engines", nargs="+", choices=["threads", "async"], default=["threads", "async"], help="Engines benchmarked end to end.")
+    parser.add_argument("--latency_ms", type=float, default=20, help="Latency of each stand-in Jina and OpenAI response.")
+    parser.add_argument("--jitter_ms", type=float, default=10, help="Random extra latency, up to this much.")
+    parser.add_argument("--rate_limit", type=float, default=0.02, help="Share of Jina and OpenAI requests answered with a 429.")
+    parser.add_argument("--retry_after_ms", type=int, default=200, help="retry-after-ms sent with each injected 429.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the injected latency and 429s.")
+    parser.add_argument("--max_startup_ms", type=float, default=750, help="Fail startup[cli] if importing main takes longer than this (p50).")
+    parser.add_argument("--main_args", nargs=argparse.REMAINDER, default=[], help="Extra main.py arguments for the end-to-end runs (must come last).")
+    parser.add_argument("--seed_tiktoken", action="store_true", help="Download cl100k_base into benchmarks/data/tiktoken and exit.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+    if args.seed_tiktoken:
+        load_encoder()
+        print(f"cl100k_base is cached in {os.environ['TIKTOKEN_CACHE_DIR']}")
+        return
+
+    # Children get the same settings (--child goes first, --main_args takes the rest of the line)
+    child_argv = sys.argv[1:]
+    names = [name for name in benchmarks(args) if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {name: value for name, value in vars(args).items() if name not in ("report", "only", "child")},
+        "benchmarks": {}
+    }
+    for name in names:
+        result = run_benchmark(name, child_argv)
+        report["benchmarks"][name] = result
+        print_result(name, result)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Local stand-ins for every service a run talks to, so benchmarks need no network, API keys or quota:
+
+- /jina/<url>            Jina Reader: canned pages from data/responses.json, synthetic ones otherwise
+- /v1/chat/completions   OpenAI: canned metadata, title and clickable-text answers
+- /uc?id=<file_id>       Google Drive downloads of `<drive_dir>/<file_id>.pdf` (with Range and ETag support)
+- /_stats                request and 429 counts, and when each page was first asked of Jina
+- everything else        the synthetic blog site from fixtures.site_page
+
+Jina and OpenAI calls get a configurable latency, and a share of them can be answered with
+429 + retry-after-ms, to measure how the run copes with rate limiting.
+
+Run as a script, the server gets its own process so it does not compete with the benchmarked
+code for the GIL; it prints one JSON line with its URL and environment variables, then serves.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fixtures import SITE_VARIANTS, load_responses, page_meta_tags, site_page, synthetic_markdown
+
+
+class StandInServer:
+    """
+    One threaded HTTP server playing Jina, OpenAI, Google Drive and the blog site.
+
+    Args:
+        articles (int): Articles per blog index variant.
+        latency_ms (float): Added to every Jina and OpenAI response.
+        jitter_ms (float): Random extra latency, up to this much.
+        rate_limit (float): Share of Jina and OpenAI requests answered with a 429.
+        retry_after_ms (int): retry-after-ms sent with every 429.
+        drive_dir (str, optional): Directory of the PDFs served as Drive files.
+        seed (int): Seed for the latency jitter and 429 injection.
+    """
+
+    def __init__(self, articles: int, latency_ms: float = 0, jitter_ms: float = 0, rate_limit: float = 0.0,
+                 retry_after_ms: int = 200, drive_dir: str = None, seed: int = 0):
+        self.articles = articles
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.retry_after_ms = retry_after_ms
+        self.drive_dir = drive_dir
+        self.responses = load_responses()
+        self.requests = {}
+        self.throttled = {}
+        self.first_requested = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StandInServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def env(self) -> dict:
+        """
+        Environment variables pointing the pipeline at this server; set them before importing it.
+        """
+        return {
+            "JINA_READER_URL": f"{self.base_url}/jina",
+            "JINA_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "benchmark",
+            "GDRIVE_DOWNLOAD_URL": f"{self.base_url}/uc?id={{file_id}}"
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.requests), "throttled": dict(self.throttled),
+                    "first_requested": dict(self.first_requested)}
+
+    def _count(self, route: str) -> bool:
+        """
+        Counts a request to an API route; True if it should be answered with a 429.
+        """
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            throttle = self._rng.random() < self.rate_limit
+            if throttle:
+                self.throttled[route] = self.throttled.get(route, 0) + 1
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+        time.sleep(delay)
+        return throttle
+
+    def mark_requested(self, target_url: str):
+        """
+        Remembers when a page was first asked of Jina, the start of its per-item latency. The
+        monotonic clock is system-wide, so the benchmark process can compare it with its own.
+        """
+        with self._lock:
+            self.first_requested.setdefault(target_url, time.monotonic())
+
+    def jina_page(self, target_url: str) -> dict:
+        path = urlparse(target_url).path
+        canned = self.responses["jina"].get(path)
+        if canned is not None:
+            data = dict(canned["data"], url=target_url)
+        else:
+            title = path.rstrip("/").rsplit("/", 1)[-1].replace("-", " ").title() or "Index"
+            data = {"title": title, "url": target_url, "publishedTime": "", "content": f"# {title}\n\n{synthetic_markdown(target_url)}",
+                    "metadata": page_meta_tags(path)}
+        return {"code": 200, "status": 20000, "data": data}
+
+    def completion(self, request: dict) -> dict:
+        """
+        Answers a chat completion with the canned answer for the kind of prompt it is.
+        """
+        llm = self.responses["llm"]
+        messages = request.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        if "### Document" in prompt:
+            count = len(re.findall(r"### Document \d+", prompt))
+            content = json.dumps({"items": [dict(llm["metadata"], index=i) for i in range(count)]})
+        elif any(m.get("content") == "You are a semantic web parser." for m in messages):
+            content = json.dumps(llm["clickable_texts"])
+        elif prompt.rstrip().endswith("Title:"):
+            content = llm["title"]
+        else:
+            content = json.dumps(llm["metadata"])
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+
+def _handler_for(standins: StandInServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _throttled(self, route: str) -> bool:
+            if not standins._count(route):
+                return False
+            body = json.dumps({"error": {"message": "Rate limited by the benchmark stand-in", "type": "rate_limit"}}).encode()
+            self._send(429, body, "application/json", {"retry-after-ms": str(standins.retry_after_ms)})
+            return True
+
+        def do_HEAD(self):
+            self._get(head=True)
+
+        def do_GET(self):
+            self._get()
+
+        def _get(self, head: bool = False):
+            url = urlparse(self.path)
+            if url.path.startswith("/jina/"):
+                target = self.path[len("/jina/"):]
+                standins.mark_requested(target)
+                if self._throttled("jina"):
+                    return
+                self._send(200, json.dumps(standins.jina_page(target)).encode(), "application/json")
+                return
+
+            if url.path == "/_stats":
+                self._send(200, json.dumps(standins.stats()).encode(), "application/json")
+                return
+
+            if url.path == "/uc":
+                self._drive(parse_qs(url.query).get("id", [""])[0])
+                return
+
+            page = site_page(standins.base_url, url.path, parse_qs(url.query), standins.articles)
+            if page is None:
+                self._send(404, b"not found", "text/plain")
+                return
+            content_type, body = page
+            body = body.encode("utf-8")
+            if head:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                return
+            self._send(200, body, content_type)
+
+        def _drive(self, file_id: str):
+            path = os.path.join(standins.drive_dir or "", f"{file_id}.pdf")
+            if not standins.drive_dir or not re.fullmatch(r"[\w-]+", file_id) or not os.path.exists(path):
+                self._send(404, b"no such file", "text/plain")
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", "application/pdf", {"ETag": etag})
+                return
+            match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if match and int(match.group(1)) < len(data):
+                start = int(match.group(1))
+                self._send(206, data[start:], "application/pdf",
+                           {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}", "ETag": etag})
+                return
+            self._send(200, data, "application/pdf", {"ETag": etag})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.startswith("/v1/chat/completions"):
+                self._send(404, b"not found", "text/plain")
+                return
+            if self._throttled("openai"):
+                return
+            self._send(200, json.dumps(standins.completion(request)).encode(), "application/json")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark stand-in servers.")
+    parser.add_argument("--articles", type=int, default=40, help="Articles per blog index variant.")
+    parser.add_argument("--latency_ms", type=float, default=0, help="Latency added to Jina and OpenAI responses.")
+    parser.add_argument("--jitter_ms", type=float, default=0, help="Random extra latency, up to this much.")
+    parser.add_argument("--rate_limit", type=float, default=0.0, help="Share of Jina and OpenAI requests answered with a 429.")
+    parser.add_argument("--retry_after_ms", type=int, default=200, help="retry-after-ms sent with each 429.")
+    parser.add_argument("--drive_dir", help="Directory of the PDFs served as Drive files.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the latency jitter and 429 injection.")
+    args = parser.parse_args()
+
+    server = StandInServer(args.articles, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.rate_limit,
+                           retry_after_ms=args.retry_after_ms, drive_dir=args.drive_dir, seed=args.seed).start()
+    print(json.dumps({
+        "base_url": server.base_url,
+        "env": server.env(),
+        "blog_indexes": [f"{server.base_url}/{variant}/" for variant in SITE_VARIANTS]
+    }), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
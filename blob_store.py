@@ -0,0 +1,306 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin
+
+
+from disk_cache import DEFAULT_CACHE_DIR
+from http_client import get_session, conditional_headers, response_validators
+from metrics import incr
+
+# Drive download endpoint, overridable so a local stand-in server can be used
+GDRIVE_DOWNLOAD_URL = os.getenv("GDRIVE_DOWNLOAD_URL", "https://drive.google.com/uc?export=download&id={file_id}")
+
+# Bytes written to disk per streamed chunk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Seconds allowed between bytes of a download
+DOWNLOAD_TIMEOUT = 60
+
+# Downloads running at once, across every thread of a run
+DEFAULT_MAX_DOWNLOADS = 2
+
+# Blobs unused for this long are removed by gc()
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+
+def extract_drive_file_id(gdrive_url: str) -> str:
+    """
+    Extracts the file ID from a Google Drive link ('.../file/d/FILE_ID/view' or '...?id=FILE_ID').
+
+    Raises:
+        ValueError: If the Google Drive link is invalid or malformed.
+    """
+    match = re.search(r"/d/([\w-]+)", gdrive_url) or re.search(r"[?&]id=([\w-]+)", gdrive_url)
+    if not match:
+        raise ValueError("Invalid Google Drive link")
+    return match.group(1)
+
+
+def _file_sha256(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest
+
+
+class BlobStore:
+    """
+    Content-addressed store for downloaded Drive files.
+
+    - Blobs live in `blobs/<sha256>.pdf`; an SQLite index maps each Drive file ID to its blob,
+      so a file already fetched is not downloaded again, and identical files are stored once.
+    - A stored file is revalidated with the ETag/Last-Modified Drive sent for it: a 304 reuses the
+      blob, anything else downloads the new version.
+    - Downloads stream to `partial/<file_id>.part` in chunks and resume with a Range request
+      after an interruption. At most `max_downloads` run at once.
+    - gc() removes blobs that have not been used for a while, stale partial files, and the
+      least recently used blobs once the store exceeds its size limit.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, root: str, max_downloads: int = DEFAULT_MAX_DOWNLOADS):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.partial_dir = os.path.join(root, "partial")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        self.downloaded = 0
+        self.reused = 0
+        self._downloads = threading.Semaphore(max(1, max_downloads))
+        self._file_locks = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS refs ("
+                "file_id TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, "
+                "fetched_at REAL NOT NULL, used_at REAL NOT NULL, etag TEXT, last_modified TEXT)"
+            )
+            # Indexes written before validators were stored
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(refs)")}
+            for column in ("etag", "last_modified"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE refs ADD COLUMN {column} TEXT")
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, f"{sha256}.pdf")
+
+    def _file_lock(self, file_id: str) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(file_id, threading.Lock())
+
+    def _lookup(self, file_id: str) -> tuple | None:
+        """
+        Returns the blob path and the validators of an already fetched file and marks it as used, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, size, etag, last_modified FROM refs WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        path = self._blob_path(row[0])
+        if not os.path.exists(path) or os.path.getsize(path) != row[1]:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE refs SET used_at = ? WHERE file_id = ?", (time.time(), file_id))
+        return path, {"etag": row[2], "last_modified": row[3]}
+
+    def fetch(self, file_id: str) -> str:
+        """
+        Returns a local path to the Drive file, downloading it only if it is not in the store
+        or has changed since it was stored.
+
+        Args:
+            file_id (str): Google Drive file ID.
+
+        Returns:
+            str: Path of the blob. It stays valid until gc() removes it.
+        """
+        # Threads asking for the same file wait for one download instead of starting their own
+        with self._file_lock(file_id):
+            stored = self._lookup(file_id)
+            # Without validators a stored copy cannot be revalidated, so it is used as is
+            if stored is not None and not any(stored[1].values()):
+                self.reused += 1
+                return stored[0]
+
+            with self._downloads:
+                downloaded = self._download(file_id, stored[1] if stored is not None else None)
+            if downloaded is None:
+                self.reused += 1
+                return stored[0]
+
+            sha256, size, validators = downloaded
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO refs (file_id, sha256, size, fetched_at, used_at, etag, last_modified) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (file_id, sha256, size, now, now, validators["etag"], validators["last_modified"])
+                )
+            self.downloaded += 1
+            return self._blob_path(sha256)
+
+    def _open_download(self, file_id: str, offset: int, validators: dict = None):
+        """
+        Starts the download, following Drive's "can't scan this file for viruses" confirmation page.
+        With the validators of a stored copy, the request is conditional and may be answered with a 304.
+        """
+        session = get_session()
+        url = GDRIVE_DOWNLOAD_URL.format(file_id=file_id)
+        # Uncompressed, so Range offsets and Content-Length count bytes of the file itself
+        headers = {"Accept-Encoding": "identity", **conditional_headers(validators or {})}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        response = session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+
+        if response.status_code == 304:
+            return response
+        if response.headers.get("Content-Type", "").startswith("text/html"):
+            # Large files answer with a form that has to be submitted to get the bytes
+            from bs4 import BeautifulSoup
+
+            soup = BeautifulSoup(response.text, "html.parser")
+            form = soup.find("form", id="download-form") or soup.find("form")
+            if form is None or not form.get("action"):
+                raise ValueError(f"Drive did not return a file for {file_id} (is it shared publicly?)")
+            params = {field["name"]: field.get("value", "") for field in form.find_all("input", attrs={"name": True})}
+            response.close()
+            response = session.get(urljoin(url, form["action"]), params=params, headers=headers,
+                                   stream=True, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+        return response
+
+    def _download(self, file_id: str, validators: dict = None) -> tuple | None:
+        """
+        Streams a Drive file into the store, resuming a partial download when the server allows it.
+
+        Args:
+            file_id (str): Google Drive file ID.
+            validators (dict, optional): ETag/Last-Modified of the stored copy, to download only if it changed.
+
+        Returns:
+            tuple: (sha256 hex digest, size in bytes, validators of the new copy), or None if the
+            stored copy is still current (304 Not Modified).
+        """
+        part_path = os.path.join(self.partial_dir, f"{file_id}.part")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        response = self._open_download(file_id, offset, validators)
+        if response.status_code == 304:
+            response.close()
+            return None
+        with response:
+            # 206 continues the partial file; anything else sends the whole file again
+            if offset and response.status_code == 206:
+                print(f"Resuming Drive download {file_id} at {offset} bytes")
+                digest = _file_sha256(part_path)
+                mode = "ab"
+            else:
+                digest = hashlib.sha256()
+                offset = 0
+                mode = "wb"
+
+            expected = response.headers.get("Content-Length")
+            expected = offset + int(expected) if expected and expected.isdigit() else None
+
+            size = offset
+            with open(part_path, mode) as f:
+                for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(block)
+                    digest.update(block)
+                    size += len(block)
+        incr("gdrive_bytes", size - offset)
+
+        # A short read keeps the partial file so the next attempt resumes it
+        if expected is not None and size != expected:
+            raise IOError(f"Drive download {file_id} stopped at {size} of {expected} bytes")
+
+        sha256 = digest.hexdigest()
+        blob_path = self._blob_path(sha256)
+        if os.path.exists(blob_path):
+            os.remove(part_path)
+        else:
+            os.replace(part_path, blob_path)
+        return sha256, size, response_validators(response)
+
+    def gc(self, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS, max_bytes: int = None) -> int:
+        """
+        Removes blobs unused for `max_age_seconds`, partial downloads older than that, and the least
+        recently used blobs while the store is larger than `max_bytes`.
+
+        Returns:
+            int: Number of files removed.
+        """
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+
+        with self._lock:
+            self._conn.execute("DELETE FROM refs WHERE used_at < ?", (cutoff,))
+            rows = self._conn.execute(
+                "SELECT sha256, MAX(used_at), MAX(size) FROM refs GROUP BY sha256 ORDER BY MAX(used_at) DESC"
+            ).fetchall()
+
+            # Keep the most recently used blobs that fit in max_bytes
+            keep = set()
+            total = 0
+            for sha256, _, size in rows:
+                if max_bytes is not None and total + size > max_bytes:
+                    continue
+                keep.add(sha256)
+                total += size
+            dropped = [sha256 for sha256, _, _ in rows if sha256 not in keep]
+            self._conn.executemany("DELETE FROM refs WHERE sha256 = ?", [(sha256,) for sha256 in dropped])
+
+            # Blobs no file ID points to anymore
+            for name in os.listdir(self.blob_dir):
+                if name[:-len(".pdf")] not in keep:
+                    os.remove(os.path.join(self.blob_dir, name))
+                    removed += 1
+
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Store used by download_pdf_from_gdrive, set up by configure_blob_store()
+_blob_store = None
+_store_lock = threading.Lock()
+
+
+def configure_blob_store(store):
+    """
+    Sets the BlobStore that Drive downloads go through.
+    """
+    global _blob_store
+    with _store_lock:
+        _blob_store = store
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Returns the configured BlobStore, creating one in the default cache directory on first use.
+    """
+    global _blob_store
+    with _store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(os.path.join(DEFAULT_CACHE_DIR, "blobs"))
+        return _blob_store
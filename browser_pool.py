@@ -0,0 +1,148 @@
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+# selenium and webdriver_manager are imported where a driver is made, so importing this module
+# (e.g. for close_driver_pool) costs nothing on runs that never start Chrome
+
+# Max Chrome instances the shared pool keeps alive at once
+DEFAULT_POOL_SIZE = 4
+
+# Seconds a page is given to load before the driver gives up on it
+PAGE_LOAD_TIMEOUT = 30
+
+
+@lru_cache(maxsize=1)
+def resolve_chromedriver() -> str:
+    """
+    Locates (downloading if needed) the chromedriver binary once per process.
+
+    Returns:
+        str: Path to the chromedriver executable.
+    """
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    return ChromeDriverManager().install()
+
+
+def _chrome_options():
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    return chrome_options
+
+
+class DriverPool:
+    """
+    Bounded pool of warm headless Chrome drivers.
+
+    Drivers are started lazily, handed out one caller at a time, and returned to the pool
+    afterwards so later texts and index URLs skip Chrome's cold start. A driver that raised
+    while in use, or no longer answers when it is handed back (callers such as try_click_text
+    swallow their errors, so a crashed Chrome may come back without one), is quit and replaced
+    on the next request.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=_chrome_options())
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        return driver
+
+    @contextmanager
+    def driver(self):
+        """
+        Borrows a driver for the duration of a `with` block, waiting if all are in use.
+        """
+        self._slots.acquire()
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._create()
+
+            healthy = False
+            try:
+                yield driver
+                healthy = True
+            finally:
+                with self._lock:
+                    keep = healthy and not self._closed
+                if keep and _responsive(driver):
+                    self._idle.put(driver)
+                else:
+                    _quit(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Quits every idle driver. Drivers still in use are quit when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                _quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _responsive(driver) -> bool:
+    """
+    True if the browser behind a driver still answers commands.
+    """
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"[!] Failed to quit WebDriver: {e}")
+
+
+# Pool shared by every Selenium fallback in the process
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool(size: int = DEFAULT_POOL_SIZE) -> DriverPool:
+    """
+    Returns the shared driver pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool(size)
+            atexit.register(close_driver_pool)
+        return _pool
+
+
+def close_driver_pool():
+    """
+    Quits the shared pool's browsers, if a pool was ever created.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
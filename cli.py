@@ -1,14 +1,95 @@
 import argparse
+import importlib.util
+from output_writer import OUTPUT_FORMATS, FORMAT_DEPENDENCIES
+from disk_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+from crawl_state import DEFAULT_STATE_DIR
+from dedup import DEFAULT_THRESHOLD
+from blob_store import DEFAULT_MAX_DOWNLOADS, DEFAULT_MAX_AGE_SECONDS
 
-def parse_args():
-    parser = argparse.ArgumentParser(description="Import technical knowledge into knowledgebase format.")
+# Settings that configure process-wide state (caches, API budgets, pools, profiling) rather than one job;
+# a worker (worker.py) takes them from its own command line and shares them between all of its jobs
+RUNTIME_SETTINGS = (
+    "cache_dir", "no_cache", "cache_ttl_hours", "cache_max_mb", "jina_rpm", "openai_rpm", "openai_tpm", "max_retries",
+    "openai_batch_out", "openai_batch_results", "gdrive_downloads", "blob_max_age_days", "pdf_workers",
+    "article_chunk_size", "article_chunk_overlap", "local_metadata", "metrics_out", "profile", "profile_out"
+)
+
+
+def build_parser(add_help: bool = True) -> argparse.ArgumentParser:
+    """
+    The ingestion options, shared by main.py and the worker (which adds its own).
+    """
+    parser = argparse.ArgumentParser(description="Import technical knowledge into knowledgebase format.", add_help=add_help)
 
     parser.add_argument("--urls", nargs="*", help="List of blog/article URLs to ingest.")
     parser.add_argument("--pdfs", nargs="*", help="List of PDF file paths to process.")
     parser.add_argument("--gdrive_links", nargs="*", help="List of Google Drive links to PDFs.")
-    parser.add_argument("--team_id", required=True, help="Team ID to associate with the content.")
-    parser.add_argument("--user_id", required=True, help="User ID for comment personalization.")
+    parser.add_argument("--team_id", help="Team ID to associate with the content (required unless --resume).")
+    parser.add_argument("--user_id", help="User ID for comment personalization (required unless --resume).")
     parser.add_argument("--out", default="output.json", help="Path to save the output JSON file.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json", help="Output format: one JSON envelope, NDJSON written item by item (optionally zstd-compressed), or Parquet.")
+    parser.add_argument("--envelope", help="Only with --format ndjson: also build the JSON envelope from the NDJSON output at this path.")
     parser.add_argument("--blog_indexes", nargs="*", help="List of blog/article indexes")
+    parser.add_argument("--js_discovery", choices=("harvest", "click"), default="harvest", help="JS-rendered blog indexes: harvest all links in one page load, or click each guessed title.")
+    parser.add_argument("--pdf_workers", type=int, default=0, help="Processes used to extract PDF text in parallel page ranges (0 extracts in the calling thread).")
+    parser.add_argument("--engine", choices=("threads", "async"), default="threads", help="Run jobs in a staged thread pipeline, or with asyncio and per-host/per-API limits.")
+    parser.add_argument("--discovery_workers", type=int, default=4, help="Thread engine: blog indexes discovered at once.")
+    parser.add_argument("--fetch_workers", type=int, default=16, help="Thread engine: URLs fetched at once.")
+    parser.add_argument("--enrich_workers", type=int, default=8, help="Thread engine: metadata requests in flight at once.")
+    parser.add_argument("--pdf_concurrency", type=int, default=4, help="Thread engine: PDFs and Drive links processed at once.")
+    parser.add_argument("--queue_size", type=int, default=100, help="Thread engine: items buffered between pipeline stages.")
+    parser.add_argument("--max_in_flight", type=int, default=100, help="Async engine: max jobs in flight at once.")
+    parser.add_argument("--per_host_limit", type=int, default=4, help="Async engine: max concurrent fetches of pages on the same host.")
+    parser.add_argument("--jina_concurrency", type=int, default=10, help="Async engine: max concurrent Jina Reader requests.")
+    parser.add_argument("--openai_concurrency", type=int, default=8, help="Async engine: max concurrent OpenAI requests.")
+    parser.add_argument("--jina_rpm", type=float, default=500, help="Jina Reader requests-per-minute budget.")
+    parser.add_argument("--openai_rpm", type=float, default=500, help="OpenAI requests-per-minute budget.")
+    parser.add_argument("--openai_tpm", type=float, default=200000, help="OpenAI tokens-per-minute budget.")
+    parser.add_argument("--max_retries", type=int, default=5, help="Retries for rate-limited or timed-out Jina/OpenAI calls.")
+    parser.add_argument("--metadata_batch_size", type=int, default=1, help="Thread engine: articles whose metadata is requested in one OpenAI call (1 disables batching).")
+    parser.add_argument("--openai_batch_out", help="Write uncached OpenAI requests to this Batch API JSONL file instead of calling OpenAI.")
+    parser.add_argument("--openai_batch_results", help="Load a completed Batch API output JSONL file into the LLM cache before running.")
+    parser.add_argument("--cache_dir", "--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the persistent response caches.")
+    parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Disable the persistent response caches (Drive files are kept only for the run).")
+    parser.add_argument("--cache_ttl_hours", type=float, default=DEFAULT_TTL_SECONDS / 3600, help="Hours before a cached page is fetched again.")
+    parser.add_argument("--cache_max_mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Size limit per cache before least recently used entries are evicted.")
+    parser.add_argument("--gdrive_downloads", type=int, default=DEFAULT_MAX_DOWNLOADS, help="Google Drive files downloaded at once.")
+    parser.add_argument("--blob_max_age_days", type=float, default=DEFAULT_MAX_AGE_SECONDS / 86400, help="Days before an unused downloaded Drive file is removed from the cache directory.")
+    parser.add_argument("--dedup_threshold", type=float, default=DEFAULT_THRESHOLD, help="Estimated similarity above which a fetched page is dropped as a near-duplicate (above 1 disables it).")
+    parser.add_argument("--incremental", action="store_true", help="Only ingest URLs and PDFs that are new or changed since the team's last run; their items replace earlier ones in --out.")
+    parser.add_argument("--state_dir", default=DEFAULT_STATE_DIR, help="Directory for the per-team crawl state used by --incremental.")
+    parser.add_argument("--job_dir", help="Thread engine: record the run's progress in this directory so it can be resumed.")
+    parser.add_argument("--resume", help="Continue the job in this directory with its original arguments, skipping finished inputs.")
+    parser.add_argument("--article_chunk_size", type=int, default=0, help="Split web articles into chunks of at most this many tokens, at headings and paragraphs (0 keeps one item per article).")
+    parser.add_argument("--article_chunk_overlap", type=int, default=0, help="Tokens each article chunk repeats from the end of the previous one.")
+    parser.add_argument("--local_metadata", choices=("off", "on", "html"), default="off", help="Take author and content type from meta tags, RSS entries and PDF properties when they are reliable, asking the LLM only for the rest (html: also download article pages for their JSON-LD).")
+    parser.add_argument("--metrics_out", help="Write stage timings and counters to this file: JSON, or Prometheus textfile format if it ends in .prom.")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="Profile the run with cProfile or pyinstrument (pip install pyinstrument).")
+    parser.add_argument("--profile_out", help="Save the profile here (cProfile stats file or pyinstrument HTML) instead of printing its top entries.")
+    return parser
+
+
+def check_args(parser: argparse.ArgumentParser, args, require_team: bool = True):
+    """
+    Checks the combinations argparse cannot express, exiting through parser.error.
+    """
+    if require_team and not args.resume and (not args.team_id or not args.user_id):
+        parser.error("--team_id and --user_id are required unless --resume is given")
+    if args.format in FORMAT_DEPENDENCIES:
+        module, package = FORMAT_DEPENDENCIES[args.format]
+        if importlib.util.find_spec(module) is None:
+            parser.error(f"--format {args.format} needs `pip install {package}`")
+    if args.envelope and args.format != "ndjson":
+        parser.error("--envelope is built from an uncompressed NDJSON output, use it with --format ndjson")
+    if args.article_chunk_size and not 0 <= args.article_chunk_overlap < args.article_chunk_size // 2:
+        parser.error("--article_chunk_overlap must be smaller than half of --article_chunk_size")
+
 
-    return parser.parse_args()
+def parse_args(argv: list = None):
+    """
+    Parses ingestion options from `argv` (the command line by default).
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    return args
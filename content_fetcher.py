@@ -1,107 +1,363 @@
-import requests
-from bs4 import BeautifulSoup
 from metadata_generator import guess_clickable_texts
-from urllib.parse import urljoin, urlparse
-import feedparser
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+import json
 import os
+import threading
+import requests
 from dotenv import load_dotenv
-from markdownify import markdownify as md
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
+from disk_cache import cache_key
+from rate_limiter import get_scheduler
+from url_utils import normalize_url, canonical_url_key
+from http_client import get_session, get_text, get_bytes
+from metrics import incr, span
+from sitemaps import find_sitemap_urls, iter_links_from_sitemaps
 
 # Load API key for Jina Reader
 load_dotenv()
 JINA_API_KEY = os.getenv("JINA_API_KEY")
 
+# Jina Reader endpoint, overridable so a local stand-in server can be used
+JINA_READER_URL = os.getenv("JINA_READER_URL", "https://r.jina.ai")
+
+# Seconds to wait for a click to change the page URL before trying the next element
+CLICK_NAVIGATION_TIMEOUT = 3
+
+# Persistent cache for Jina Reader responses, set up by configure_content_cache()
+_content_cache = None
+
+# Feed pages followed per feed (rel="next" or WordPress ?paged=)
+MAX_FEED_PAGES = 50
+
+# Path fragments that mark a same-site link as an article
+ARTICLE_PATH_HINTS = ("blog", "post", "article", "/p/", "/news/", "/story/", "/entry/", "/read/")
+
+# Path segments of archive and listing pages (tags, categories, pagination, authors, feeds), never articles
+LISTING_SEGMENTS = {"tag", "tags", "category", "categories", "page", "author", "authors", "feed", "archive", "archives"}
 
-def fetch_content_from_url(url: str) -> dict:
+
+
+def configure_content_cache(cache):
+    """
+    Sets the DiskCache used for Jina Reader responses (None disables caching).
+    """
+    global _content_cache
+    _content_cache = cache
+
+
+class FeedHints:
+    """
+    What one job's discovery learned about its articles from feeds and sitemaps, keyed by canonical URL:
+    the RSS entry `updated` (or sitemap `lastmod`) value used by --incremental, and the RSS entry author
+    used by the local metadata tier.
+
+    Each job gets its own, so a long-running worker does not keep every URL it ever discovered and
+    teams never see each other's hints. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._updated = {}
+        self._authors = {}
+        self._lock = threading.Lock()
+
+    def remember(self, url: str, updated: str = None, author: str = None, replace: bool = True):
+        """
+        Records an article's `updated` value and author (a sitemap passes replace=False so the
+        feed's value wins).
+        """
+        key = canonical_url_key(url)
+        with self._lock:
+            if updated and (replace or key not in self._updated):
+                self._updated[key] = updated
+            if author:
+                self._authors[key] = author
+
+    def updated(self, url: str) -> str | None:
+        """
+        Returns the RSS `updated` (or `published`) value of an article discovered through a feed, if any.
+        """
+        with self._lock:
+            return self._updated.get(canonical_url_key(url))
+
+    def author(self, url: str) -> str | None:
+        """
+        Returns the author of an article's RSS entry, if it was discovered through a feed.
+        """
+        with self._lock:
+            return self._authors.get(canonical_url_key(url))
+
+
+def _jina_headers() -> dict:
+    """
+    Headers for a Jina Reader request that returns structured JSON.
+    """
+    return {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {JINA_API_KEY}"
+    }
+
+
+def _parse_jina_data(data: dict, url: str) -> dict:
+    """
+    Maps the `data` object of a Jina Reader response to our content fields.
+    """
+    return {
+        "title": data.get("title", "Untitled"),
+        "content": data.get("content", ""),
+        "published_time": data.get("publishedTime", ""),
+        "source_url": data.get("url", url),
+        # <meta> name/property -> content of the page, for the local metadata tier
+        "page_metadata": data.get("metadata") or {}
+    }
+
+
+def _get_cached_content(key: str) -> dict | None:
+    """
+    Returns cached content for a Jina cache key, if caching is enabled and the entry is fresh.
+    """
+    if _content_cache is None:
+        return None
+    cached = _content_cache.get(key)
+    return json.loads(cached) if cached is not None else None
+
+
+def _store_cached_content(key: str, result: dict):
+    if _content_cache is not None:
+        _content_cache.set(key, json.dumps(result, ensure_ascii=False))
+
+
+def fetch_content_from_url(url: str, refresh: bool = False) -> dict:
     """
     Fetches structured content using the Jina Reader API for a given article URL.
+    With refresh=True the cached copy is ignored (the page is known to have changed).
 
     Returns:
         dict with keys: title, content (in markdown), published_time, source_url
     """
-    try:
-        response = requests.get(
-            f"https://r.jina.ai/{url}",
-            headers={
-                "Accept": "application/json",
-                "Authorization": f"Bearer {JINA_API_KEY}"
-            },
+    # Serve pages we already fetched within the cache TTL without touching the network
+    key = cache_key("jina", normalize_url(url))
+    cached = None if refresh else _get_cached_content(key)
+    if cached is not None:
+        incr("jina_cache_hits")
+        return cached
+
+    def request():
+        response = get_session().get(
+            f"{JINA_READER_URL}/{url}",
+            headers=_jina_headers(),
             timeout=30
         )
         response.raise_for_status()
-        data = response.json().get("data", {})
+        return response.json()
+
+    try:
+        # Paced and retried on 429s/timeouts by the shared Jina scheduler
+        with span("jina_fetch"):
+            payload = get_scheduler("jina").call(request)
+        result = _parse_jina_data(payload.get("data", {}), url)
+
+    except Exception as e:
+        raise Exception(f"Failed to fetch JSON content from {url}: {e}")
+
+    incr("jina_content_bytes", len(result["content"].encode("utf-8")))
+    _store_cached_content(key, result)
+    return result
+
+
+async def fetch_content_from_url_async(session, url: str, refresh: bool = False) -> dict:
+    """
+    Async version of fetch_content_from_url that uses a shared aiohttp session.
+
+    Args:
+        session (aiohttp.ClientSession): Session reused across all fetches of a run.
+        url (str): Article URL.
+        refresh (bool): Ignore the cached copy, the page is known to have changed.
+
+    Returns:
+        dict with keys: title, content (in markdown), published_time, source_url
+    """
+    key = cache_key("jina", normalize_url(url))
+    cached = None if refresh else _get_cached_content(key)
+    if cached is not None:
+        incr("jina_cache_hits")
+        return cached
 
-        return {
-            "title": data.get("title", "Untitled"),
-            "content": data.get("content", ""),
-            "published_time": data.get("publishedTime", ""),
-            "source_url": data.get("url", url)
-        }
+    async def request():
+        async with session.get(f"{JINA_READER_URL}/{url}", headers=_jina_headers()) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    try:
+        with span("jina_fetch"):
+            payload = await get_scheduler("jina").call_async(request)
+        result = _parse_jina_data(payload.get("data", {}), url)
 
     except Exception as e:
         raise Exception(f"Failed to fetch JSON content from {url}: {e}")
 
+    incr("jina_content_bytes", len(result["content"].encode("utf-8")))
+    _store_cached_content(key, result)
+    return result
+
 
 def get_rss_feed_url(html: str, base_url: str) -> str | None:
     """
-    Parses HTML to find an RSS feed link if available.
+    Parses HTML to find an RSS (or Atom) feed link if available.
 
     Returns:
         Full RSS feed URL or None if not found.
     """
+    # Imported here so runs that never discover links (PDFs, single articles) skip loading bs4
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
-    link = soup.find("link", type="application/rss+xml")
+    link = soup.find("link", type="application/rss+xml") or soup.find("link", type="application/atom+xml")
     if link and link.get("href"):
         return urljoin(base_url, link["href"])
     return None
 
 
+def _next_feed_page(feed, page_url: str, page: int) -> str | None:
+    """
+    URL of the feed page after `page_url`: its rel="next" link (RFC 5005 / Atom paging),
+    or for WordPress feeds the next `?paged=` page.
+    """
+    for link in feed.feed.get("links", []):
+        if link.get("rel") == "next" and link.get("href"):
+            return urljoin(page_url, link["href"])
+
+    if "wordpress" in feed.feed.get("generator", "").lower():
+        parsed = urlparse(page_url)
+        query = [(k, v) for k, v in parse_qsl(parsed.query) if k != "paged"]
+        query.append(("paged", str(page + 1)))
+        return urlunparse(parsed._replace(query=urlencode(query)))
+    return None
+
+
+def iter_links_from_rss(rss_url: str, max_pages: int = MAX_FEED_PAGES, feed_hints: FeedHints = None):
+    """
+    Yields article links from an RSS/Atom feed, following its pagination page by page.
+
+    Args:
+        rss_url (str): First page of the feed.
+        max_pages (int): Stop after this many feed pages.
+        feed_hints (FeedHints, optional): Remembers each entry's `updated` (or `published`) value and author.
+
+    Yields:
+        str: Article URLs, as soon as their feed page is parsed.
+    """
+    import feedparser
+
+    seen = set()
+    page_url = rss_url
+    for page in range(1, max_pages + 1):
+        # Fetched through the pooled session (conditionally, when a copy is stored) instead of by feedparser
+        try:
+            # Bytes, so feedparser follows the XML encoding declaration
+            feed_bytes = get_bytes(page_url)
+        except Exception as e:
+            if page == 1:
+                print(f"Failed to fetch RSS feed {rss_url}: {e}")
+            return
+        feed = feedparser.parse(feed_bytes, response_headers={"content-location": page_url})
+
+        new_links = 0
+        for entry in feed.entries:
+            if not hasattr(entry, "link") or entry.link in seen:
+                continue
+            seen.add(entry.link)
+            new_links += 1
+            if feed_hints is not None:
+                feed_hints.remember(entry.link, entry.get("updated") or entry.get("published"), entry.get("author"))
+            yield entry.link
+
+        # A page with nothing new means the feed ignored the page parameter or ran out
+        page_url = _next_feed_page(feed, page_url, page) if new_links else None
+        if not page_url:
+            return
+
+
 def extract_links_from_rss(rss_url: str) -> list:
     """
-    Extracts article links from an RSS feed.
+    Extracts article links from an RSS feed, across all of its pages.
 
     Returns:
         A list of URLs found in the feed.
     """
-    feed = feedparser.parse(rss_url)
-    links = []
-    for entry in feed.entries:
-        if hasattr(entry, "link"):
-            links.append(entry.link)
-    return links
+    return list(iter_links_from_rss(rss_url))
+
+
+def _looks_like_article(url: str, index_url: str) -> bool:
+    """
+    Heuristic used for index page and sitemap links: same site, and a blog/article-like path.
+    """
+    parsed = urlparse(url)
+    return parsed.netloc == urlparse(index_url).netloc and any(x in parsed.path for x in ARTICLE_PATH_HINTS)
+
 
+def _is_listing_path(path: str, prefix: str) -> bool:
+    """
+    True for archive and listing pages: a LISTING_SEGMENTS segment right under the index (or, at the
+    site root, under its /blog/-style section), or a bare page number such as /blog/2.
+    """
+    segments = [segment for segment in path[len(prefix):].split("/") if segment]
+    head = segments[:1] if prefix else segments[:2]
+    if any(segment.lower() in LISTING_SEGMENTS for segment in head):
+        return True
+    return bool(segments) and len(segments) <= len(head) and segments[-1].isdigit()
+
+
+def iter_links_from_sitemap(index_url: str, feed_hints: FeedHints = None):
+    """
+    Yields the article links listed in the site's sitemaps. Pages under the index's own path
+    are kept, or when the index is the site root, pages with a blog/article-like path; tag, category,
+    author and pagination pages are left out.
+    Each page's `lastmod` is remembered in `feed_hints`, if given.
 
-def extract_links_from_index_page(index_url: str) -> list:
+    Yields:
+        str: Article URLs, while the sitemaps are still being streamed.
+    """
+    prefix = urlparse(index_url).path.rstrip("/")
+    for url, lastmod in iter_links_from_sitemaps(find_sitemap_urls(index_url)):
+        parsed = urlparse(url)
+        if prefix:
+            if parsed.netloc != urlparse(index_url).netloc or not parsed.path.startswith(prefix + "/"):
+                continue
+        elif not _looks_like_article(url, index_url):
+            continue
+        if _is_listing_path(parsed.path, prefix):
+            continue
+        if feed_hints is not None:
+            feed_hints.remember(url, lastmod, replace=False)
+        yield url
+
+
+def extract_links_from_index_page(index_url: str, html: str = None) -> list:
     """
     Attempts to heuristically extract article/blog links from a static HTML index page.
 
+    Args:
+        index_url (str): Index page URL.
+        html (str, optional): Already fetched HTML of the page, fetched here if not given.
+
     Returns:
         A list of inferred article URLs.
     """
+    from bs4 import BeautifulSoup
+
     try:
-        response = requests.get(index_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
+        if html is None:
+            html = get_text(index_url)
+        soup = BeautifulSoup(html, "html.parser")
         base = "{uri.scheme}://{uri.netloc}".format(uri=urlparse(index_url))
 
         links = set()
         for a in soup.find_all("a", href=True):
             href = a["href"]
             full_url = urljoin(base, href)
-            parsed = urlparse(full_url)
 
             # Heuristics: Check for common blog/article paths
-            if parsed.netloc == urlparse(index_url).netloc and any(x in parsed.path for x in [
-                "blog", "post", "article", "/p/", "/news/", "/story/", "/entry/", "/read/"
-            ]):
+            if _looks_like_article(full_url, index_url):
                 links.add(full_url)
 
         return list(links)
@@ -110,6 +366,17 @@ def extract_links_from_index_page(index_url: str) -> list:
         return []
 
 
+def _xpath_literal(text: str) -> str:
+    """
+    Quotes text as an XPath string literal, using concat() when it contains both quote types.
+    """
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return "concat('" + "', \"'\", '".join(text.split("'")) + "')"
+
+
 def try_click_text(driver, index_url, original_url, text) -> str | None:
     """
     Tries to simulate a click on a text element and captures the resulting URL.
@@ -123,14 +390,26 @@ def try_click_text(driver, index_url, original_url, text) -> str | None:
     Returns:
         URL navigated to after click, or None if no change occurred.
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+
     try:
-        driver.get(index_url)
-        elements = driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
+        # Pooled drivers may already be on the index page, only reload when they are not
+        if driver.current_url.rstrip("/") != original_url:
+            driver.get(index_url)
+        elements = driver.find_elements(By.XPATH, f"//*[contains(text(), {_xpath_literal(text)})]")
         for el in elements:
             try:
-                # Attempt to click and extract resulting URL
+                # Attempt to click and wait for the resulting navigation
+                before_url = driver.current_url
                 ActionChains(driver).move_to_element(el).click().perform()
-                time.sleep(1.5)
+                try:
+                    WebDriverWait(driver, CLICK_NAVIGATION_TIMEOUT).until(EC.url_changes(before_url))
+                except TimeoutException:
+                    continue
                 current_url = driver.current_url.rstrip("/")
                 if current_url != original_url:
                     print(f"[+] Discovered from '{text}': {current_url}")
@@ -146,24 +425,23 @@ def follow_clickable_texts(index_url: str, texts: list[str], max_workers=4) -> l
     """
     Uses Selenium to parallelize clicking on guessed article titles and collecting resulting links.
 
+    Drivers come from the shared warm pool, so they are reused across texts and index URLs.
+
     Returns:
         A list of discovered article URLs.
     """
+    from browser_pool import get_driver_pool
+
     print(f"[Selenium Fallback] Parallel click attempts on: {index_url}")
     original_url = index_url.rstrip("/")
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
+    pool = get_driver_pool()
 
     results = set()
 
     def worker(text):
-        # Isolate each worker in its own WebDriver instance
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        result = try_click_text(driver, index_url, original_url, text)
-        driver.quit()
-        return result
+        # Each attempt borrows a driver exclusively and hands it back when done
+        with pool.driver() as driver:
+            return try_click_text(driver, index_url, original_url, text)
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = [executor.submit(worker, text) for text in texts]
@@ -175,48 +453,85 @@ def follow_clickable_texts(index_url: str, texts: list[str], max_workers=4) -> l
     return list(results)
 
 
-def extract_article_links(index_url: str) -> list:
+def iter_article_links(index_url: str, js_discovery: str = "harvest", feed_hints: FeedHints = None):
     """
-    Main method to extract likely article/blog links from an index page.
+    Main method to discover likely article/blog links from an index page, as a generator.
 
-    Uses RSS (if available), static HTML heuristics, or falls back to OpenAI + Selenium click simulation.
+    Uses static HTML heuristics, RSS/Atom (every page of the feed) and the site's sitemaps,
+    or falls back to OpenAI + Selenium when none of them finds anything.
+    With js_discovery="harvest" the index is loaded once and every navigable target is matched
+    against the guessed titles; per-title click simulation is only used if that finds nothing.
 
-    Returns:
-        List of unique article links.
+    Links are yielded as soon as each source produces them, so callers can start fetching
+    articles while later feed pages and sitemaps are still being read. What feeds and sitemaps
+    tell about each article is remembered in `feed_hints`, if given.
+
+    Yields:
+        str: Unique article links.
     """
+    seen = {normalize_url(index_url)}
+
+    def new_links(links):
+        # Skip the index page itself and links another source already produced
+        for link in links:
+            key = normalize_url(link)
+            if key not in seen:
+                seen.add(key)
+                yield link
+
     try:
         print(f"Trying to extract article links from: {index_url}")
-        html = requests.get(index_url, timeout=10).text
-        rss_url = get_rss_feed_url(html, base_url=index_url)
+        # Fetched once (conditionally, when a copy is stored) and shared by every discovery step
+        try:
+            html = get_text(index_url)
+        except requests.HTTPError as e:
+            # Bot-blocked and broken indexes still get their RSS link, sitemaps and the browser fallback
+            print(f"Index page answered {e.response.status_code if e.response is not None else 'an error'}: {index_url}")
+            html = e.response.text if e.response is not None else ""
+
+        yield from new_links(extract_links_from_index_page(index_url, html))
 
-        rss_links = set()
+        rss_url = get_rss_feed_url(html, base_url=index_url)
         if rss_url:
             print(f"RSS feed found: {rss_url}")
-            rss_links.update(extract_links_from_rss(rss_url))
+            yield from new_links(iter_links_from_rss(rss_url, feed_hints=feed_hints))
         else:
             print("No RSS feed found.")
 
-        html_links = set(extract_links_from_index_page(index_url))
-
-        # Combine both link sources
-        all_links = list(rss_links.union(html_links))
-
-        # Filter out index page itself
-        all_links = [link for link in all_links if link.rstrip("/") != index_url.rstrip("/")]
+        yield from new_links(iter_links_from_sitemap(index_url, feed_hints))
 
         # If no links found, fallback to AI + Selenium clicking
-        if not all_links:
+        if len(seen) == 1:
             print("No static links found. Trying OpenAI-assisted HTML extraction...")
+            # The browser stack is only loaded for the sites that need it
+            from markdownify import markdownify as md
+            from link_harvester import harvest_links_for_texts
+
             markdown = md(html)
             guessed_texts = guess_clickable_texts(markdown)
 
             if guessed_texts:
-                selenium_links = follow_clickable_texts(index_url, guessed_texts)
-                all_links = list(set(selenium_links))
-
-        print(f"Total unique links extracted: {len(all_links)}")
-        return all_links
+                selenium_links = []
+                if js_discovery == "harvest":
+                    try:
+                        selenium_links = harvest_links_for_texts(index_url, guessed_texts)
+                    except Exception as e:
+                        print(f"[!] Link harvesting failed on {index_url}: {e}")
+                if not selenium_links:
+                    selenium_links = follow_clickable_texts(index_url, guessed_texts)
+                yield from new_links(selenium_links)
+
+        print(f"Total unique links extracted: {len(seen) - 1}")
 
     except Exception as e:
         print(f"Error while extracting article links from {index_url}: {e}")
-        return []
+
+
+def extract_article_links(index_url: str, js_discovery: str = "harvest") -> list:
+    """
+    Extracts likely article/blog links from an index page (see iter_article_links).
+
+    Returns:
+        List of unique article links.
+    """
+    return list(iter_article_links(index_url, js_discovery))
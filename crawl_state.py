@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from http_client import get_session
+from url_utils import normalize_url
+
+# Default directory holding one crawl state database per team
+DEFAULT_STATE_DIR = ".crawl_state"
+
+# Seconds allowed for the conditional HEAD request used to detect unchanged pages
+HEAD_TIMEOUT = 10
+
+# Possible results of CrawlState.check
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+def content_hash(text: str) -> str:
+    """
+    Hex SHA-256 of a page's markdown content.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Hex SHA-256 of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CrawlState:
+    """
+    Persistent per-team record of every ingested URL: its feed `updated` value, ETag,
+    Last-Modified and content hash, so incremental runs only ingest new or changed articles.
+    Local PDFs and Drive files are recorded by the hash of the file itself, with the chunk IDs
+    they produced, so the chunks of an earlier version can be replaced (`superseded`).
+
+    Validators learned during a run are only saved once the URL is ingested (or found unchanged),
+    so a fetch that fails is retried on the next run. Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._pending = {}
+        # Chunk IDs of earlier versions of the files re-ingested in this run
+        self.superseded = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, feed_updated TEXT, etag TEXT, last_modified TEXT, "
+                "content_hash TEXT, first_seen REAL NOT NULL, last_seen REAL NOT NULL, last_ingested REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "key TEXT PRIMARY KEY, source TEXT NOT NULL, file_hash TEXT NOT NULL, chunk_ids TEXT NOT NULL, "
+                "last_ingested REAL NOT NULL)"
+            )
+
+    @classmethod
+    def for_team(cls, state_dir: str, team_id: str) -> "CrawlState":
+        """
+        Opens the crawl state database of a team.
+        """
+        safe_team_id = re.sub(r"[^\w.-]", "_", team_id)
+        return cls(os.path.join(state_dir, f"{safe_team_id}.sqlite3"))
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT feed_updated, etag, last_modified, content_hash FROM urls WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("feed_updated", "etag", "last_modified", "content_hash"), row))
+
+    def check(self, url: str, feed_updated: str = None) -> str:
+        """
+        Decides whether a URL needs fetching.
+
+        - Unknown URLs are NEW.
+        - If the feed gave an `updated` value, it is compared with the stored one.
+        - Otherwise a HEAD request is made, conditional (If-None-Match / If-Modified-Since) when
+          validators are stored; a 304 or identical validators mean UNCHANGED.
+
+        Returns:
+            str: NEW, CHANGED or UNCHANGED.
+        """
+        key = normalize_url(url)
+        stored = self._get(key)
+        pending = {"feed_updated": feed_updated}
+        with self._lock:
+            self._pending[key] = pending
+
+        # Feeds tell us when an entry changed without touching the page
+        if feed_updated and (stored is None or stored["feed_updated"]):
+            if stored is None:
+                return NEW
+            return UNCHANGED if feed_updated == stored["feed_updated"] else CHANGED
+
+        # Otherwise ask the site, conditionally when we have validators from a previous run
+        headers = {}
+        if stored and stored["etag"]:
+            headers["If-None-Match"] = stored["etag"]
+        if stored and stored["last_modified"]:
+            headers["If-Modified-Since"] = stored["last_modified"]
+
+        try:
+            response = get_session().head(url, headers=headers, timeout=HEAD_TIMEOUT, allow_redirects=True)
+        except Exception as e:
+            print(f"Conditional check failed for {url}, fetching it: {e}")
+            return NEW if stored is None else CHANGED
+
+        if response.status_code == 304:
+            return UNCHANGED
+
+        etag = response.headers.get("ETag") if response.ok else None
+        last_modified = response.headers.get("Last-Modified") if response.ok else None
+        pending.update(etag=etag, last_modified=last_modified)
+
+        if stored is None:
+            return NEW
+        if (etag or last_modified) and etag == stored["etag"] and last_modified == stored["last_modified"]:
+            return UNCHANGED
+        return CHANGED
+
+    def content_changed(self, url: str, digest: str) -> bool:
+        """
+        True if `digest` differs from the last ingested content hash of the URL.
+        An unchanged URL has its new validators saved so the next run can skip it earlier.
+        """
+        key = normalize_url(url)
+        stored = self._get(key)
+        if stored is None or stored["content_hash"] != digest:
+            return True
+        self._save(key, url, digest, ingested=False)
+        return False
+
+    def mark_ingested(self, url: str, digest: str):
+        """
+        Records that a URL was ingested with the given content hash.
+        """
+        self._save(normalize_url(url), url, digest, ingested=True)
+
+    @staticmethod
+    def _file_key(source: str) -> str:
+        # Drive links are keyed like any URL, local files by absolute path
+        if "://" in source:
+            return normalize_url(source)
+        return "file://" + os.path.abspath(source)
+
+    def file_changed(self, source: str, digest: str) -> bool:
+        """
+        True if a PDF (local path or Drive link) is new, or its file_hash differs from the one last ingested.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT file_hash FROM files WHERE key = ?", (self._file_key(source),)).fetchone()
+        return row is None or row[0] != digest
+
+    def mark_file_ingested(self, source: str, digest: str, chunk_ids: list):
+        """
+        Records that a PDF (local path or Drive link) was ingested with the given file_hash and chunks.
+        The chunk IDs of the version ingested before are added to `superseded`.
+        """
+        key = self._file_key(source)
+        with self._lock:
+            row = self._conn.execute("SELECT chunk_ids FROM files WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.superseded.update(json.loads(row[0]))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (key, source, file_hash, chunk_ids, last_ingested) VALUES (?, ?, ?, ?, ?)",
+                (key, source, digest, json.dumps(chunk_ids), time.time())
+            )
+
+    def _save(self, key: str, url: str, digest: str, ingested: bool):
+        now = time.time()
+        with self._lock:
+            pending = self._pending.pop(key, {})
+            self._conn.execute(
+                "INSERT INTO urls (key, url, feed_updated, etag, last_modified, content_hash, first_seen, last_seen, last_ingested) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET url = excluded.url, "
+                "feed_updated = COALESCE(excluded.feed_updated, urls.feed_updated), "
+                "etag = COALESCE(excluded.etag, urls.etag), "
+                "last_modified = COALESCE(excluded.last_modified, urls.last_modified), "
+                "content_hash = excluded.content_hash, last_seen = excluded.last_seen, "
+                "last_ingested = COALESCE(excluded.last_ingested, urls.last_ingested)",
+                (key, url, pending.get("feed_updated"), pending.get("etag"), pending.get("last_modified"),
+                 digest, now, now, now if ingested else None)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
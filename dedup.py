@@ -0,0 +1,142 @@
+import hashlib
+import re
+import threading
+
+from url_utils import canonical_url_key
+
+# Estimated Jaccard similarity above which two pages count as the same article
+DEFAULT_THRESHOLD = 0.9
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# MinHash signature length (a power of two), split into LSH bands of BAND_SIZE rows
+NUM_BINS = 128
+BAND_SIZE = 4
+
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_VALUE_BITS = 64 - _BIN_BITS
+
+
+def _shingles(text: str) -> set:
+    """
+    64-bit hashes of every SHINGLE_SIZE-word window of the lowercased text.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        windows = [" ".join(words)] if words else []
+    else:
+        windows = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little") for w in windows}
+
+
+def minhash_signature(text: str) -> tuple:
+    """
+    One-permutation MinHash signature of a text's word shingles: each shingle hash is hashed once,
+    its low bits pick one of NUM_BINS bins and the rest is kept if it is the bin's minimum. Empty bins
+    borrow the value of the next filled bin (offset by the distance), so short texts still compare position by position.
+
+    Returns:
+        tuple: NUM_BINS minimum hash values (empty for text without words).
+    """
+    shingles = _shingles(text)
+    if not shingles:
+        return ()
+    bins = [None] * NUM_BINS
+    for h in shingles:
+        index, value = h & (NUM_BINS - 1), h >> _BIN_BITS
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    signature = list(bins)
+    for index in range(NUM_BINS):
+        distance = 1
+        while signature[index] is None:
+            borrowed = bins[(index + distance) % NUM_BINS]
+            if borrowed is not None:
+                signature[index] = borrowed + (distance << _VALUE_BITS)
+            distance += 1
+    return tuple(signature)
+
+
+def estimated_similarity(first: tuple, second: tuple) -> float:
+    """
+    Estimated Jaccard similarity of two signatures: the fraction of positions where they agree.
+    """
+    if not first or not second:
+        return 0.0
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class Deduplicator:
+    """
+    Run-wide duplicate filter shared by every fetch job.
+
+    - claim_url drops URLs whose canonical form (see url_utils.canonical_url_key) was already claimed,
+      so an article reached from several sources is fetched once.
+    - claim_content drops pages whose text is a near-duplicate of one already claimed, found through
+      locality-sensitive hashing of MinHash signatures, so it is never enriched or written twice.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.duplicate_urls = 0
+        self.duplicate_pages = 0
+        self._urls = set()
+        self._signatures = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def claim_url(self, url: str) -> bool:
+        """
+        True the first time a page is seen under any spelling of its URL.
+        """
+        key = canonical_url_key(url)
+        with self._lock:
+            if key in self._urls:
+                self.duplicate_urls += 1
+                return False
+            self._urls.add(key)
+            return True
+
+    def claim_content(self, url: str, text: str) -> bool:
+        """
+        True unless `text` is a near-duplicate of a page already claimed. The page's final URL
+        (after redirects) is claimed too, so later links to it are skipped before fetching.
+
+        Args:
+            url (str): URL the content was served from.
+            text (str): Page content.
+
+        Returns:
+            bool: Whether this page should be processed.
+        """
+        with self._lock:
+            self._urls.add(canonical_url_key(url))
+        if self.threshold > 1:
+            return True
+
+        signature = minhash_signature(text)
+        if not signature:
+            return True
+        bands = [
+            (i, signature[i:i + BAND_SIZE]) for i in range(0, len(signature), BAND_SIZE)
+        ]
+
+        with self._lock:
+            # Only pages sharing at least one band are compared in full
+            candidates = set()
+            for band in bands:
+                candidates.update(self._buckets.get(band, ()))
+            for other in candidates:
+                if estimated_similarity(signature, self._signatures[other]) >= self.threshold:
+                    self.duplicate_pages += 1
+                    print(f"Near-duplicate of {other}, skipping: {url}")
+                    return False
+
+            self._signatures[url] = signature
+            for band in bands:
+                self._buckets.setdefault(band, []).append(url)
+        return True
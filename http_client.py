@@ -0,0 +1,155 @@
+import base64
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from disk_cache import cache_key
+from url_utils import normalize_url
+
+# Connections kept alive per host by the shared session
+POOL_MAXSIZE = 32
+
+# Seconds allowed for index, feed and HEAD requests
+DEFAULT_TIMEOUT = 10
+
+# Compressed transfers, brotli only when urllib3 can decode it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# Shared keep-alive session, created by get_session()
+_session = None
+_session_lock = threading.Lock()
+
+# Persistent store of validators and bodies for conditional GETs, set up by configure_http_cache()
+_http_cache = None
+
+# Counters reported at the end of a run
+_stats = {"requests": 0, "not_modified": 0, "bytes": 0}
+_stats_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the connection-pooled session shared by every index, feed and page request.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _session = session
+        return _session
+
+
+def configure_http_cache(cache):
+    """
+    Sets the DiskCache holding ETag/Last-Modified validators and bodies for conditional GETs
+    (None disables conditional requests).
+    """
+    global _http_cache
+    _http_cache = cache
+
+
+def _count(not_modified: bool, size: int):
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["not_modified"] += int(not_modified)
+        _stats["bytes"] += size
+
+
+def stats() -> dict:
+    """
+    Returns the number of GETs, how many were answered 304 Not Modified, and the bytes received.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def conditional_headers(validators: dict) -> dict:
+    """
+    If-None-Match / If-Modified-Since headers revalidating a copy stored with `validators`
+    (as returned by response_validators).
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def response_validators(response) -> dict:
+    """
+    ETag and Last-Modified of a response (None when the server did not send them).
+    """
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def _conditional_get(url: str, timeout: float, binary: bool):
+    """
+    GET revalidating a stored copy with If-None-Match / If-Modified-Since; returns the body as
+    bytes (stored base64-encoded) or as text decoded by requests.
+    """
+    key = cache_key("http_bytes" if binary else "http", normalize_url(url))
+    stored = None
+    headers = {}
+    if _http_cache is not None:
+        cached = _http_cache.get(key)
+        if cached is not None:
+            stored = json.loads(cached)
+            headers = conditional_headers(stored)
+
+    response = get_session().get(url, headers=headers, timeout=timeout)
+
+    # Unchanged since the stored copy: reuse its body
+    if response.status_code == 304 and stored is not None:
+        _count(True, 0)
+        return base64.b64decode(stored["body"]) if binary else stored["body"]
+
+    response.raise_for_status()
+    body = response.content if binary else response.text
+    _count(False, len(response.content))
+
+    # Only responses with validators can be revalidated later
+    validators = response_validators(response)
+    if _http_cache is not None and any(validators.values()):
+        stored_body = base64.b64encode(body).decode("ascii") if binary else body
+        _http_cache.set(key, json.dumps(dict(validators, body=stored_body), ensure_ascii=False))
+    return body
+
+
+def get_text(url: str, timeout: float = DEFAULT_TIMEOUT) -> str:
+    """
+    Fetches an index page as text, revalidating a stored copy with If-None-Match /
+    If-Modified-Since so an unchanged resource costs a 304 instead of a full download.
+
+    Args:
+        url (str): Page URL.
+        timeout (float): Request timeout in seconds.
+
+    Returns:
+        str: Response body.
+
+    Raises:
+        requests.HTTPError: If the server answers with an error status.
+    """
+    return _conditional_get(url, timeout, binary=False)
+
+
+def get_bytes(url: str, timeout: float = DEFAULT_TIMEOUT) -> bytes:
+    """
+    Like get_text, but returns the undecoded body, for XML such as feeds: requests decodes `text/xml`
+    without a charset as ISO-8859-1, while the document's own encoding declaration should win.
+
+    Raises:
+        requests.HTTPError: If the server answers with an error status.
+    """
+    return _conditional_get(url, timeout, binary=True)
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from url_utils import canonical_url_key
+
+# States an input moves through; SKIPPED and FAILED are terminal for a run, FAILED is retried on resume
+PENDING = "pending"
+DISCOVERED = "discovered"
+FETCHED = "fetched"
+ENRICHED = "enriched"
+WRITTEN = "written"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+JOURNAL_FILE = "journal.sqlite3"
+ARGS_FILE = "args.json"
+
+
+class JobJournal:
+    """
+    On-disk record of a run, kept in a job directory, so a crashed or killed run can be resumed.
+
+    Every input (URL, blog index, PDF, Drive link) has a row with its state and its latest partial
+    result: the fetched document once FETCHED, the enriched item(s) once ENRICHED. `--resume` skips
+    finished inputs, replays their stored results into the output, and retries everything else.
+    Safe to share between threads.
+    """
+
+    def __init__(self, job_dir: str):
+        self.job_dir = job_dir
+        os.makedirs(job_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(job_dir, JOURNAL_FILE), check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS inputs ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, parent TEXT, "
+                "state TEXT NOT NULL, payload TEXT, error TEXT, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @classmethod
+    def create(cls, job_dir: str, args) -> "JobJournal":
+        """
+        Starts a new job directory and records the run's arguments in it.
+
+        Raises:
+            SystemExit: If the directory already holds a job.
+        """
+        if os.path.exists(os.path.join(job_dir, JOURNAL_FILE)):
+            raise SystemExit(f"{job_dir} already holds a job, continue it with --resume {job_dir}")
+        journal = cls(job_dir)
+        with open(os.path.join(job_dir, ARGS_FILE), "w", encoding="utf-8") as f:
+            json.dump(vars(args), f, indent=2)
+        return journal
+
+    @staticmethod
+    def load_args(job_dir: str) -> argparse.Namespace:
+        """
+        Returns the arguments the job was started with.
+        """
+        path = os.path.join(job_dir, ARGS_FILE)
+        if not os.path.exists(path):
+            raise SystemExit(f"No job to resume in {job_dir}")
+        with open(path, "r", encoding="utf-8") as f:
+            return argparse.Namespace(**json.load(f))
+
+    @staticmethod
+    def key(kind: str, value: str) -> str:
+        return f"{kind}:{canonical_url_key(value) if kind in ('url', 'index') else value}"
+
+    def add(self, kind: str, value: str, parent: str = None) -> tuple:
+        """
+        Records an input as PENDING unless it is already known.
+
+        Returns:
+            tuple: (key, True if the input was not known before)
+        """
+        key = self.key(kind, value)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO inputs (key, kind, value, parent, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, value, parent, PENDING, time.time())
+            )
+        return key, cursor.rowcount == 1
+
+    def get(self, key: str) -> tuple:
+        """
+        Returns (state, payload) of an input, or (None, None) if it is unknown.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT state, payload FROM inputs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def mark(self, key: str, state: str, payload=None, error: str = None):
+        """
+        Moves an input to `state`, replacing its stored result when a payload is given.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE inputs SET state = ?, payload = COALESCE(?, payload), error = ?, updated_at = ? WHERE key = ?",
+                (state, json.dumps(payload, ensure_ascii=False) if payload is not None else None, error, time.time(), key)
+            )
+
+    def inputs(self, kind: str, states: tuple) -> list:
+        """
+        Returns (key, value, payload) of every input of a kind that is in one of `states`, in insertion order.
+        """
+        placeholders = ", ".join("?" for _ in states)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value, payload FROM inputs WHERE kind = ? AND state IN ({placeholders}) ORDER BY rowid",
+                (kind, *states)
+            ).fetchall()
+        return [(key, value, json.loads(payload) if payload is not None else None) for key, value, payload in rows]
+
+    def counts(self) -> dict:
+        """
+        Number of inputs in each state.
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM inputs GROUP BY state").fetchall())
+
+    def get_meta(self, name: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,189 @@
+"""
+Reads knowledge base items back from any --format output, optionally filtered by content type
+and source URL, without loading the whole file.
+
+- Parquet files are memory-mapped; only the requested columns are read, and row groups whose
+  statistics rule out the filter are skipped.
+- NDJSON and ndjson.zst files are streamed line by line.
+- JSON envelopes have to be parsed whole; convert large ones with `--format parquet`.
+
+Usage:
+    python kb_reader.py kb.parquet --content_type blog --columns title source_url
+"""
+import argparse
+import io
+import json
+
+from output_writer import PARQUET_COLUMNS, iter_ndjson
+
+# Rows per batch read from a Parquet file
+READ_BATCH_ROWS = 1000
+
+
+def detect_format(path: str) -> str:
+    """
+    Output format of a file, from its extension (anything unknown is read as a JSON envelope).
+    """
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".zst"):
+        return "ndjson.zst"
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "json"
+
+
+def _as_set(value) -> set | None:
+    if value is None:
+        return None
+    return {value} if isinstance(value, str) else set(value)
+
+
+def _parquet_filter(content_types: set | None, source_urls: set | None):
+    """
+    pyarrow.dataset filter expression for the requested values (None matches everything).
+    """
+    import pyarrow.dataset as ds
+
+    expression = None
+    for column, values in (("content_type", content_types), ("source_url", source_urls)):
+        if values is None:
+            continue
+        condition = ds.field(column).isin(sorted(values))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def open_parquet_dataset(path: str):
+    """
+    Memory-mapped pyarrow dataset over a Parquet output file.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(path, format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def read_table(path: str, content_type=None, source_url=None, columns: list = None):
+    """
+    Reads a Parquet output into an Arrow table, for jobs that work on columns rather than items.
+
+    Args:
+        path (str): Parquet file written with --format parquet.
+        content_type (str | list, optional): Keep only items of these content types.
+        source_url (str | list, optional): Keep only items from these source URLs.
+        columns (list, optional): Columns to read. Defaults to all.
+
+    Returns:
+        pyarrow.Table: Matching rows; repeated fields stay dictionary-encoded.
+    """
+    return open_parquet_dataset(path).to_table(
+        columns=columns,
+        filter=_parquet_filter(_as_set(content_type), _as_set(source_url))
+    )
+
+
+def _iter_parquet(path: str, content_types: set | None, source_urls: set | None, columns: list | None):
+    dataset = open_parquet_dataset(path)
+    batches = dataset.to_batches(columns=columns, filter=_parquet_filter(content_types, source_urls),
+                                 batch_size=READ_BATCH_ROWS)
+    for batch in batches:
+        for row in batch.to_pylist():
+            # Fields an item did not have are stored as nulls; `extra` holds the uncommon ones
+            extra = row.pop("extra", None)
+            item = {key: value for key, value in row.items() if value is not None}
+            if extra:
+                item.update(json.loads(extra))
+            yield item
+
+
+def _iter_zstd_ndjson(path: str):
+    import zstandard
+
+    with open(path, "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        for line in io.TextIOWrapper(reader, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_items(path: str, content_type=None, source_url=None, columns: list = None, fmt: str = None):
+    """
+    Lazily reads the items of an output file.
+
+    Args:
+        path (str): Output file of any --format.
+        content_type (str | list, optional): Keep only items of these content types.
+        source_url (str | list, optional): Keep only items from these source URLs.
+        columns (list, optional): Fields to keep in each item. Defaults to all.
+        fmt (str, optional): Format of the file. Defaults to detect_format(path).
+
+    Yields:
+        dict: One item at a time.
+    """
+    fmt = fmt or detect_format(path)
+    content_types = _as_set(content_type)
+    source_urls = _as_set(source_url)
+
+    if fmt == "parquet":
+        # Only stored columns can be pushed down; anything else lives in `extra`
+        read_columns = None
+        if columns is not None:
+            read_columns = [name for name in columns if name in PARQUET_COLUMNS]
+            if len(read_columns) < len(columns):
+                read_columns.append("extra")
+        items = _iter_parquet(path, content_types, source_urls, read_columns)
+        # Already filtered while reading
+        content_types = source_urls = None
+    elif fmt == "ndjson.zst":
+        items = _iter_zstd_ndjson(path)
+    elif fmt == "ndjson":
+        items = iter_ndjson(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            items = iter(json.load(f).get("items", []))
+
+    for item in items:
+        if content_types is not None and item.get("content_type") not in content_types:
+            continue
+        if source_urls is not None and item.get("source_url") not in source_urls:
+            continue
+        if columns is not None:
+            item = {key: item[key] for key in columns if key in item}
+        yield item
+
+
+def read_team_id(path: str, fmt: str = None) -> str | None:
+    """
+    Team ID stored in a JSON envelope or Parquet file (NDJSON outputs do not carry it).
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path, memory_map=True).metadata or {}
+        return metadata.get(b"team_id", b"").decode("utf-8") or None
+    if fmt == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("team_id")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the items of a knowledge base output as NDJSON.")
+    parser.add_argument("path", help="Output file (.json, .ndjson, .zst or .parquet).")
+    parser.add_argument("--content_type", nargs="+", help="Only items of these content types.")
+    parser.add_argument("--source_url", nargs="+", help="Only items from these source URLs.")
+    parser.add_argument("--columns", nargs="+", help="Only these fields of each item.")
+    parser.add_argument("--count", action="store_true", help="Print the number of matching items instead.")
+    args = parser.parse_args()
+
+    items = iter_items(args.path, args.content_type, args.source_url, args.columns)
+    if args.count:
+        print(sum(1 for _ in items))
+        return
+    for item in items:
+        print(json.dumps(item, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
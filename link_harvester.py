@@ -0,0 +1,155 @@
+import unicodedata
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from browser_pool import get_driver_pool
+
+# Seconds the in-page harvesting script may run (it clicks every matching element once)
+HARVEST_SCRIPT_TIMEOUT = 60
+
+# Seconds to wait for the index page to finish loading
+PAGE_READY_TIMEOUT = 15
+
+# Milliseconds given to each click handler to navigate before the next element is clicked
+CLICK_SETTLE_MS = 50
+
+# Link texts shorter than this only match when they contain a guessed title, not when a title contains them
+MIN_REVERSE_MATCH_LENGTH = 12
+
+# Runs inside the index page. Collects rendered hrefs and router links, then clicks every element
+# whose text matches a guessed title while history.pushState, window.open and (where supported) the
+# Navigation API are hooked to record the destination instead of following it.
+HARVEST_SCRIPT = """
+const texts = arguments[0];
+const done = arguments[arguments.length - 1];
+const settleMs = arguments[1];
+
+const norm = s => (s || "").normalize("NFKC")
+    .replace(/[\\u2018\\u2019\\u02BC]/g, "'").replace(/[\\u201C\\u201D]/g, '"')
+    .replace(/\\s+/g, " ").trim().toLowerCase();
+const wanted = texts.map(norm).filter(Boolean);
+const matches = text => wanted.some(w => text.includes(w));
+
+const targets = [];
+const add = (url, text, source) => {
+    try { targets.push({url: new URL(String(url), location.href).href, text: text || "", source: source}); } catch (e) {}
+};
+
+// 1. Rendered anchors
+document.querySelectorAll("a[href]").forEach(a => add(a.getAttribute("href"), a.textContent, "href"));
+
+// 2. Router links and data attributes that frameworks turn into navigation
+const attrs = ["routerlink", "ng-reflect-router-link", "to", "data-href", "data-url", "data-link"];
+document.querySelectorAll(attrs.map(a => "[" + a + "]").join(",")).forEach(el => {
+    for (const a of attrs) {
+        const value = el.getAttribute(a);
+        if (value) add(value, el.textContent, "router");
+    }
+});
+
+// 3. Record navigations triggered by click handlers instead of following them
+let current = null;
+const record = url => { if (url && current !== null) add(url, current, "click"); };
+const pushState = history.pushState, replaceState = history.replaceState, open = window.open;
+history.pushState = function (state, title, url) { record(url); };
+history.replaceState = function (state, title, url) { record(url); };
+window.open = function (url) { record(url); return null; };
+const onNavigate = e => { record(e.destination.url); if (e.cancelable) e.preventDefault(); };
+if (window.navigation) window.navigation.addEventListener("navigate", onNavigate);
+const onSubmit = e => e.preventDefault();
+document.addEventListener("submit", onSubmit, true);
+
+// Innermost non-anchor elements whose text matches a guessed title
+const candidates = [];
+document.querySelectorAll("body *").forEach(el => {
+    if (el.closest("a[href]")) return;
+    const text = norm(el.textContent);
+    if (!text || text.length > 500 || !matches(text)) return;
+    if ([...el.children].some(child => matches(norm(child.textContent)))) return;
+    candidates.push(el);
+});
+
+(async () => {
+    for (const el of candidates) {
+        current = el.textContent;
+        try { el.click(); } catch (e) {}
+        await new Promise(resolve => setTimeout(resolve, settleMs));
+    }
+    current = null;
+    history.pushState = pushState;
+    history.replaceState = replaceState;
+    window.open = open;
+    if (window.navigation) window.navigation.removeEventListener("navigate", onNavigate);
+    document.removeEventListener("submit", onSubmit, true);
+    done(targets);
+})();
+"""
+
+
+def _normalize_text(text: str) -> str:
+    """
+    Normalizes text for matching: unicode form, curly quotes, whitespace and case.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.replace("‘", "'").replace("’", "'").replace("ʼ", "'")
+    text = text.replace("“", '"').replace("”", '"')
+    return " ".join(text.split()).casefold()
+
+
+def match_targets(targets: list, texts: list, index_url: str) -> list:
+    """
+    Matches harvested navigation targets against guessed article titles.
+
+    Args:
+        targets (list): Dicts with url and text, as returned by HARVEST_SCRIPT.
+        texts (list): Guessed clickable titles from guess_clickable_texts.
+        index_url (str): Index page, excluded from the results.
+
+    Returns:
+        list: Unique article URLs whose link text matches a guessed title.
+    """
+    original_url = index_url.rstrip("/")
+    wanted = [_normalize_text(text) for text in texts]
+    wanted = [text for text in wanted if text]
+
+    links = set()
+    for target in targets:
+        url = target.get("url", "").split("#")[0].rstrip("/")
+        if not url.startswith(("http://", "https://")) or url == original_url:
+            continue
+
+        label = _normalize_text(target.get("text"))
+        if not label:
+            continue
+        if any(text in label or (len(label) >= MIN_REVERSE_MATCH_LENGTH and label in text) for text in wanted):
+            links.add(url)
+
+    return sorted(links)
+
+
+def harvest_links_for_texts(index_url: str, texts: list) -> list:
+    """
+    Loads a JS-rendered index page once and collects every navigable target in one pass:
+    rendered hrefs, router links, and destinations of click handlers (captured, not followed).
+    The targets are then matched against the guessed titles locally.
+
+    Returns:
+        A list of discovered article URLs.
+    """
+    print(f"[Selenium Harvest] Single page load on: {index_url}")
+    with get_driver_pool().driver() as driver:
+        try:
+            driver.get(index_url)
+            WebDriverWait(driver, PAGE_READY_TIMEOUT).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+            driver.set_script_timeout(HARVEST_SCRIPT_TIMEOUT)
+            targets = driver.execute_async_script(HARVEST_SCRIPT, list(texts), CLICK_SETTLE_MS)
+        finally:
+            # Leave the hooked page so the next borrower of this driver starts clean
+            driver.get("about:blank")
+
+    links = match_targets(targets or [], texts, index_url)
+    for link in links:
+        print(f"[+] Harvested: {link}")
+    return links
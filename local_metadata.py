@@ -0,0 +1,281 @@
+import json
+import re
+from urllib.parse import urlparse
+
+from http_client import get_text
+from metrics import span
+
+# Lowest confidence at which a locally found value is used instead of asking the LLM
+CONFIDENCE_THRESHOLD = 0.7
+
+# How far each source is trusted
+JSON_LD_CONFIDENCE = 0.9
+META_AUTHOR_CONFIDENCE = 0.85
+FEED_AUTHOR_CONFIDENCE = 0.85
+OPEN_GRAPH_CONFIDENCE = 0.75
+HOST_CONFIDENCE = 0.9
+URL_PATH_CONFIDENCE = 0.7
+PAGE_TITLE_CONFIDENCE = 0.9
+PDF_TITLE_CONFIDENCE = 0.8
+PDF_AUTHOR_CONFIDENCE = 0.75
+PDF_CONTENT_TYPE_CONFIDENCE = 0.7
+
+# PDFs at least this long are taken for books
+BOOK_MIN_PAGES = 100
+
+# schema.org types -> our content types (the generic article types count as blog posts)
+SCHEMA_CONTENT_TYPES = {
+    "blogposting": "blog",
+    "article": "blog",
+    "newsarticle": "blog",
+    "techarticle": "blog",
+    "report": "blog",
+    "podcastepisode": "podcast_transcript",
+    "book": "book"
+}
+
+# og:type values -> our content types
+OPEN_GRAPH_CONTENT_TYPES = {
+    "article": "blog",
+    "blog": "blog",
+    "book": "book",
+    "books.book": "book"
+}
+
+# Hosts whose pages are always one kind of content
+HOST_CONTENT_TYPES = {
+    "reddit.com": "reddit_comment",
+    "linkedin.com": "linkedin_post"
+}
+
+# URL path fragments of blog posts
+BLOG_PATH_HINTS = ("/blog", "/post", "/posts/", "/p/")
+
+# Author values that name nobody
+PLACEHOLDER_AUTHORS = {"admin", "administrator", "user", "owner", "author", "unknown", "anonymous", "guest"}
+
+# Title values that are not titles
+PLACEHOLDER_TITLES = {"untitled", "unknown", "title", "document", "slide 1"}
+
+_WORD_PREFIX = re.compile(r"^(microsoft (word|powerpoint) - )", re.IGNORECASE)
+_FILE_NAME = re.compile(r"\.(docx?|pptx?|pdf|tex|dvi|indd|odt)$", re.IGNORECASE)
+_FEED_EMAIL_AUTHOR = re.compile(r"^\S+@\S+\s+\((.+)\)$")
+
+# Local extraction mode, set up by configure_local_metadata()
+_mode = "off"
+
+
+def configure_local_metadata(mode: str):
+    """
+    Sets the local metadata tier: "off" always asks the LLM, "on" first uses what the fetch already
+    returned (meta tags, RSS authors, PDF properties), "html" also downloads article pages for JSON-LD.
+    """
+    global _mode
+    _mode = mode
+
+
+def local_metadata_enabled() -> bool:
+    return _mode != "off"
+
+
+def _author(value) -> str | None:
+    """
+    Cleans an author value, or returns None if it does not name anyone.
+    """
+    if isinstance(value, list):
+        names = [name for name in (_author(v) for v in value) if name]
+        return ", ".join(names) or None
+    if isinstance(value, dict):
+        return _author(value.get("name"))
+    if not isinstance(value, str):
+        return None
+    value = " ".join(value.split())
+    match = _FEED_EMAIL_AUTHOR.match(value)
+    if match:
+        value = match.group(1)
+    if not value or len(value) > 100 or value.lower() in PLACEHOLDER_AUTHORS or "://" in value or "@" in value:
+        return None
+    return value
+
+
+def _title(value) -> tuple:
+    """
+    Cleans a title value.
+
+    Returns:
+        tuple: (title, True if the title looks like a file name that needed cleaning) or (None, False).
+    """
+    if not isinstance(value, str):
+        return None, False
+    value = " ".join(value.split())
+    cleaned = _FILE_NAME.sub("", _WORD_PREFIX.sub("", value)).strip()
+    if len(cleaned) < 3 or cleaned.lower() in PLACEHOLDER_TITLES:
+        return None, False
+    return cleaned, cleaned != value
+
+
+def _add(candidates: dict, field: str, value, confidence: float):
+    """
+    Keeps the most trusted value found for a field.
+    """
+    if value and confidence > candidates.get(field, (None, 0))[1]:
+        candidates[field] = (value, confidence)
+
+
+def _iter_json_ld_nodes(data):
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        yield from _iter_json_ld_nodes(data.get("@graph"))
+
+
+def _json_ld_candidates(soup, candidates: dict):
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for node in _iter_json_ld_nodes(data):
+            types = node.get("@type", [])
+            types = [types] if isinstance(types, str) else types
+            content_types = [SCHEMA_CONTENT_TYPES[t.lower()] for t in types if isinstance(t, str) and t.lower() in SCHEMA_CONTENT_TYPES]
+            if not content_types:
+                continue
+            _add(candidates, "content_type", content_types[0], JSON_LD_CONFIDENCE)
+            _add(candidates, "author", _author(node.get("author")), JSON_LD_CONFIDENCE)
+            _add(candidates, "title", _title(node.get("headline") or node.get("name"))[0], JSON_LD_CONFIDENCE)
+
+
+def _meta_tag_candidates(tags: dict, candidates: dict):
+    """
+    Candidates from <meta> tags, as a name/property -> content dict (Jina Reader returns them this way).
+    """
+    _add(candidates, "author", _author(tags.get("author")), META_AUTHOR_CONFIDENCE)
+    _add(candidates, "author", _author(tags.get("article:author")), OPEN_GRAPH_CONFIDENCE)
+    og_type = tags.get("og:type")
+    if isinstance(og_type, str):
+        _add(candidates, "content_type", OPEN_GRAPH_CONTENT_TYPES.get(og_type.lower()), OPEN_GRAPH_CONFIDENCE)
+    _add(candidates, "title", _title(tags.get("og:title"))[0], OPEN_GRAPH_CONFIDENCE)
+
+
+def html_candidates(html: str) -> dict:
+    """
+    Metadata found in a page's JSON-LD, OpenGraph and <meta name="author"> tags.
+
+    Returns:
+        dict: field -> (value, confidence) for title, content_type and author.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    candidates = {}
+    _json_ld_candidates(soup, candidates)
+    tags = {}
+    for meta in soup.find_all("meta"):
+        name = meta.get("name") or meta.get("property")
+        if name and meta.get("content") and name.lower() not in tags:
+            tags[name.lower()] = meta["content"]
+    _meta_tag_candidates(tags, candidates)
+    return candidates
+
+
+def url_candidates(url: str) -> dict:
+    """
+    Content type implied by the host or path of a URL.
+    """
+    candidates = {}
+    parsed = urlparse(url or "")
+    host = parsed.netloc.lower().split(":")[0]
+    for domain, content_type in HOST_CONTENT_TYPES.items():
+        if host == domain or host.endswith("." + domain):
+            _add(candidates, "content_type", content_type, HOST_CONFIDENCE)
+    if any(hint in parsed.path.lower() for hint in BLOG_PATH_HINTS):
+        _add(candidates, "content_type", "blog", URL_PATH_CONFIDENCE)
+    return candidates
+
+
+def pdf_candidates(pdf_path: str) -> dict:
+    """
+    Metadata found in a PDF's document properties and page count.
+    """
+    import fitz  # PyMuPDF, already used by pdf_chunker
+
+    with fitz.open(pdf_path) as doc:
+        properties = doc.metadata or {}
+        page_count = doc.page_count
+
+    candidates = {}
+    title, cleaned = _title(properties.get("title"))
+    # Titles left over from the file name ("Microsoft Word - notes.docx") are less trusted
+    _add(candidates, "title", title, PDF_TITLE_CONFIDENCE - (0.2 if cleaned else 0))
+    _add(candidates, "author", _author(properties.get("author")), PDF_AUTHOR_CONFIDENCE)
+
+    described = " ".join(properties.get(key) or "" for key in ("title", "subject", "keywords")).lower()
+    if "transcript" in described:
+        content_type = "podcast_transcript" if "podcast" in described or "episode" in described else "call_transcript"
+        _add(candidates, "content_type", content_type, PDF_CONTENT_TYPE_CONFIDENCE)
+    elif page_count >= BOOK_MIN_PAGES:
+        _add(candidates, "content_type", "book", PDF_CONTENT_TYPE_CONFIDENCE)
+    return candidates
+
+
+def merge_candidates(*sources) -> dict:
+    """
+    Combines candidate dicts, keeping the most trusted value per field.
+    """
+    merged = {}
+    for candidates in sources:
+        for field, (value, confidence) in candidates.items():
+            _add(merged, field, value, confidence)
+    return merged
+
+
+def confident_value(candidates: dict, field: str):
+    """
+    The value of a field if it is trusted enough to skip the LLM, otherwise None.
+    """
+    value, confidence = candidates.get(field, (None, 0))
+    return value if confidence >= CONFIDENCE_THRESHOLD else None
+
+
+def resolve(candidates: dict, fields: tuple = ("title", "content_type", "author")) -> dict | None:
+    """
+    Metadata for `fields` if every one of them was found with enough confidence, otherwise None.
+    """
+    metadata = {field: confident_value(candidates, field) for field in fields}
+    return metadata if all(metadata.values()) else None
+
+
+def resolve_article(content_data: dict, feed_author: str = None) -> dict | None:
+    """
+    Tries to find an article's content type and author without the LLM: from the meta tags the Jina
+    response carries, the RSS entry's author and the URL, then in "html" mode from the page itself.
+
+    Args:
+        content_data (dict): Jina content fields of the article.
+        feed_author (str, optional): Author of the article's RSS entry.
+
+    Returns:
+        dict: content_type and author, or None if the LLM is needed.
+    """
+    if not local_metadata_enabled():
+        return None
+
+    url = content_data.get("source_url", "")
+    candidates = url_candidates(url)
+    _meta_tag_candidates({k.lower(): v for k, v in (content_data.get("page_metadata") or {}).items()}, candidates)
+    _add(candidates, "author", _author(feed_author), FEED_AUTHOR_CONFIDENCE)
+    metadata = resolve(candidates, ("content_type", "author"))
+    if metadata is not None or _mode != "html":
+        return metadata
+
+    # The page's own HTML has its JSON-LD, which Jina leaves out
+    try:
+        with span("local_metadata_fetch"):
+            html = get_text(url)
+    except Exception as e:
+        print(f"Failed to fetch {url} for local metadata: {e}")
+        return None
+    return resolve(merge_candidates(candidates, html_candidates(html)), ("content_type", "author"))
@@ -1,53 +1,104 @@
-import json
+import os
+import shutil
+import tempfile
+import time
+import asyncio
+import threading
 from cli import parse_args
-from content_fetcher import fetch_content_from_url, extract_article_links
-from metadata_generator import generate_metadata, infer_title_from_probe
-from pdf_chunker import download_pdf_from_gdrive, extract_paragraphs_from_pdf, chunk_paragraphs_by_tokens
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from content_fetcher import fetch_content_from_url, iter_article_links, configure_content_cache, FeedHints
+from metadata_generator import generate_metadata, generate_metadata_batch, infer_title_from_probe, configure_llm_cache, configure_batch_sink, RESPONSE_PARSERS
+from pdf_chunker import download_pdf_from_gdrive, iter_paragraphs_from_pdf, iter_paragraphs_sharded, take_probe_paragraphs, iter_chunks_by_tokens
+from output_writer import open_writer, write_result, build_envelope_from_ndjson, output_baseline, truncate_output, ReplacingWriter
+from disk_cache import DiskCache
+from browser_pool import close_driver_pool
+from rate_limiter import configure_scheduler
+from openai_batch import BatchRequestSink, DeferredToBatch, load_batch_results
+from http_client import configure_http_cache
+from http_client import stats as http_stats
+from crawl_state import CrawlState, CHANGED, UNCHANGED, content_hash, file_hash
+from dedup import Deduplicator
+from blob_store import BlobStore, configure_blob_store
+from url_utils import strip_tracking_params
+from job_journal import JobJournal, PENDING, DISCOVERED, FETCHED, ENRICHED, WRITTEN, SKIPPED, FAILED
+from pipeline import Stage
+from metrics import get_metrics, incr, span, profiled, TimedIterator
+from markdown_chunker import configure_article_chunking, chunk_article, chunk_id
+from local_metadata import configure_local_metadata, local_metadata_enabled, resolve_article, pdf_candidates, resolve, confident_value
+from concurrent.futures import ProcessPoolExecutor
 
-def handle_url_input(url: str, user_id: str) -> dict:
+def fetch_changed_content(url: str, crawl_state=None, dedup=None, feed_hints=None) -> dict | None:
     """
-    Processes a URL using the Jina Reader API and enriches it with metadata.
+    Fetches a URL through Jina, unless it duplicates a page already seen in this run, or an
+    incremental run finds it unchanged since it was last ingested.
 
     Args:
-        url (str): The URL to process.
-        user_id (str): ID of the user initiating the request.
+        url (str): The URL to fetch, without tracking parameters.
+        crawl_state (CrawlState, optional): Crawl state of the team (--incremental).
+        dedup (Deduplicator, optional): Run-wide URL and near-duplicate content filter.
+        feed_hints (FeedHints, optional): Feed dates found by this job's discovery, checked first.
 
     Returns:
-        dict: Enriched metadata dictionary with title, content, type, etc.
+        dict: Jina content fields, or None if the article is skipped.
     """
-    content_data = fetch_content_from_url(url)
+    # The same article reached from another source or spelled differently is fetched once
+    if dedup is not None and not dedup.claim_url(url):
+        print(f"Already queued, skipping: {url}")
+        return None
+
+    decision = None
+    if crawl_state is not None:
+        # Cheap checks first: the feed's `updated` value, or a conditional HEAD request
+        with span("crawl_check"):
+            decision = crawl_state.check(url, feed_hints.updated(url) if feed_hints is not None else None)
+        if decision == UNCHANGED:
+            print(f"Unchanged since last run, skipping: {url}")
+            return None
+
+    # A page that may have changed cannot be served from the cached Jina copy
+    content_data = fetch_content_from_url(url, refresh=decision == CHANGED)
+    if crawl_state is not None and not crawl_state.content_changed(url, content_hash(content_data["content"])):
+        print(f"Content unchanged since last run, skipping: {url}")
+        return None
 
-    enriched = generate_metadata(
-        markdown=content_data["content"],
-        url=content_data["source_url"],
-        title=content_data["title"],
-        published_time=content_data.get("published_time", "")
-    )
-    enriched["user_id"] = user_id
-    return enriched
+    if dedup is not None:
+        with span("dedup"):
+            unique = dedup.claim_content(content_data["source_url"], content_data["content"])
+        if not unique:
+            return None
+    return content_data
 
-def handle_pdf_input(pdf_path: str, user_id: str = "", max_pages_for_metadata: int = 6, source_url: str = "") -> list:
+def handle_pdf_input(pdf_path: str, user_id: str = "", max_pages_for_metadata: int = 6, source_url: str = "", pdf_executor=None) -> list:
     """
     Handles parsing and enrichment of a local or downloaded PDF.
 
-    - Extracts the first few pages for metadata.
+    - Reads the PDF in a single pass, using the first few pages for metadata.
     - Attempts title inference if title is unknown.
-    - Extracts the full content and chunks it by token limit.
+    - Streams the full content through the chunker by token limit.
 
     Args:
         pdf_path (str): Path to the PDF file.
         user_id (str): Optional user ID.
         max_pages_for_metadata (int): Number of pages to extract for metadata inference.
         source_url (str): Source URL (for GDrive fallback traceability).
+        pdf_executor (ProcessPoolExecutor, optional): Pool used to extract page ranges in parallel.
 
     Returns:
         list: List of enriched content chunks.
     """
-    # Step 1: Extract paragraphs from initial pages to infer metadata
-    probe_paragraphs = extract_paragraphs_from_pdf(pdf_path, max_pages=max_pages_for_metadata)
+    # Step 1: Open the PDF once and take paragraphs from the initial pages to infer metadata
+    incr("pdf_bytes", os.path.getsize(pdf_path))
+    if pdf_executor is not None:
+        page_paragraphs = iter_paragraphs_sharded(pdf_path, pdf_executor)
+    else:
+        page_paragraphs = iter_paragraphs_from_pdf(pdf_path)
+    page_paragraphs = TimedIterator("pdf_extract", page_paragraphs)
+    probe_paragraphs, all_paragraphs = take_probe_paragraphs(page_paragraphs, max_pages_for_metadata)
     probe_text = "\n\n".join(probe_paragraphs)
-    metadata = generate_metadata(markdown=probe_text, title="", url="")
+
+    # Document properties can answer both metadata requests below (--local_metadata)
+    candidates = pdf_candidates(pdf_path) if local_metadata_enabled() else {}
+    metadata = generate_metadata(markdown=probe_text, title=confident_value(candidates, "title") or "", url="",
+                                 local_metadata=resolve(candidates))
 
     # Safe fallback values in case of missing or unknown fields
     author = metadata.get("author", "")
@@ -58,119 +109,561 @@ def handle_pdf_input(pdf_path: str, user_id: str = "", max_pages_for_metadata: i
     if not title or title.lower() in {"untitled", "unknown", ""}:
         try:
             title = infer_title_from_probe(probe_text)
+        except DeferredToBatch:
+            raise
         except Exception as e:
             print(f"Failed to infer title: {e}")
             title = "Untitled"
 
-    # Step 2: Extract full content and chunk it based on token count
-    all_paragraphs = extract_paragraphs_from_pdf(pdf_path)
-    chunks = chunk_paragraphs_by_tokens(all_paragraphs)
-
+    # Step 2: Keep reading the same stream and chunk it based on token count
+    # (the chunk timing leaves out the time spent extracting the pages it reads)
     enriched_chunks = []
-    for i, chunk in enumerate(chunks):
+    started, extracted = time.perf_counter(), page_paragraphs.spent
+    for position, chunk in enumerate(iter_chunks_by_tokens(all_paragraphs)):
         enriched = {
             "title": f"{title}",
             "content": chunk,
             "content_type": content_type,
             "source_url": source_url,
             "author": author,
-            "user_id": user_id
+            "user_id": user_id,
+            "chunk_id": chunk_id(source_url or pdf_path, chunk),
+            "position": position
         }
         enriched_chunks.append(enriched)
 
+    get_metrics().record("chunk", time.perf_counter() - started - (page_paragraphs.spent - extracted))
+    incr("chunks", len(enriched_chunks))
     return enriched_chunks
 
-def process_url(url, user_id):
+def fetch_url_document(url, crawl_state=None, dedup=None, journal=None, feed_hints=None):
     """
-    Wrapper for processing URL input with exception handling.
+    Fetches a URL's content for batched enrichment, with exception handling.
+    With a job journal, the outcome (and the fetched document) is recorded for --resume.
     """
+    key = journal.add("url", url)[0] if journal is not None else None
     try:
         print(f"Processing URL: {url}")
-        return handle_url_input(url, user_id)
+        url = strip_tracking_params(url)
+        content_data = fetch_changed_content(url, crawl_state, dedup, feed_hints)
+        if content_data is None:
+            if journal is not None:
+                journal.mark(key, SKIPPED)
+            return None
+        document = {
+            "markdown": content_data["content"],
+            "url": content_data["source_url"],
+            "title": content_data["title"],
+            "published_time": content_data.get("published_time", ""),
+            "requested_url": url,
+            "local_metadata": resolve_article(content_data, feed_hints.author(url) if feed_hints is not None else None)
+        }
+        if journal is not None:
+            journal.mark(key, FETCHED, document)
+        return document
     except Exception as e:
         print(f"Failed to process URL {url}: {e}")
+        incr("errors_fetch")
+        if journal is not None:
+            journal.mark(key, FAILED, error=str(e))
+        return None
+
+def enrich_url_batch(documents, user_id, crawl_state=None, journal=None):
+    """
+    Enriches several fetched documents with one batched metadata request.
+    With a job journal, each enriched item (or the failure) is recorded for --resume.
+
+    Returns:
+        list: One result per document, an item or its list of chunk items (--article_chunk_size), or None
+        for documents deferred to the offline batch file (they stay fetched in the journal and unrecorded in
+        the crawl state, so the run with --openai_batch_results picks them up).
+    """
+    try:
+        enriched_items = generate_metadata_batch(documents)
+    except Exception as e:
+        print(f"Failed to enrich batch of {len(documents)} URLs: {e}")
+        incr("errors_enrich", len(documents))
+        if journal is not None:
+            for document in documents:
+                journal.mark(JobJournal.key("url", document["requested_url"]), FAILED, error=str(e))
         return None
 
-def process_local_pdf(pdf_path, user_id):
+    results = []
+    for document, enriched in zip(documents, enriched_items):
+        if enriched is None:
+            print(f"Metadata request deferred to the batch file, not writing: {document['requested_url']}")
+            results.append(None)
+            continue
+        enriched["user_id"] = user_id
+        result = chunk_article(enriched)
+        if crawl_state is not None:
+            crawl_state.mark_ingested(document["requested_url"], content_hash(document["markdown"]))
+        if journal is not None:
+            journal.mark(JobJournal.key("url", document["requested_url"]), ENRICHED, result)
+        results.append(result)
+    return results
+
+def handle_changed_pdf(pdf_path: str, source: str, user_id: str, source_url: str = "", pdf_executor=None,
+                       crawl_state=None) -> list:
+    """
+    Runs handle_pdf_input, unless an incremental run finds the file unchanged since it was last ingested.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        source (str): Where the file came from (local path or Drive link), its crawl state key.
+        crawl_state (CrawlState, optional): Crawl state of the team (--incremental).
+
+    Returns:
+        list: Enriched content chunks, empty if the file is skipped.
+    """
+    digest = None
+    if crawl_state is not None:
+        digest = file_hash(pdf_path)
+        if not crawl_state.file_changed(source, digest):
+            print(f"Unchanged since last run, skipping: {source}")
+            return []
+
+    chunks = handle_pdf_input(pdf_path, user_id, source_url=source_url, pdf_executor=pdf_executor)
+    if crawl_state is not None:
+        crawl_state.mark_file_ingested(source, digest, [chunk["chunk_id"] for chunk in chunks])
+    return chunks
+
+def process_local_pdf(pdf_path, user_id, pdf_executor=None, crawl_state=None):
     """
     Wrapper for processing local PDF files.
     """
     try:
         print(f"Processing local PDF: {pdf_path}")
-        return handle_pdf_input(pdf_path, user_id)
+        return handle_changed_pdf(pdf_path, pdf_path, user_id, pdf_executor=pdf_executor, crawl_state=crawl_state)
+    except DeferredToBatch:
+        print(f"Metadata request deferred to the batch file, not writing: {pdf_path}")
+        return None
     except Exception as e:
         print(f"Failed to process PDF {pdf_path}: {e}")
+        incr("errors_pdf")
         return None
 
-def process_gdrive_pdf(gdrive_url, user_id):
+def process_gdrive_pdf(gdrive_url, user_id, pdf_executor=None, crawl_state=None):
     """
     Downloads a PDF from a Google Drive link and processes it.
     """
     try:
         print(f"Downloading and processing GDrive PDF: {gdrive_url}")
-        pdf_path = download_pdf_from_gdrive(gdrive_url)
-        return handle_pdf_input(pdf_path, user_id, source_url=gdrive_url)
+        with span("gdrive_download"):
+            pdf_path = download_pdf_from_gdrive(gdrive_url)
+        return handle_changed_pdf(pdf_path, gdrive_url, user_id, source_url=gdrive_url, pdf_executor=pdf_executor,
+                                  crawl_state=crawl_state)
+    except DeferredToBatch:
+        print(f"Metadata request deferred to the batch file, not writing: {gdrive_url}")
+        return None
     except Exception as e:
         print(f"Failed to process GDrive link {gdrive_url}: {e}")
+        incr("errors_gdrive")
         return None
 
 
-def main():
+def discover_index_links(index_url, js_discovery, feed_hints=None):
     """
-    CLI entry point:
-    - Parses args (URLs, PDFs, GDrive links, blog index pages).
-    - Extracts article links from blog indexes (RSS or HTML).
-    - Processes each URL/PDF concurrently.
-    - Saves enriched results to a specified output JSON file.
-    """
-    args = parse_args()
-    all_items = []
-    resolved_urls = list(args.urls or [])
-
-    # Step 1: Extract links from blog index pages
-    if args.blog_indexes:
-        for index_url in args.blog_indexes:
-            print(f"Extracting blog/article links from: {index_url}")
-            extracted = extract_article_links(index_url)
-            print(f"Found {len(extracted)} articles")
-            resolved_urls.extend(extracted)
-
-    # Step 2: Launch concurrent processing tasks
-    with ThreadPoolExecutor() as executor:
-        futures = []
-
-        # Submit article URL processing jobs
-        for url in resolved_urls:
-            futures.append(executor.submit(process_url, url, args.user_id))
-
-        # Submit local PDF processing jobs
-        if args.pdfs:
-            for pdf_path in args.pdfs:
-                futures.append(executor.submit(process_local_pdf, pdf_path, args.user_id))
-
-        # Submit Google Drive PDF processing jobs
-        if args.gdrive_links:
-            for link in args.gdrive_links:
-                futures.append(executor.submit(process_gdrive_pdf, link, args.user_id))
-
-        # Step 3: Collect results from all jobs
-        for future in as_completed(futures):
-            result = future.result()
-            if isinstance(result, list):
-                all_items.extend(result)
-            elif isinstance(result, dict):
-                all_items.append(result)
-
-    # Step 4: Write output to file
-    result = {
-        "team_id": args.team_id,
-        "items": all_items
+    Streams the article links of one blog index (HTML, paginated RSS, sitemaps, Selenium fallback).
+    """
+    print(f"Extracting blog/article links from: {index_url}")
+    found = 0
+    # Timed per index, leaving out the time spent waiting on a full fetch queue
+    for url in TimedIterator("discovery", iter_article_links(index_url, js_discovery, feed_hints)):
+        found += 1
+        yield url
+    print(f"Found {found} articles")
+
+def replay_journal(journal, writer):
+    """
+    Writes the stored results of every input a previous attempt of the job already finished.
+
+    Returns:
+        int: Number of inputs replayed.
+    """
+    replayed = 0
+    for kind in ("url", "pdf", "gdrive"):
+        for key, _, payload in journal.inputs(kind, (ENRICHED, WRITTEN)):
+            write_result(writer, payload)
+            journal.mark(key, WRITTEN)
+            replayed += 1
+    return replayed
+
+def seed_dedup_from_journal(journal, dedup):
+    """
+    Claims, in the job-wide filter, the URL and content of every article a previous attempt of the
+    job already fetched, so a retried or newly discovered link to one of them is still skipped.
+
+    Returns:
+        int: Number of articles claimed.
+    """
+    seeded = 0
+    for _, url, payload in journal.inputs("url", (FETCHED, ENRICHED, WRITTEN)):
+        if payload is None:
+            continue
+        if isinstance(payload, dict) and "markdown" in payload:
+            # Fetched document
+            source_url, text = payload["url"], payload["markdown"]
+        else:
+            # Enriched item, or its chunk items (--article_chunk_size)
+            items = payload if isinstance(payload, list) else [payload]
+            if not items:
+                continue
+            source_url, text = items[0].get("source_url") or url, "\n\n".join(item.get("content", "") for item in items)
+        dedup.claim_url(url)
+        dedup.claim_content(source_url, text)
+        seeded += 1
+    return seeded
+
+def run_threaded(args, writer, pdf_executor=None, crawl_state=None, dedup=None, journal=None, feed_hints=None):
+    """
+    Thread engine, a staged producer/consumer pipeline with bounded queues:
+    - discovery: streams article links out of blog indexes (`--discovery_workers` threads)
+    - fetch: fetches each URL through Jina (`--fetch_workers`), skipping duplicates and, with --incremental,
+      URLs unchanged since the last run
+    - enrich: generates metadata, `--metadata_batch_size` articles per OpenAI call (`--enrich_workers`)
+    - pdf: parses, enriches and chunks local and Google Drive PDFs (`--pdf_concurrency`), skipping, with
+      --incremental, files unchanged since the last run
+    - write: hands every item to the writer as soon as it is ready (one thread)
+
+    Every stage runs at once, so articles are processed while indexes are still being discovered
+    and PDFs do not wait behind discovery.
+
+    With a job journal (--job_dir / --resume), every input's progress is recorded. Inputs a previous
+    attempt finished are replayed from the journal, fetched documents go straight to enrichment,
+    and only the rest is processed again.
+    """
+    queue_size = args.queue_size
+
+    def url_key(url):
+        return JobJournal.key("url", url) if journal is not None else None
+
+    def discover(index_url):
+        for url in discover_index_links(index_url, args.js_discovery, feed_hints):
+            # Links already in the journal were seeded from it, or come from another source
+            if journal is None or journal.add("url", url, parent=index_url)[1]:
+                yield url
+        if journal is not None:
+            journal.mark(JobJournal.key("index", index_url), DISCOVERED)
+
+    def enrich_documents(documents):
+        items = enrich_url_batch(documents, args.user_id, crawl_state, journal) or []
+        # Deferred documents are not written (nor marked written in the journal)
+        return [(url_key(document["requested_url"]), item) for document, item in zip(documents, items) if item is not None]
+
+    def process_pdf(job):
+        kind, value = job
+        handler = process_local_pdf if kind == "pdf" else process_gdrive_pdf
+        result = handler(value, args.user_id, pdf_executor, crawl_state)
+        key = JobJournal.key(kind, value) if journal is not None else None
+        if key is not None:
+            journal.mark(key, ENRICHED if result is not None else FAILED, result)
+        return [(key, result)]
+
+    def write_item(job):
+        key, result = job
+        write_result(writer, result)
+        if key is not None:
+            journal.mark(key, WRITTEN)
+
+    write = Stage("write", write_item, 1, queue_size)
+    enrich = Stage("enrich", enrich_documents, args.enrich_workers, queue_size, batch_size=max(1, args.metadata_batch_size))
+    fetch = Stage("fetch", lambda url: [fetch_url_document(url, crawl_state, dedup, journal, feed_hints)], args.fetch_workers, queue_size)
+    discovery = Stage("discovery", discover, args.discovery_workers, queue_size)
+    pdf = Stage("pdf", process_pdf, args.pdf_concurrency, queue_size)
+
+    discovery.feeds(fetch).feeds(enrich).feeds(write)
+    pdf.feeds(write)
+
+    # Inputs of this run: from the arguments, or those a previous attempt did not finish
+    pdf_jobs = [("pdf", path) for path in args.pdfs or []] + [("gdrive", link) for link in args.gdrive_links or []]
+    index_urls = list(args.blog_indexes or [])
+    urls = list(args.urls or [])
+    fetched_documents = []
+    if journal is not None:
+        for kind, value in pdf_jobs:
+            journal.add(kind, value)
+        for index_url in index_urls:
+            journal.add("index", index_url)
+        for url in urls:
+            journal.add("url", url)
+
+        replayed = replay_journal(journal, writer)
+        if replayed:
+            print(f" Replayed {replayed} finished inputs from {journal.job_dir}")
+        if dedup is not None:
+            seed_dedup_from_journal(journal, dedup)
+        retry = (PENDING, FAILED)
+        pdf_jobs = [(kind, value) for kind in ("pdf", "gdrive") for _, value, _ in journal.inputs(kind, retry)]
+        index_urls = [value for _, value, _ in journal.inputs("index", retry)]
+        urls = [value for _, value, _ in journal.inputs("url", retry)]
+        fetched_documents = [payload for _, _, payload in journal.inputs("url", (FETCHED,))]
+
+    for stage in (write, enrich, fetch, discovery, pdf):
+        stage.start()
+
+    # Seed every stage from its own thread, so a full queue of one (e.g. PDFs) does not hold back the others
+    def seed(stage, items):
+        for item in items:
+            stage.put(item)
+        stage.close_input()
+
+    seeders = []
+    for stage, items in ((pdf, pdf_jobs), (discovery, index_urls), (fetch, urls), (enrich, fetched_documents)):
+        stage.add_producer()
+        seeders.append(threading.Thread(target=seed, args=(stage, items), name=f"seed-{stage.name}", daemon=True))
+    for seeder in seeders:
+        seeder.start()
+
+    # Stages close each other's inputs in turn, so the writer finishes last
+    write.join()
+
+
+class Runtime:
+    """
+    Process-wide state of an ingestion: persistent caches, per-provider schedulers, the Drive blob
+    store, the PDF process pool and the Batch API sink, set up from the cli.RUNTIME_SETTINGS of `args`.
+
+    `python main.py` builds one for its single job; the worker keeps one for its whole lifetime, so
+    every job shares warm clients, caches and pools, and the same Jina/OpenAI budgets.
+    """
+
+    def __init__(self, args):
+        self.args = args
+
+        # Persistent caches so repeat runs skip Jina for pages fetched within the TTL
+        # and never pay twice for an LLM call on identical input
+        self.content_cache = None
+        self.llm_cache = None
+        self.http_cache = None
+        if not args.no_cache:
+            self.content_cache = DiskCache(
+                os.path.join(args.cache_dir, "jina.sqlite3"),
+                ttl_seconds=args.cache_ttl_hours * 3600,
+                max_bytes=args.cache_max_mb * 1024 * 1024
+            )
+            self.llm_cache = DiskCache(
+                os.path.join(args.cache_dir, "llm.sqlite3"),
+                ttl_seconds=None,
+                max_bytes=args.cache_max_mb * 1024 * 1024
+            )
+            # Index pages and feeds are always revalidated, so their copies never need to expire
+            self.http_cache = DiskCache(
+                os.path.join(args.cache_dir, "http.sqlite3"),
+                ttl_seconds=None,
+                max_bytes=args.cache_max_mb * 1024 * 1024
+            )
+        configure_content_cache(self.content_cache)
+        configure_llm_cache(self.llm_cache)
+        configure_article_chunking(args.article_chunk_size or None, args.article_chunk_overlap)
+        configure_local_metadata(args.local_metadata)
+        configure_http_cache(self.http_cache)
+
+        # Offline Batch API mode: load finished results into the LLM cache, or collect requests instead of calling OpenAI
+        if (args.openai_batch_out or args.openai_batch_results) and self.llm_cache is None:
+            raise SystemExit("--openai_batch_out and --openai_batch_results need the LLM cache, remove --no-cache")
+        if args.openai_batch_results:
+            loaded, failed = load_batch_results(args.openai_batch_results, self.llm_cache, RESPONSE_PARSERS)
+            print(f" Loaded {loaded} OpenAI batch results into the LLM cache ({failed} failed)")
+        self.batch_sink = BatchRequestSink(args.openai_batch_out) if args.openai_batch_out else None
+        configure_batch_sink(self.batch_sink)
+
+        # Shared per-provider budgets and retries for every Jina and OpenAI call of the run
+        self.schedulers = [
+            configure_scheduler("jina", rpm=args.jina_rpm, max_retries=args.max_retries),
+            configure_scheduler("openai", rpm=args.openai_rpm, tpm=args.openai_tpm, max_retries=args.max_retries)
+        ]
+
+        # Drive files are kept between runs, so each one is downloaded once (only for this run with --no-cache)
+        self.blob_dir = tempfile.mkdtemp(prefix="drive-blobs-") if args.no_cache else os.path.join(args.cache_dir, "blobs")
+        self.blob_store = BlobStore(self.blob_dir, max_downloads=args.gdrive_downloads)
+        configure_blob_store(self.blob_store)
+
+        # PDF text extraction is CPU-bound, so large batches can shard pages across processes
+        self.pdf_executor = ProcessPoolExecutor(max_workers=args.pdf_workers) if args.pdf_workers > 0 else None
+        self.removed_blobs = 0
+
+    def close(self):
+        """
+        Stops the pools and cleans up the blob store (old Drive files are removed here, and the
+        whole temporary store with --no-cache).
+        """
+        if self.pdf_executor is not None:
+            self.pdf_executor.shutdown()
+        close_driver_pool()
+        args = self.args
+        if args.no_cache:
+            self.blob_store.close()
+            shutil.rmtree(self.blob_dir, ignore_errors=True)
+        else:
+            self.removed_blobs = self.blob_store.gc(args.blob_max_age_days * 24 * 3600, args.cache_max_mb * 1024 * 1024)
+            self.blob_store.close()
+        if self.batch_sink is not None:
+            self.batch_sink.close()
+
+    def report(self):
+        """
+        Prints what the caches, schedulers and metrics recorded, and exports the metrics (--metrics_out).
+        """
+        args = self.args
+        if self.blob_store.downloaded or self.blob_store.reused:
+            print(f" Drive files: {self.blob_store.downloaded} downloaded, {self.blob_store.reused} reused, "
+                  f"{self.removed_blobs} old files removed")
+
+        counters = get_metrics().snapshot()["counters"]
+        resolved = counters.get("metadata_local", 0)
+        documents = resolved + counters.get("metadata_llm", 0)
+        if args.local_metadata != "off" and documents:
+            print(f" Metadata of {resolved} of {documents} documents resolved without an LLM call ({resolved / documents:.0%})")
+
+        for name, cache in (("Jina", self.content_cache), ("LLM", self.llm_cache)):
+            if cache is not None:
+                stats = cache.stats()
+                print(f" {name} cache: {stats['hits']} hits, {stats['misses']} misses")
+
+        stats = http_stats()
+        if stats["requests"]:
+            print(f" Index/feed fetches: {stats['requests']} requests, {stats['not_modified']} not modified, {stats['bytes']} bytes")
+        for name in ("requests", "not_modified", "bytes"):
+            incr(f"http_{name}", stats[name])
+
+        for scheduler in self.schedulers:
+            stats = scheduler.stats()
+            print(f" {scheduler.name}: {stats['calls']} calls, {stats['waited']} paced, {stats['throttled']} throttled, "
+                  f"{stats['retried']} retried, {stats['failed']} failed")
+            for name in ("calls", "waited", "throttled", "retried", "failed"):
+                incr(f"{scheduler.name}_{name}", stats[name])
+
+        # Where the run's time went, per stage, with the run's counters
+        metrics = get_metrics()
+        print(metrics.summary_table())
+        if args.metrics_out:
+            metrics.export(args.metrics_out)
+            print(f" Wrote metrics to {args.metrics_out}")
+
+        if self.batch_sink is not None:
+            print(f" Wrote {self.batch_sink.count} OpenAI Batch API requests to {self.batch_sink.path}. "
+                  f"Once the batch completes, re-run with --openai_batch_results <output file>")
+
+
+def prepare_job(args) -> tuple:
+    """
+    Sets up the job journal of a checkpointed run: --job_dir starts one, --resume continues a job
+    with its original arguments.
+
+    Returns:
+        tuple: (the job's arguments, JobJournal or None)
+    """
+    journal = None
+    if args.resume:
+        job_dir = args.resume
+        cli_args = args
+        args = JobJournal.load_args(job_dir)
+        args.resume = job_dir
+        # How this attempt is measured is not part of the job
+        for name in ("metrics_out", "profile", "profile_out"):
+            setattr(args, name, getattr(cli_args, name))
+        journal = JobJournal(job_dir)
+    elif args.job_dir:
+        journal = JobJournal.create(args.job_dir, args)
+        journal.set_meta("out_baseline", str(output_baseline(args.format, args.out) if args.incremental else 0))
+    if journal is not None and args.engine != "threads":
+        journal.close()
+        raise SystemExit("--job_dir and --resume need --engine threads")
+    return args, journal
+
+
+def run_job(args, runtime: Runtime, journal=None) -> dict:
+    """
+    Runs one ingestion job with the thread engine or the asyncio engine (--engine) and saves its
+    items to --out, either as one JSON envelope or streamed item by item.
+
+    Args:
+        args (argparse.Namespace): The job's arguments (see cli.parse_args).
+        runtime (Runtime): Caches, budgets and pools the job runs with.
+        journal (JobJournal, optional): Journal of a checkpointed job, from prepare_job.
+
+    Returns:
+        dict: Items written, output path, duplicates skipped and, with a journal, input counts per state.
+    """
+    # Incremental runs only ingest articles and PDFs new or changed since the team's last run, appended to --out
+    crawl_state = CrawlState.for_team(args.state_dir, args.team_id) if args.incremental else None
+    if args.resume:
+        # Drop what the interrupted attempt wrote; the journal replays the finished items
+        truncate_output(args.format, args.out, int(journal.get_meta("out_baseline") or 0))
+        writer = open_writer(args.format, args.out, args.team_id, append=True)
+    else:
+        writer = open_writer(args.format, args.out, args.team_id, append=args.incremental)
+    if args.incremental:
+        # Items of changed articles and files take the place of the ones earlier runs wrote
+        writer = ReplacingWriter(writer, args.format)
+
+    # Job-wide filter so an article reached several ways is fetched and enriched once
+    dedup = Deduplicator(args.dedup_threshold)
+    # Feed dates and authors found by this job's discovery, dropped with the job
+    feed_hints = FeedHints()
+
+    counts = None
+    started = time.perf_counter()
+    try:
+        if args.engine == "async":
+            # Imported here so the thread engine does not need aiohttp
+            from async_pipeline import run_async_pipeline
+            asyncio.run(run_async_pipeline(args, writer, process_local_pdf, process_gdrive_pdf, runtime.pdf_executor, crawl_state, dedup, feed_hints))
+        else:
+            run_threaded(args, writer, runtime.pdf_executor, crawl_state, dedup, journal, feed_hints)
+    finally:
+        # Finish the output file, even if the run was interrupted
+        if crawl_state is not None:
+            # Local PDF chunks have no source URL, so earlier versions of a file are replaced by chunk ID
+            writer.keys.update(crawl_state.superseded)
+        writer.close()
+        if crawl_state is not None:
+            crawl_state.close()
+        if journal is not None:
+            counts = journal.counts()
+            journal.close()
+
+    incr("items_written", writer.count)
+    print(f" Successfully saved {writer.count} items to {args.out}")
+    if args.incremental:
+        print(f" Replaced {writer.replaced} items written by earlier runs")
+    if journal is not None:
+        print(f" Job {journal.job_dir}: " + ", ".join(f"{count} {state}" for state, count in sorted(counts.items())))
+        if counts.get(FAILED):
+            print(f" Retry the failed inputs with --resume {journal.job_dir}")
+    print(f" Skipped {dedup.duplicate_urls} duplicate URLs and {dedup.duplicate_pages} near-duplicate pages")
+
+    # Optionally rebuild the original JSON envelope from the NDJSON stream
+    if args.envelope and args.format == "ndjson":
+        count = build_envelope_from_ndjson(args.out, args.team_id, args.envelope)
+        print(f" Built JSON envelope with {count} items at {args.envelope}")
+
+    return {
+        "items": writer.count,
+        "out": args.out,
+        "seconds": round(time.perf_counter() - started, 3),
+        "duplicate_urls": dedup.duplicate_urls,
+        "duplicate_pages": dedup.duplicate_pages,
+        "journal": counts
     }
 
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
 
-    print(f" Successfully saved {len(all_items)} items to {args.out}")
+def main():
+    """
+    CLI entry point:
+    - Parses args (URLs, PDFs, GDrive links, blog index pages).
+    - Sets up the caches, API budgets and pools, then runs the job (see run_job).
+    - Prints cache, scheduler and per-stage metrics at the end.
+    """
+    args, journal = prepare_job(parse_args())
+    runtime = Runtime(args)
+    try:
+        with profiled(args.profile, args.profile_out):
+            run_job(args, runtime, journal)
+    finally:
+        runtime.close()
+    runtime.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+import hashlib
+import re
+
+from pdf_chunker import ENCODE_BATCH_SIZE, SEPARATOR_TOKENS, _batched, get_encoder, split_text_by_tokens
+
+# A heading starts a new chunk once the current one is at least this full
+HEADING_BREAK_FILL = 0.5
+
+# Hex digits kept from the SHA-256 of a chunk for its ID
+CHUNK_ID_LENGTH = 16
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+# Article chunking settings, set up by configure_article_chunking()
+_chunk_size = None
+_overlap = 0
+
+
+def configure_article_chunking(chunk_size: int | None, overlap: int = 0):
+    """
+    Sets how web articles are split into items (chunk_size None keeps one item per article).
+
+    Raises:
+        ValueError: If the overlap is not smaller than half a chunk.
+    """
+    global _chunk_size, _overlap
+    if chunk_size is not None and not 0 <= overlap < chunk_size // 2:
+        raise ValueError("The chunk overlap must be smaller than half the chunk size")
+    _chunk_size = chunk_size
+    _overlap = overlap
+
+
+def chunk_id(source_url: str, content: str) -> str:
+    """
+    Deterministic ID of a chunk: the same text from the same source always gets the same ID,
+    so consumers can tell which chunks of a re-ingested document changed.
+    """
+    return hashlib.sha256(f"{source_url}\n{content}".encode("utf-8")).hexdigest()[:CHUNK_ID_LENGTH]
+
+
+def iter_markdown_blocks(markdown: str):
+    """
+    Splits markdown into headings and blank-line separated blocks, keeping fenced code blocks whole.
+
+    Yields:
+        tuple: (block text, section) where section is the " > " joined path of the headings above it.
+    """
+    headings = []
+    lines = []
+    in_fence = False
+
+    def block():
+        text = "\n".join(lines).strip()
+        lines.clear()
+        return text
+
+    for line in markdown.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            heading = _HEADING.match(line)
+            if heading:
+                text = block()
+                if text:
+                    yield text, " > ".join(headings)
+                # A heading replaces the ones at its level and below
+                level = len(heading.group(1))
+                headings[level - 1:] = [heading.group(2)]
+                del headings[level:]
+                yield line.strip(), " > ".join(headings)
+                continue
+            if not line.strip():
+                text = block()
+                if text:
+                    yield text, " > ".join(headings)
+                continue
+        lines.append(line)
+
+    text = block()
+    if text:
+        yield text, " > ".join(headings)
+
+
+def _tail_text(text: str, tokens: int) -> str:
+    """
+    The last `tokens` tokens of a text, without cutting a multi-byte character in half.
+    """
+    enc = get_encoder()
+    encoded = enc.encode(text)
+    if len(encoded) <= tokens:
+        return text
+    return enc.decode_bytes(encoded[-tokens:]).decode("utf-8", errors="ignore").lstrip()
+
+
+def iter_markdown_chunks(markdown: str, chunk_size: int = 2000, overlap: int = 0):
+    """
+    Lazily groups markdown into chunks under the same token budget as pdf_chunker.iter_chunks_by_tokens,
+    breaking at headings where possible and otherwise at block boundaries.
+
+    - A heading closes the current chunk once it is HEADING_BREAK_FILL full, so sections stay together.
+    - Blocks that alone exceed `chunk_size` (long code listings, huge paragraphs) are split into token windows,
+      the first of which keeps the heading right before the block.
+    - With `overlap`, each chunk starts with the last `overlap` tokens of the previous one.
+
+    Args:
+        markdown (str): Markdown text of the article.
+        chunk_size (int, optional): Max tokens per chunk. Defaults to 2000 tokens.
+        overlap (int, optional): Tokens repeated from the end of the previous chunk. Defaults to 0.
+
+    Yields:
+        tuple: (chunk text, section) where section is the heading path of the chunk's first block.
+    """
+    enc = get_encoder()
+
+    fragments = []      # blocks of the current chunk
+    current_tokens = 0  # approximate token count of the current chunk
+    new_tokens = 0      # tokens of the current chunk that are not overlap
+    section = ""
+    heading = None      # (text, tokens, section) when the last block added is a heading
+
+    def start_next(previous: str):
+        # The next chunk opens with the end of the previous one when overlapping
+        nonlocal fragments, current_tokens, new_tokens
+        fragments, current_tokens, new_tokens = [], 0, 0
+        if overlap and previous:
+            tail = _tail_text(previous, overlap)
+            fragments, current_tokens = [tail], min(overlap, len(enc.encode(tail)))
+
+    def flush() -> str:
+        chunk = "\n\n".join(fragments).strip()
+        start_next(chunk)
+        return chunk
+
+    def add(text: str, tokens: int, block_section: str):
+        nonlocal current_tokens, new_tokens, section
+        if not new_tokens:
+            section = block_section
+        fragments.append(text)
+        current_tokens += tokens + SEPARATOR_TOKENS
+        new_tokens += tokens
+
+    for batch in _batched(iter_markdown_blocks(markdown), ENCODE_BATCH_SIZE):
+        texts = [text for text, _ in batch]
+        for (text, block_section), tokens in zip(batch, enc.encode_batch(texts)):
+            block_tokens = len(tokens)
+            is_heading = bool(_HEADING.match(text))
+
+            if is_heading and new_tokens >= chunk_size * HEADING_BREAK_FILL:
+                yield flush(), section
+
+            # Too large for any chunk: emit what we have, then the block in token windows
+            if block_tokens > chunk_size:
+                # A heading introducing the block opens its first window rather than ending up alone
+                carried = None
+                if heading is not None and heading[1] + SEPARATOR_TOKENS < chunk_size // 2:
+                    carried = heading
+                    fragments.pop()
+                    current_tokens -= carried[1] + SEPARATOR_TOKENS
+                    new_tokens -= carried[1]
+                if new_tokens:
+                    yield flush(), section
+                window = chunk_size - (carried[1] + SEPARATOR_TOKENS if carried else 0)
+                pieces = split_text_by_tokens(text, window, tokens=tokens)
+                if carried is not None:
+                    pieces[0] = f"{carried[0]}\n\n{pieces[0]}"
+                for piece in pieces[:-1]:
+                    yield piece, block_section
+                    start_next(piece)
+
+                # The last window starts the next chunk so following blocks can join it
+                fragments, current_tokens, new_tokens = [], 0, 0
+                if pieces:
+                    add(pieces[-1], len(enc.encode(pieces[-1])), block_section)
+                heading = None
+                continue
+
+            if current_tokens + block_tokens + SEPARATOR_TOKENS >= chunk_size:
+                # A heading closing the chunk moves on with the block it introduces, if both fit in one chunk
+                carried = None
+                if (heading is not None and new_tokens > heading[1]
+                        and heading[1] + block_tokens + 2 * SEPARATOR_TOKENS <= chunk_size):
+                    carried = heading
+                    fragments.pop()
+                    current_tokens -= carried[1] + SEPARATOR_TOKENS
+                    new_tokens -= carried[1]
+                if new_tokens:
+                    yield flush(), section
+
+                # The overlap is dropped when it would push this block over the budget
+                needed = block_tokens + SEPARATOR_TOKENS + (carried[1] + SEPARATOR_TOKENS if carried else 0)
+                if current_tokens + needed >= chunk_size:
+                    fragments, current_tokens = [], 0
+                if carried is not None:
+                    add(*carried)
+
+            add(text, block_tokens, block_section)
+            heading = (text, block_tokens, block_section) if is_heading else None
+
+    if new_tokens:
+        yield "\n\n".join(fragments).strip(), section
+
+
+def chunk_article(item: dict):
+    """
+    Splits an enriched article into chunk items as set up by configure_article_chunking().
+
+    Each chunk item keeps the article's metadata and gets `content` (the chunk), `chunk_id`
+    (see chunk_id), `position` (0-based order in the article) and `section` (heading path).
+
+    Returns:
+        dict | list: The item unchanged when chunking is off, otherwise the list of chunk items.
+    """
+    if _chunk_size is None:
+        return item
+
+    chunks = []
+    for position, (content, section) in enumerate(iter_markdown_chunks(item["content"], _chunk_size, _overlap)):
+        chunks.append(dict(item, content=content, chunk_id=chunk_id(item.get("source_url", ""), content),
+                           position=position, section=section))
+    return chunks
@@ -1,27 +1,269 @@
 import os
-import openai
+import json
+import asyncio
+import threading
 from dotenv import load_dotenv
 import ast
+from disk_cache import cache_key
+from metrics import incr, span
+from rate_limiter import get_scheduler
+from openai_batch import DeferredToBatch, batch_custom_id
 
 # Load environment variables from a .env file
 load_dotenv()
 
-# Initialize OpenAI client using API key from environment
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Model used for every metadata call
+MODEL = "chatgpt-4o-latest"
 
-# Function to generate metadata from a markdown string using LLM
-def generate_metadata(markdown: str, url: str = None, title: str = "Untitled", published_time: str = "") -> dict:
+# Rough allowance for the completion when estimating a call's tokens for the TPM budget
+COMPLETION_TOKENS_ESTIMATE = 300
+
+# Persistent cache for LLM responses, set up by configure_llm_cache()
+_llm_cache = None
+
+# OpenAI clients, created on first use so runs that never call the LLM skip importing openai
+# Retries are left to the shared rate limiter so they respect the run's RPM/TPM budgets
+_client = None
+# AsyncOpenAI clients by event loop: a client's connection pool is bound to the loop it was used on
+_async_clients = {}
+_client_lock = threading.Lock()
+
+# Batch API request file for offline runs, set up by configure_batch_sink()
+_batch_sink = None
+
+
+def get_client():
     """
-    Uses GPT to extract metadata fields from a given markdown:
-    - title (guessed if not explicitly present)
-    - content_type (e.g., blog, book, linkedin_post, etc.)
-    - author (organization or individual)
-    
-    Falls back to default values if LLM fails.
+    Returns the shared OpenAI client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the AsyncOpenAI client of the running event loop, creating it on first use.
+
+    Every asyncio.run gets its own client (the worker runs each async job on a new loop, several
+    at once), released by close_async_client before the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            import openai
+            client = _async_clients[loop] = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return client
+
+
+async def close_async_client():
+    """
+    Closes the running event loop's AsyncOpenAI client, if it made one.
     """
+    with _client_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def configure_llm_cache(cache):
+    """
+    Sets the DiskCache used to memoize LLM responses (None disables memoization).
+    """
+    global _llm_cache
+    _llm_cache = cache
+
+
+def configure_batch_sink(sink):
+    """
+    Sets the BatchRequestSink that uncached requests are written to instead of calling
+    OpenAI (None makes live calls again).
+    """
+    global _batch_sink
+    _batch_sink = sink
+
+
+def _strip_code_fence(raw: str) -> str:
+    """
+    Strips ```json or ``` wrappers that the model sometimes puts around its answer.
+    """
+    if raw.startswith("```json"):
+        return raw.split("```json")[-1].split("```")[0].strip()
+    if raw.startswith("```"):
+        return raw.strip("```").strip()
+    return raw
+
+
+def _cached_completion(function_name: str, messages: list, parse, temperature: float = 0.7, **request_options):
+    """
+    Runs a chat completion and parses it, memoized on (function, model, prompt).
+
+    A response is only cached once `parse` accepts it, so a malformed answer is retried
+    on the next run instead of being replayed forever. In offline batch mode, cache misses
+    are written to the Batch API file and DeferredToBatch is raised instead.
+
+    Args:
+        function_name (str): Name of the calling function, part of the cache key.
+        messages (list): Chat messages sent to the model.
+        parse (callable): Turns the raw response text into the result; raises if it is unusable.
+        temperature (float, optional): Sampling temperature.
+        **request_options: Extra chat completion parameters, e.g. response_format.
+
+    Returns:
+        The parsed result.
+    """
+    key = _completion_key(function_name, messages)
+    if _llm_cache is not None:
+        cached = _llm_cache.get(key)
+        if cached is not None:
+            incr("llm_cache_hits")
+            return parse(cached)
+    _defer_to_batch(function_name, key, messages, temperature, request_options)
+
+    with span("llm_call"):
+        response = get_scheduler("openai").call(
+            lambda: get_client().chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=temperature,
+                **request_options
+            ),
+            tokens=_estimate_tokens(messages)
+        )
+    _count_usage(response)
+    raw = response.choices[0].message.content.strip()
+    result = parse(raw)
+
+    if _llm_cache is not None:
+        _llm_cache.set(key, raw)
+    return result
+
+
+async def _cached_completion_async(function_name: str, messages: list, parse, temperature: float = 0.7):
+    """
+    Async version of _cached_completion using the event loop's AsyncOpenAI client.
+    """
+    key = _completion_key(function_name, messages)
+    if _llm_cache is not None:
+        cached = _llm_cache.get(key)
+        if cached is not None:
+            incr("llm_cache_hits")
+            return parse(cached)
+    _defer_to_batch(function_name, key, messages, temperature, {})
+
+    with span("llm_call"):
+        response = await get_scheduler("openai").call_async(
+            lambda: get_async_client().chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=temperature
+            ),
+            tokens=_estimate_tokens(messages)
+        )
+    _count_usage(response)
+    raw = response.choices[0].message.content.strip()
+    result = parse(raw)
+
+    if _llm_cache is not None:
+        _llm_cache.set(key, raw)
+    return result
+
+
+def _count_usage(response):
+    """
+    Adds a response's reported token usage to the run metrics.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        incr("llm_prompt_tokens", usage.prompt_tokens or 0)
+        incr("llm_completion_tokens", usage.completion_tokens or 0)
+
+
+def _defer_to_batch(function_name: str, key: str, messages: list, temperature: float, request_options: dict):
+    """
+    In offline batch mode, records the request under its function and cache key and raises DeferredToBatch.
+    """
+    if _batch_sink is None:
+        return
+    body = {"model": MODEL, "messages": messages, "temperature": temperature, **request_options}
+    _batch_sink.add(batch_custom_id(function_name, key), body)
+    raise DeferredToBatch(f"Request written to batch file {_batch_sink.path}")
+
+
+def _estimate_tokens(messages: list) -> int:
+    """
+    Cheap token estimate for a request (about 4 characters per token plus the completion).
+    """
+    return sum(len(message["content"]) for message in messages) // 4 + COMPLETION_TOKENS_ESTIMATE
+
+
+def _completion_key(function_name: str, messages: list) -> str:
+    """
+    Cache key for a completion: hash of (function, model, prompt).
+    """
+    return cache_key(function_name, MODEL, json.dumps(messages, sort_keys=True, ensure_ascii=False))
+
+
+def _parse_metadata(raw: str) -> dict:
+    """
+    Parses the metadata object returned by generate_metadata's prompt.
+    """
+    raw = _strip_code_fence(raw)
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        # Python-style dictionaries; literals only, as the text may come from the cache or a batch results file
+        metadata = ast.literal_eval(raw)
+        if not isinstance(metadata, dict):
+            raise ValueError("metadata is not an object")
+        return metadata
+
+
+def _parse_metadata_batch(raw: str) -> dict:
+    """
+    Parses the {"items": [...]} object returned by generate_metadata_batch's prompt.
+
+    Returns:
+        dict: Document index -> metadata dict, for every well-formed entry.
+    """
+    items = json.loads(_strip_code_fence(raw)).get("items", [])
+    parsed = {}
+    for position, item in enumerate(items):
+        if isinstance(item, dict) and "content_type" in item:
+            parsed[item.get("index", position)] = item
+    return parsed
+
+
+def _parse_text_list(raw: str) -> list:
+    """
+    Parses the JSON list of strings returned by guess_clickable_texts' prompt.
+    """
+    raw = _strip_code_fence(raw)
+
+    # Parse JSON list safely using ast
+    if not raw.startswith("["):
+        raise ValueError("LLM response not in expected format.")
+    return ast.literal_eval(raw)
+
 
+# Parser of each function's responses, for checking Batch API results before they are cached
+RESPONSE_PARSERS = {
+    "generate_metadata": _parse_metadata,
+    "generate_metadata_batch": _parse_metadata_batch,
+    "infer_title_from_probe": str,
+    "guess_clickable_texts": _parse_text_list
+}
+
+def _metadata_prompt(markdown: str) -> str:
+    """
+    Builds the prompt used by generate_metadata.
+    """
     # Prompt includes first 4000 chars of markdown for token limit safety
-    prompt = f"""
+    return f"""
         You are a structured data generator for a content ingestion pipeline.
 
         Given the following markdown content, extract ONLY:
@@ -36,44 +278,197 @@ def generate_metadata(markdown: str, url: str = None, title: str = "Untitled", p
         {markdown[:4000]}
     """
 
-    try:
-        # Use OpenAI to get metadata from markdown
-        response = client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        raw = response.choices[0].message.content.strip()
-
-        # Strip JSON formatting if wrapped in ```json or similar blocks
-        if raw.startswith("```json"):
-            raw = raw.split("```json")[-1].split("```")[0].strip()
-        elif raw.startswith("```"):
-            raw = raw.strip("```").strip()
-
-        # Use eval to parse string into dictionary (assuming trusted source)
-        metadata = eval(raw)
 
+def _metadata_result(markdown: str, url: str, title: str, metadata: dict = None) -> dict:
+    """
+    Builds the enriched item from LLM metadata, or the fallback values when `metadata` is None.
+    """
+    if metadata is None:
         return {
             "title": title,
             "content": markdown,
-            "content_type": metadata.get("content_type", "other"),
+            "content_type": "blog",
             "source_url": url or "",
-            "author": metadata.get("author", ""),
+            "author": "",
             "user_id": ""
         }
 
+    return {
+        "title": title,
+        "content": markdown,
+        "content_type": metadata.get("content_type", "other"),
+        "source_url": url or "",
+        "author": metadata.get("author", ""),
+        "user_id": ""
+    }
+
+
+# Function to generate metadata from a markdown string using LLM
+def generate_metadata(markdown: str, url: str = None, title: str = "Untitled", published_time: str = "",
+                      local_metadata: dict = None) -> dict:
+    """
+    Uses GPT to extract metadata fields from a given markdown:
+    - title (guessed if not explicitly present)
+    - content_type (e.g., blog, book, linkedin_post, etc.)
+    - author (organization or individual)
+    
+    Falls back to default values if LLM fails. With `local_metadata` (content_type and author
+    found by the local_metadata tier) no request is made.
+
+    Raises:
+        DeferredToBatch: In offline batch mode, when the request was written to the batch file.
+    """
+    if local_metadata is not None:
+        incr("metadata_local")
+        return _metadata_result(markdown, url, title, local_metadata)
+    incr("metadata_llm")
+    return _llm_metadata(markdown, url, title)
+
+
+def _llm_metadata(markdown: str, url: str, title: str) -> dict:
+    """
+    Asks the LLM for a document's metadata (generate_metadata without the local tier).
+    """
+    try:
+        # Use OpenAI to get metadata from markdown
+        metadata = _cached_completion(
+            "generate_metadata",
+            [{"role": "user", "content": _metadata_prompt(markdown)}],
+            parse=_parse_metadata
+        )
+        return _metadata_result(markdown, url, title, metadata)
+
+    except DeferredToBatch:
+        # Not a failure: the answer comes with the batch results, so nothing may be written for now
+        raise
     except Exception as e:
         # Fallback metadata if LLM call fails
         print("LLM metadata enrichment failed:", e)
-        return {
-            "title": title,
-            "content": markdown,
-            "content_type": "blog",
-            "source_url": url or "",
-            "author": "",
-            "user_id": ""
-        }
+        return _metadata_result(markdown, url, title)
+
+
+async def generate_metadata_async(markdown: str, url: str = None, title: str = "Untitled", published_time: str = "",
+                                  local_metadata: dict = None) -> dict:
+    """
+    Async version of generate_metadata that uses the event loop's AsyncOpenAI client.
+
+    Shares the prompt, cache entries and fallback values with the sync version.
+
+    Raises:
+        DeferredToBatch: In offline batch mode, when the request was written to the batch file.
+    """
+    if local_metadata is not None:
+        incr("metadata_local")
+        return _metadata_result(markdown, url, title, local_metadata)
+    incr("metadata_llm")
+
+    try:
+        metadata = await _cached_completion_async(
+            "generate_metadata",
+            [{"role": "user", "content": _metadata_prompt(markdown)}],
+            parse=_parse_metadata
+        )
+        return _metadata_result(markdown, url, title, metadata)
+
+    except DeferredToBatch:
+        raise
+    except Exception as e:
+        print("LLM metadata enrichment failed:", e)
+        return _metadata_result(markdown, url, title)
+
+
+def _batch_metadata_prompt(markdowns: list) -> str:
+    """
+    Builds one prompt asking for metadata of several documents at once.
+    """
+    # Same 4000 char excerpt per document as the single-document prompt
+    excerpts = "\n\n".join(f"### Document {i}\n{markdown[:4000]}" for i, markdown in enumerate(markdowns))
+    return f"""
+        You are a structured data generator for a content ingestion pipeline.
+
+        Below are {len(markdowns)} markdown documents. For EACH document, extract ONLY:
+        - "title" → use your best guess if not explicitly stated
+        - "content_type" → one of: blog, podcast_transcript, call_transcript, linkedin_post, reddit_comment, book, other
+        - "author" → person or org name (leave empty if unknown)
+
+        Respond ONLY with a JSON object of the form
+        {{"items": [{{"index": 0, "title": "...", "content_type": "...", "author": "..."}}]}}
+        with exactly one entry per document, using the document numbers as "index".
+
+        Documents:
+        ---
+        {excerpts}
+    """
+
+
+def generate_metadata_batch(documents: list) -> list:
+    """
+    Generates metadata for several documents with one OpenAI request.
+
+    Documents already in the LLM cache are served from it. The rest are packed into a single
+    JSON-mode request; each answer is also stored under the single-document cache key, so later
+    runs hit the cache whichever way they ask. Documents missing from the batched answer (or all
+    of them, if the request fails) fall back to single requests one at a time. Documents the
+    local tier already resolved are not sent at all.
+
+    Args:
+        documents (list): Dicts with keys markdown, url, title, published_time and optionally local_metadata.
+
+    Returns:
+        list: Enriched metadata dictionaries, in the same order as `documents`; None for documents
+        whose request was written to the offline batch file instead.
+    """
+    results = [None] * len(documents)
+    keys = [_completion_key("generate_metadata", [{"role": "user", "content": _metadata_prompt(doc["markdown"])}])
+            for doc in documents]
+
+    pending = []
+    for i, doc in enumerate(documents):
+        if doc.get("local_metadata") is not None:
+            incr("metadata_local")
+            results[i] = _metadata_result(doc["markdown"], doc.get("url"), doc.get("title", "Untitled"), doc["local_metadata"])
+            continue
+        incr("metadata_llm")
+        cached = _llm_cache.get(keys[i]) if _llm_cache is not None else None
+        if cached is not None:
+            try:
+                results[i] = _metadata_result(doc["markdown"], doc.get("url"), doc.get("title", "Untitled"), _parse_metadata(cached))
+                continue
+            except Exception:
+                pass
+        pending.append(i)
+
+    # Offline batch mode writes one request per document instead of packing them
+    if len(pending) > 1 and _batch_sink is None:
+        try:
+            batch = _cached_completion(
+                "generate_metadata_batch",
+                [{"role": "user", "content": _batch_metadata_prompt([documents[i]["markdown"] for i in pending])}],
+                parse=_parse_metadata_batch,
+                response_format={"type": "json_object"}
+            )
+            for position, i in enumerate(pending):
+                metadata = batch.get(position)
+                if metadata is None:
+                    continue
+                doc = documents[i]
+                results[i] = _metadata_result(doc["markdown"], doc.get("url"), doc.get("title", "Untitled"), metadata)
+                if _llm_cache is not None:
+                    _llm_cache.set(keys[i], json.dumps(metadata, ensure_ascii=False))
+
+        except Exception as e:
+            print(f"Batched metadata enrichment failed, falling back to single calls: {e}")
+
+    # Single calls only for documents the batch did not cover
+    for i, doc in enumerate(documents):
+        if results[i] is None:
+            try:
+                results[i] = _llm_metadata(doc["markdown"], doc.get("url"), doc.get("title", "Untitled"))
+            except DeferredToBatch:
+                # Every other document still gets its request written
+                continue
+
+    return results
 
 
 # Function to infer a document title from the start of its content
@@ -94,14 +489,12 @@ def infer_title_from_probe(probe_text: str) -> str:
         Title:
     """
 
-    response = client.chat.completions.create(
-        model="chatgpt-4o-latest",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
+    return _cached_completion(
+        "infer_title_from_probe",
+        [{"role": "user", "content": prompt}],
+        parse=str
     )
 
-    return response.choices[0].message.content.strip()
-
 
 # Function to extract probable clickable article titles from a markdown index page
 def guess_clickable_texts(markdown: str) -> list:
@@ -132,30 +525,15 @@ def guess_clickable_texts(markdown: str) -> list:
     """
 
     try:
-        response = client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[
+        return _cached_completion(
+            "guess_clickable_texts",
+            [
                 {"role": "system", "content": "You are a semantic web parser."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.7
+            parse=_parse_text_list
         )
 
-        raw = response.choices[0].message.content.strip()
-
-        # Remove code block wrappers if present
-        if raw.startswith("```json"):
-            raw = raw.split("```json")[-1].split("```")[0].strip()
-        elif raw.startswith("```"):
-            raw = raw.strip("```").strip()
-
-        # Parse JSON list safely using ast
-        if raw.startswith("["):
-            return ast.literal_eval(raw)
-
-        print("LLM response not in expected format.")
-        return []
-
     except Exception as e:
         print(f"Failed to guess clickable texts: {e}")
         return []
@@ -0,0 +1,270 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Latencies kept per span for percentiles; later ones only update the histogram
+MAX_SAMPLES = 100000
+
+
+class _Span:
+    """
+    Latency record of one stage: a sample list for percentiles and cumulative histogram buckets.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = []
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """
+    Run-wide instrumentation: latency spans per stage, counters (bytes, tokens, errors, cache hits,
+    retries) and gauges sampled over time (queue depths). Safe to share between threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._spans.setdefault(name, _Span()).add(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Times the body of a `with` block as one sample of stage `name`, whether it returns or raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def incr(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        """
+        Samples a gauge such as a queue depth; the last, max and mean values are kept.
+        """
+        with self._lock:
+            gauge = self._gauges.setdefault(name, {"last": 0, "max": 0, "sum": 0, "samples": 0})
+            gauge["last"] = value
+            gauge["max"] = max(gauge["max"], value)
+            gauge["sum"] += value
+            gauge["samples"] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns every span, counter and gauge as plain data.
+        """
+        with self._lock:
+            spans = {
+                name: {
+                    "count": span.count,
+                    "total_seconds": span.total,
+                    "mean_seconds": span.total / span.count if span.count else 0.0,
+                    "p50_seconds": span.percentile(0.5),
+                    "p95_seconds": span.percentile(0.95),
+                    "max_seconds": span.max,
+                    "buckets": dict(zip(LATENCY_BUCKETS, span.buckets))
+                }
+                for name, span in self._spans.items()
+            }
+            gauges = {
+                name: {"last": g["last"], "max": g["max"], "mean": g["sum"] / g["samples"] if g["samples"] else 0}
+                for name, g in self._gauges.items()
+            }
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "spans": spans,
+                "counters": dict(self._counters),
+                "gauges": gauges
+            }
+
+    def summary_table(self) -> str:
+        """
+        Renders the spans, counters and gauges as the text table printed at the end of a run.
+        """
+        data = self.snapshot()
+        lines = [f" Stage timings (wall {data['wall_seconds']:.1f}s)",
+                 f"  {'stage':<16}{'count':>8}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, span in sorted(data["spans"].items(), key=lambda item: -item[1]["total_seconds"]):
+            lines.append(
+                f"  {name:<16}{span['count']:>8}{span['total_seconds']:>10.2f}{span['mean_seconds'] * 1000:>10.1f}"
+                f"{span['p50_seconds'] * 1000:>10.1f}{span['p95_seconds'] * 1000:>10.1f}{span['max_seconds'] * 1000:>10.1f}"
+            )
+        if data["counters"]:
+            lines.append(" Counters")
+            for name, value in sorted(data["counters"].items()):
+                lines.append(f"  {name:<32}{value:>14,.0f}")
+        if data["gauges"]:
+            lines.append(" Queue depths")
+            for name, gauge in sorted(data["gauges"].items()):
+                lines.append(f"  {name:<32}max {gauge['max']:>6}  mean {gauge['mean']:>8.1f}")
+        return "\n".join(lines)
+
+    def export(self, path: str):
+        """
+        Writes the metrics as JSON, or in the Prometheus textfile format when `path` ends in .prom.
+        """
+        data = self.snapshot()
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(_prometheus_text(data))
+            else:
+                json.dump(data, f, indent=2)
+
+
+def _metric_name(name: str) -> str:
+    return "ingest_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_text(data: dict) -> str:
+    """
+    Renders a snapshot in the Prometheus text exposition format (for the node_exporter textfile collector).
+    """
+    lines = ["# TYPE ingest_stage_seconds histogram"]
+    for name, span in data["spans"].items():
+        for bound, count in span["buckets"].items():
+            lines.append(f'ingest_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'ingest_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {span["count"]}')
+        lines.append(f'ingest_stage_seconds_sum{{stage="{name}"}} {span["total_seconds"]}')
+        lines.append(f'ingest_stage_seconds_count{{stage="{name}"}} {span["count"]}')
+    for name, value in data["counters"].items():
+        lines.append(f"# TYPE {_metric_name(name)}_total counter")
+        lines.append(f"{_metric_name(name)}_total {value}")
+    for name, gauge in data["gauges"].items():
+        lines.append(f"# TYPE {_metric_name(name)}_max gauge")
+        lines.append(f"{_metric_name(name)}_max {gauge['max']}")
+    lines.append("# TYPE ingest_wall_seconds gauge")
+    lines.append(f"ingest_wall_seconds {data['wall_seconds']}")
+    return "\n".join(lines) + "\n"
+
+
+# Registry shared by every module of a run
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def span(name: str):
+    """
+    Times a stage on the shared registry: `with span("jina_fetch"): ...`
+    """
+    return _metrics.span(name)
+
+
+def incr(name: str, amount: float = 1):
+    _metrics.incr(name, amount)
+
+
+def observe(name: str, value: float):
+    _metrics.observe(name, value)
+
+
+class TimedIterator:
+    """
+    Wraps an iterator to time how long producing its items takes (not consuming them), recorded as
+    one sample of stage `name` once it is exhausted. `spent` holds the time so far, so a caller
+    timing a loop around it can subtract the producer's share.
+    """
+
+    def __init__(self, name: str, iterable):
+        self.name = name
+        self.spent = 0.0
+        self._iterator = iter(iterable)
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self.spent += time.perf_counter() - start
+            if not self._done:
+                self._done = True
+                _metrics.record(self.name, self.spent)
+            raise
+        self.spent += time.perf_counter() - start
+        return item
+
+
+@contextmanager
+def profiled(profiler: str | None, out_path: str | None):
+    """
+    Optionally profiles the body of a `with` block with cProfile or pyinstrument.
+
+    Args:
+        profiler (str | None): "cprofile", "pyinstrument", or None to do nothing.
+        out_path (str | None): cProfile stats file, or pyinstrument HTML report; without it
+            the top of the profile is printed.
+    """
+    if profiler is None:
+        yield
+        return
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise SystemExit("--profile pyinstrument needs `pip install pyinstrument`")
+        profiler_instance = Profiler()
+        profiler_instance.start()
+        try:
+            yield
+        finally:
+            profiler_instance.stop()
+            if out_path:
+                with open(out_path, "w", encoding="utf-8") as f:
+                    f.write(profiler_instance.output_html())
+            else:
+                print(profiler_instance.output_text())
+        return
+
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        if out_path:
+            profile.dump_stats(out_path)
+        else:
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(25)
@@ -0,0 +1,103 @@
+import json
+import threading
+
+# Endpoint every request in a Batch API file targets
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+class DeferredToBatch(Exception):
+    """
+    Raised instead of calling OpenAI when a request was written to a Batch API file.
+    """
+
+
+def batch_custom_id(function_name: str, key: str) -> str:
+    """
+    custom_id of a Batch API request: the name of the function that made it and its LLM cache key.
+    """
+    return f"{function_name}:{key}"
+
+
+class BatchRequestSink:
+    """
+    Collects chat completion requests into an OpenAI Batch API JSONL file.
+
+    Each request's `custom_id` is "<function>:<LLM cache key>" (see batch_custom_id), so the results
+    can be checked with the function's parser, loaded straight into the cache with load_batch_results
+    and picked up by the next normal run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def add(self, custom_id: str, body: dict):
+        """
+        Writes one request line, skipping requests already written in this run.
+        """
+        with self._lock:
+            if custom_id in self._seen:
+                return
+            self._seen.add(custom_id)
+            line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def load_batch_results(results_path: str, cache, parsers: dict) -> tuple:
+    """
+    Loads a Batch API output file into the LLM cache.
+
+    Each response is run through the parser of the function that made the request first, the same
+    check a live response passes before it is cached, so a malformed answer is asked again by the
+    next run instead of failing from the cache forever.
+
+    Args:
+        results_path (str): JSONL file downloaded from a completed batch.
+        cache (DiskCache): LLM cache the requests were keyed against.
+        parsers (dict): Function name -> parser of its responses (metadata_generator.RESPONSE_PARSERS).
+
+    Returns:
+        tuple: (number of responses loaded, number of failed or unparseable requests)
+    """
+    loaded = 0
+    failed = 0
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+
+            if record.get("error") or response.get("status_code") != 200:
+                failed += 1
+                continue
+
+            choices = response.get("body", {}).get("choices") or []
+            if not choices:
+                failed += 1
+                continue
+
+            function_name, _, key = record["custom_id"].rpartition(":")
+            parse = parsers.get(function_name)
+            raw = (choices[0].get("message", {}).get("content") or "").strip()
+            try:
+                if parse is None:
+                    raise ValueError(f"no parser for {function_name or 'requests without a function name'}")
+                parse(raw)
+            except Exception as e:
+                print(f"Skipping batch result {record['custom_id']}: {e}")
+                failed += 1
+                continue
+
+            cache.set(key, raw)
+            loaded += 1
+
+    return loaded, failed
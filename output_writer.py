@@ -0,0 +1,457 @@
+import io
+import json
+import os
+
+from metrics import span
+
+# Output formats accepted by --format
+OUTPUT_FORMATS = ("json", "ndjson", "ndjson.zst", "parquet")
+
+# Optional packages needed by some formats: format -> (module, pip package)
+FORMAT_DEPENDENCIES = {
+    "ndjson.zst": ("zstandard", "zstandard"),
+    "parquet": ("pyarrow", "pyarrow")
+}
+
+# Item fields stored as Parquet columns, in item order; anything else goes to the JSON `extra` column
+PARQUET_COLUMNS = ("title", "content", "content_type", "source_url", "author", "user_id", "chunk_id", "position", "section")
+
+# Columns whose values repeat across items (every chunk of a PDF shares them), stored dictionary-encoded
+PARQUET_DICTIONARY_COLUMNS = ("title", "content_type", "source_url", "author", "user_id", "section")
+
+# Items per Parquet row group: the unit buffered in memory, and skipped as a whole by filtered reads
+PARQUET_ROW_GROUP_ITEMS = 1000
+
+# zstd level for ndjson.zst and Parquet pages
+ZSTD_LEVEL = 3
+
+# Items between zstd block flushes, so a crash loses at most this many items of an ndjson.zst file
+ZSTD_FLUSH_ITEMS = 100
+
+
+class JsonWriter:
+    """
+    Buffers every item and writes the {"team_id", "items"} envelope when closed.
+
+    This is the original output format; memory grows with the number of items.
+    With append=True the items of an existing envelope at `path` are kept.
+    """
+
+    def __init__(self, path: str, team_id: str, append: bool = False):
+        self.path = path
+        self.team_id = team_id
+        self.items = []
+        self.count = 0
+        if append and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.items = json.load(f).get("items", [])
+
+    def write(self, item: dict):
+        self.items.append(item)
+        self.count += 1
+
+    def close(self):
+        result = {
+            "team_id": self.team_id,
+            "items": self.items
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+class NdjsonWriter:
+    """
+    Writes one JSON object per line as soon as each item is available.
+
+    Every line is flushed to disk immediately, so memory stays flat and a late failure
+    keeps everything written so far. With append=True new lines go after the existing ones.
+    """
+
+    def __init__(self, path: str, team_id: str, append: bool = False):
+        self.path = path
+        self.team_id = team_id
+        self.count = 0
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, item: dict):
+        self.file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+class ZstdNdjsonWriter:
+    """
+    Writes NDJSON through a zstd stream, typically 5-10x smaller than plain NDJSON.
+
+    Each writer adds one zstd frame, so appending to an existing file keeps it readable
+    (kb_reader reads across frames). Output is flushed every ZSTD_FLUSH_ITEMS items.
+    """
+
+    def __init__(self, path: str, team_id: str, append: bool = False):
+        import zstandard
+
+        self.path = path
+        self.team_id = team_id
+        self.count = 0
+        self._flush_block = zstandard.FLUSH_BLOCK
+        self.file = open(path, "ab" if append else "wb")
+        self.stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self.file, closefd=False)
+
+    def write(self, item: dict):
+        self.stream.write((json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.count += 1
+        if self.count % ZSTD_FLUSH_ITEMS == 0:
+            self.stream.flush(self._flush_block)
+            self.file.flush()
+
+    def close(self):
+        # Ends the frame, so a later append starts a new one
+        self.stream.close()
+        self.file.close()
+
+
+def parquet_schema():
+    """
+    Arrow schema of the Parquet output: strings (dictionary-encoded where values repeat), the chunk
+    position, and `extra` for fields outside PARQUET_COLUMNS as JSON.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for name in PARQUET_COLUMNS:
+        if name == "position":
+            fields.append(pa.field(name, pa.int64()))
+        elif name in PARQUET_DICTIONARY_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    fields.append(pa.field("extra", pa.string()))
+    return pa.schema(fields)
+
+
+def _open_parquet_file(path: str, schema):
+    """
+    pyarrow ParquetWriter with the output's compression and dictionary settings.
+    """
+    import pyarrow.parquet as pq
+
+    return pq.ParquetWriter(
+        path,
+        schema,
+        compression="zstd",
+        compression_level=ZSTD_LEVEL,
+        use_dictionary=list(PARQUET_DICTIONARY_COLUMNS)
+    )
+
+
+def _parquet_row(item: dict) -> dict:
+    row = {name: item.get(name) for name in PARQUET_COLUMNS}
+    extra = {key: value for key, value in item.items() if key not in PARQUET_COLUMNS}
+    row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return row
+
+
+class ParquetWriter:
+    """
+    Writes items to a zstd-compressed Parquet file, PARQUET_ROW_GROUP_ITEMS items per row group.
+
+    Repeated fields are dictionary-encoded and the team ID is kept in the file's key-value metadata.
+    Parquet files cannot be appended to, so the file is written next to `path` and moved into place
+    on close; with append=True the existing rows are copied over first. Until then, an interrupted
+    run leaves the previous file untouched.
+    """
+
+    def __init__(self, path: str, team_id: str, append: bool = False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.path = path
+        self.team_id = team_id
+        self.count = 0
+        self.rows = []
+        self.schema = parquet_schema().with_metadata({"team_id": team_id or ""})
+        self.tmp_path = f"{path}.tmp"
+        self.writer = _open_parquet_file(self.tmp_path, self.schema)
+
+        if append and os.path.exists(path):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_ROW_GROUP_ITEMS):
+                self.writer.write_table(pa.Table.from_batches([batch]).cast(self.schema))
+
+    def write(self, item: dict):
+        self.rows.append(_parquet_row(item))
+        self.count += 1
+        if len(self.rows) >= PARQUET_ROW_GROUP_ITEMS:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            self.writer.write_table(self._pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def open_writer(fmt: str, path: str, team_id: str, append: bool = False):
+    """
+    Creates the output writer for a given --format value.
+
+    Args:
+        fmt (str): One of OUTPUT_FORMATS.
+        path (str): Output file path.
+        team_id (str): Team ID stored in the envelope.
+        append (bool): Keep the items already in the output file (incremental runs).
+
+    Returns:
+        A writer with write(item), close() and a running `count`.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if fmt == "json":
+        return JsonWriter(path, team_id, append)
+    if fmt == "ndjson":
+        return NdjsonWriter(path, team_id, append)
+    if fmt == "ndjson.zst":
+        return ZstdNdjsonWriter(path, team_id, append)
+    if fmt == "parquet":
+        return ParquetWriter(path, team_id, append)
+    raise ValueError(f"Unsupported output format: {fmt}")
+
+
+def output_baseline(fmt: str, path: str) -> int:
+    """
+    Size of an existing output before a run appends to it: bytes for (compressed) NDJSON, items for JSON and Parquet.
+    """
+    if not os.path.exists(path):
+        return 0
+    if fmt in ("ndjson", "ndjson.zst"):
+        return os.path.getsize(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, "r", encoding="utf-8") as f:
+        return len(json.load(f).get("items", []))
+
+
+def truncate_output(fmt: str, path: str, baseline: int):
+    """
+    Cuts an output back to its output_baseline, dropping whatever a previous attempt of the run added.
+    """
+    if not os.path.exists(path):
+        return
+    # The baseline of an ndjson.zst file is the end of a frame, so the cut leaves whole frames
+    if fmt in ("ndjson", "ndjson.zst"):
+        with open(path, "r+b") as f:
+            f.truncate(baseline)
+        return
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(path)
+        remaining = baseline
+        with _open_parquet_file(f"{path}.tmp", source.schema_arrow) as writer:
+            for batch in source.iter_batches(batch_size=PARQUET_ROW_GROUP_ITEMS):
+                if remaining <= 0:
+                    break
+                batch = batch.slice(0, remaining)
+                writer.write_table(pa.Table.from_batches([batch]))
+                remaining -= batch.num_rows
+        os.replace(f"{path}.tmp", path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    result["items"] = result.get("items", [])[:baseline]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+def item_key(item: dict) -> str | None:
+    """
+    What identifies the document an item came from, for replacing it in incremental runs: its source
+    URL, or its chunk ID for the chunks of local PDFs (which have no source URL).
+    """
+    return item.get("source_url") or item.get("chunk_id")
+
+
+def _iter_lines(fmt: str, f):
+    """
+    Non-blank lines of an NDJSON or ndjson.zst file opened in binary mode.
+    """
+    if fmt == "ndjson.zst":
+        import zstandard
+        f = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=False)
+    for line in io.TextIOWrapper(f, encoding="utf-8"):
+        if line.strip():
+            yield line
+
+
+def count_items(fmt: str, path: str) -> int:
+    """
+    Number of items in an output file.
+    """
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            return len(json.load(f).get("items", []))
+    with open(path, "rb") as f:
+        return sum(1 for _ in _iter_lines(fmt, f))
+
+
+def drop_superseded(fmt: str, path: str, new_items: int, keys: set) -> int:
+    """
+    Removes the items an incremental run replaced: those before the last `new_items` items of the
+    output whose item_key is in `keys`. The file is streamed into a copy, which only replaces it if
+    something was removed.
+
+    Returns:
+        int: Number of items removed.
+    """
+    if not keys or not os.path.exists(path):
+        return 0
+    old_items = count_items(fmt, path) - new_items
+    tmp_path = f"{path}.tmp"
+    dropped = 0
+
+    if fmt == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        items = result.get("items", [])
+        result["items"] = [item for i, item in enumerate(items) if i >= old_items or item_key(item) not in keys]
+        dropped = len(items) - len(result["items"])
+        if dropped:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+        return dropped
+
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(path)
+        position = 0
+        with _open_parquet_file(tmp_path, source.schema_arrow) as writer:
+            for batch in source.iter_batches(batch_size=PARQUET_ROW_GROUP_ITEMS):
+                table = pa.Table.from_batches([batch])
+                # Same rule as item_key, on whole columns
+                urls = table.column("source_url").to_pylist()
+                chunk_ids = table.column("chunk_id").to_pylist()
+                mask = [position + i >= old_items or (url or chunk) not in keys
+                        for i, (url, chunk) in enumerate(zip(urls, chunk_ids))]
+                kept = pc.filter(table, pa.array(mask))
+                dropped += table.num_rows - kept.num_rows
+                writer.write_table(kept)
+                position += table.num_rows
+    else:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            out = dst
+            if fmt == "ndjson.zst":
+                import zstandard
+                out = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(dst, closefd=False)
+            for position, line in enumerate(_iter_lines(fmt, src)):
+                if position < old_items and item_key(json.loads(line)) in keys:
+                    dropped += 1
+                    continue
+                out.write((line.rstrip("\n") + "\n").encode("utf-8"))
+            if out is not dst:
+                out.close()
+
+    if dropped:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return dropped
+
+
+class ReplacingWriter:
+    """
+    Writer of an incremental run: items are appended by the wrapped writer as usual, and when it is
+    closed the items they replace (same item_key, written by earlier runs) are removed from the output,
+    so a changed article or file is not kept next to its stale copy.
+    """
+
+    def __init__(self, writer, fmt: str):
+        self.writer = writer
+        self.fmt = fmt
+        self.path = writer.path
+        self.keys = set()
+        self.replaced = 0
+
+    @property
+    def count(self) -> int:
+        return self.writer.count
+
+    def write(self, item: dict):
+        key = item_key(item)
+        if key:
+            self.keys.add(key)
+        self.writer.write(item)
+
+    def close(self):
+        self.writer.close()
+        with span("replace"):
+            self.replaced = drop_superseded(self.fmt, self.path, self.writer.count, self.keys)
+
+
+def write_result(writer, result):
+    """
+    Writes a job result to the writer: a list of items (PDF chunks), a single item, or None on failure.
+    """
+    with span("write"):
+        if isinstance(result, list):
+            for item in result:
+                writer.write(item)
+        elif isinstance(result, dict):
+            writer.write(result)
+
+
+def iter_ndjson(path: str):
+    """
+    Lazily reads items back from an NDJSON file, skipping blank lines.
+
+    Yields:
+        dict: One item per line.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def build_envelope_from_ndjson(ndjson_path: str, team_id: str, out_path: str) -> int:
+    """
+    Builds the {"team_id", "items"} JSON envelope from an NDJSON stream, one item at a time.
+
+    The result is byte-for-byte what json.dump(..., indent=2) would produce for the same items,
+    without loading them all into memory.
+
+    Args:
+        ndjson_path (str): NDJSON file written by NdjsonWriter.
+        team_id (str): Team ID stored in the envelope.
+        out_path (str): Path of the JSON file to write.
+
+    Returns:
+        int: Number of items written.
+    """
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        out.write(f'  "team_id": {json.dumps(team_id, ensure_ascii=False)},\n')
+        out.write('  "items": [')
+
+        for item in iter_ndjson(ndjson_path):
+            # Nest each pretty-printed item two levels deep, like json.dump does
+            rendered = json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+            out.write(("," if count else "") + "\n    " + rendered)
+            count += 1
+
+        out.write("\n  ]\n}" if count else "]\n}")
+    return count
@@ -1,37 +1,139 @@
-import re
-import tempfile
-import gdown
-import tiktoken
-import fitz  # PyMuPDF, used for extracting text from PDFs
+import os
+from collections import deque
+from functools import lru_cache
+from itertools import chain, islice
+from blob_store import extract_drive_file_id, get_blob_store
+
+# Paragraphs are handed to tiktoken's encode_batch in groups of this size
+ENCODE_BATCH_SIZE = 256
+
+# Pages handed to each extraction worker process at a time
+PAGES_PER_SHARD = 16
+
+# Tokens added by the "\n\n" separator when a paragraph joins a chunk
+SEPARATOR_TOKENS = 1
 
 
 def download_pdf_from_gdrive(gdrive_url: str) -> str:
     """
-    Downloads a PDF file from a Google Drive shareable link.
+    Downloads a PDF file from a Google Drive shareable link into the local blob store.
+    Files already in the store are not downloaded again.
 
     Args:
         gdrive_url (str): Google Drive shareable link in the form 'https://drive.google.com/file/d/FILE_ID/view?...'
 
     Returns:
-        str: Local path to the downloaded PDF file.
+        str: Local path to the downloaded PDF file (owned by the store, do not delete it).
 
     Raises:
         ValueError: If the Google Drive link is invalid or malformed.
     """
     # Extract the file ID from the Google Drive link using regex
-    match = re.search(r'/d/([\w-]+)', gdrive_url)
-    if not match:
-        raise ValueError("Invalid Google Drive link")
+    file_id = extract_drive_file_id(gdrive_url)
+
+    # Streamed, resumable and shared between runs
+    return get_blob_store().fetch(file_id)
+
+
+def iter_paragraphs_from_pdf(pdf_path: str, max_pages: int = None):
+    """
+    Lazily extracts paragraphs from a PDF file, page by page, optionally limiting to the first `max_pages` pages.
+
+    The document is opened once and closed when the generator is exhausted or closed.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        max_pages (int, optional): Maximum number of pages to parse. Defaults to None (parse all pages).
+
+    Yields:
+        tuple: (page_number, paragraph) with 0-based page numbers.
+    """
+    import fitz  # PyMuPDF, imported on first use so runs without PDFs do not load it
+
+    with fitz.open(pdf_path) as doc:
+        for i, page in enumerate(doc):
+            # Stop processing if max_pages is specified and reached
+            if max_pages and i >= max_pages:
+                break
+
+            for para in _split_page_paragraphs(page):
+                yield i, para
+
+
+def _split_page_paragraphs(page) -> list:
+    """
+    Extracts plain text from a PDF page and splits it into paragraphs based on double newline.
+    """
+    text = page.get_text("text")
+    return [para.strip() for para in text.split("\n\n") if para.strip()]
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> list:
+    """
+    Extracts paragraphs from pages [start, stop) of a PDF file.
 
-    file_id = match.group(1)
+    Module-level so it can run inside a ProcessPoolExecutor worker.
 
-    # Create a temporary file path for the downloaded PDF
-    output = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    Args:
+        pdf_path (str): Path to the PDF file.
+        start (int): First page number (0-based, inclusive).
+        stop (int): Last page number (exclusive).
+
+    Returns:
+        list: List of (page_number, paragraph) tuples in page order.
+    """
+    import fitz
+
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, min(stop, doc.page_count)):
+            for para in _split_page_paragraphs(doc[i]):
+                results.append((i, para))
+    return results
 
-    # Download the file using gdown
-    gdown.download(f"https://drive.google.com/uc?id={file_id}", output.name, quiet=False)
 
-    return output.name
+def iter_paragraphs_sharded(pdf_path: str, executor, pages_per_shard: int = PAGES_PER_SHARD, max_in_flight: int = None):
+    """
+    Extracts paragraphs from a PDF file by splitting it into page ranges that run in a process pool.
+
+    Shards are merged back in page order, so the output matches iter_paragraphs_from_pdf.
+    Only `max_in_flight` shards are queued at once to keep memory bounded on large documents.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        executor (ProcessPoolExecutor): Pool that runs extract_page_range.
+        pages_per_shard (int, optional): Number of pages per worker task.
+        max_in_flight (int, optional): Max shards submitted ahead of the consumer. Defaults to twice the CPU count.
+
+    Yields:
+        tuple: (page_number, paragraph) with 0-based page numbers.
+    """
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    max_in_flight = max_in_flight or (os.cpu_count() or 4) * 2
+    shards = iter(range(0, page_count, pages_per_shard))
+    pending = deque()
+
+    def submit_next():
+        start = next(shards, None)
+        if start is not None:
+            pending.append(executor.submit(extract_page_range, pdf_path, start, start + pages_per_shard))
+
+    try:
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while pending:
+            # Wait on the oldest shard so paragraphs come out in page order
+            future = pending.popleft()
+            submit_next()
+            yield from future.result()
+    finally:
+        for future in pending:
+            future.cancel()
 
 
 def extract_paragraphs_from_pdf(pdf_path: str, max_pages: int = None) -> list:
@@ -45,58 +147,177 @@ def extract_paragraphs_from_pdf(pdf_path: str, max_pages: int = None) -> list:
     Returns:
         list: A list of paragraph strings extracted from the PDF.
     """
-    doc = fitz.open(pdf_path)
-    paragraphs = []
+    return [para for _, para in iter_paragraphs_from_pdf(pdf_path, max_pages=max_pages)]
+
+
+def take_probe_paragraphs(page_paragraphs, max_pages: int) -> tuple:
+    """
+    Reads paragraphs from the first `max_pages` pages of a (page_number, paragraph) stream
+    without losing the rest of the stream.
+
+    Args:
+        page_paragraphs (iterable): Stream of (page_number, paragraph) tuples, in page order.
+        max_pages (int): Number of pages that make up the probe. Falsy means the whole stream.
 
-    for i, page in enumerate(doc):
-        # Stop processing if max_pages is specified and reached
-        if max_pages and i >= max_pages:
+    Returns:
+        tuple: (probe paragraphs list, iterator over every paragraph in the stream including the probe)
+    """
+    page_paragraphs = iter(page_paragraphs)
+    probe = []
+    overflow = []
+
+    for page_number, para in page_paragraphs:
+        if max_pages and page_number >= max_pages:
+            # First paragraph past the probe belongs to the rest of the document
+            overflow.append(para)
             break
+        probe.append(para)
 
-        # Extract plain text from page
-        text = page.get_text("text")
+    rest = (para for _, para in page_paragraphs)
+    return probe, chain(probe, overflow, rest)
+
+
+@lru_cache(maxsize=1)
+def get_encoder():
+    """
+    Returns the shared tokenizer, loading it on first use.
 
-        # Split text into paragraphs based on double newline
-        for para in text.split("\n\n"):
-            cleaned = para.strip()
-            if cleaned:
-                paragraphs.append(cleaned)
+    Returns:
+        tiktoken.Encoding: OpenAI's cl100k_base encoding (same as for gpt-3.5/4).
+    """
+    import tiktoken
 
-    return paragraphs
+    return tiktoken.get_encoding("cl100k_base")
 
 
-def chunk_paragraphs_by_tokens(paragraphs: list, chunk_size: int = 2000) -> list:
+def _batched(iterable, size: int):
     """
-    Groups a list of paragraphs into chunks, each with a maximum token count limit.
+    Yields lists of up to `size` items from any iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def split_text_by_tokens(text: str, chunk_size: int, tokens: list = None) -> list:
+    """
+    Splits a single piece of text into pieces of at most `chunk_size` tokens.
 
     Args:
-        paragraphs (list): List of paragraph strings.
-        chunk_size (int, optional): Max tokens per chunk. Defaults to 2000 tokens.
+        text (str): Text to split.
+        chunk_size (int): Max tokens per piece.
+        tokens (list, optional): Already encoded tokens of `text`, to avoid encoding twice.
 
     Returns:
-        list: List of text chunks, each under the specified token limit.
+        list: List of text pieces, in order.
     """
-    # Use OpenAI's tokenizer (same as for gpt-3.5/4's cl100k_base)
-    enc = tiktoken.get_encoding("cl100k_base")
+    enc = get_encoder()
+    if tokens is None:
+        tokens = enc.encode(text)
+
+    pieces = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + chunk_size, len(tokens))
 
-    chunks = []
-    current_chunk = ""
+        # Move the window edge back so multi-byte characters are never cut in half
+        piece = None
+        while end > start:
+            try:
+                piece = enc.decode_bytes(tokens[start:end]).decode("utf-8")
+                break
+            except UnicodeDecodeError:
+                end -= 1
+        if piece is None:
+            end = min(start + chunk_size, len(tokens))
+            piece = enc.decode(tokens[start:end])
 
-    for para in paragraphs:
-        para_tokens = len(enc.encode(para))
-        current_tokens = len(enc.encode(current_chunk))
+        if piece.strip():
+            pieces.append(piece.strip())
+        start = end
 
-        # If current chunk can fit the new paragraph, add it
-        if current_tokens + para_tokens < chunk_size:
-            current_chunk += "\n\n" + para
-        else:
-            # Save the current chunk and start a new one
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = para
+    return pieces
+
+
+def iter_chunks_by_tokens(paragraphs, chunk_size: int = 2000):
+    """
+    Lazily groups paragraphs into chunks, each with a maximum token count limit.
+
+    Every paragraph is encoded exactly once (in batches) and a running token count is kept
+    for the current chunk, so chunking is linear in the size of the document. The running
+    count is an upper bound; it is only re-checked with a real encode when a paragraph looks
+    like it will not fit, which keeps chunk boundaries identical to the original algorithm.
+    Paragraphs that alone exceed `chunk_size` are split into token windows.
+
+    Args:
+        paragraphs (iterable): Iterable of paragraph strings.
+        chunk_size (int, optional): Max tokens per chunk. Defaults to 2000 tokens.
+
+    Yields:
+        str: Text chunks, each under the specified token limit.
+    """
+    enc = get_encoder()
+
+    fragments = []       # pieces of text that make up the current chunk
+    current_tokens = 0   # token count of the current chunk (upper bound when not exact)
+    exact = True         # whether current_tokens came from encoding the whole chunk
+
+    for batch in _batched(paragraphs, ENCODE_BATCH_SIZE):
+        for para, tokens in zip(batch, enc.encode_batch(batch)):
+            para_tokens = len(tokens)
+
+            # Paragraph is too large for any chunk, split it into token windows
+            if para_tokens > chunk_size:
+                current_chunk = "".join(fragments)
+                if current_chunk:
+                    yield current_chunk.strip()
+                pieces = split_text_by_tokens(para, chunk_size, tokens=tokens)
+                yield from pieces[:-1]
+
+                # The last window starts the next chunk so following paragraphs can join it
+                tail = pieces[-1] if pieces else ""
+                fragments = [tail]
+                current_tokens = len(enc.encode(tail))
+                exact = True
+                continue
+
+            # Running count says it does not fit, confirm against the real token count
+            if current_tokens + para_tokens >= chunk_size and not exact:
+                current_tokens = len(enc.encode("".join(fragments)))
+                exact = True
+
+            # If current chunk can fit the new paragraph, add it
+            if current_tokens + para_tokens < chunk_size:
+                fragments.append("\n\n" + para)
+                current_tokens += para_tokens + SEPARATOR_TOKENS
+                exact = False
+            else:
+                # Save the current chunk and start a new one
+                current_chunk = "".join(fragments)
+                if current_chunk:
+                    yield current_chunk.strip()
+                fragments = [para]
+                current_tokens = para_tokens
+                exact = True
 
     # Add the last remaining chunk
+    current_chunk = "".join(fragments)
     if current_chunk:
-        chunks.append(current_chunk.strip())
+        yield current_chunk.strip()
+
 
-    return chunks
+def chunk_paragraphs_by_tokens(paragraphs: list, chunk_size: int = 2000) -> list:
+    """
+    Groups a list of paragraphs into chunks, each with a maximum token count limit.
+
+    Args:
+        paragraphs (list): List of paragraph strings.
+        chunk_size (int, optional): Max tokens per chunk. Defaults to 2000 tokens.
+
+    Returns:
+        list: List of text chunks, each under the specified token limit.
+    """
+    return list(iter_chunks_by_tokens(paragraphs, chunk_size=chunk_size))
@@ -0,0 +1,128 @@
+import queue
+import threading
+
+from metrics import incr, observe
+
+# Seconds a batching worker waits for more items before running a partial batch
+BATCH_WAIT_SECONDS = 0.5
+
+# Tells a worker that its stage has no more input
+_DONE = object()
+
+
+class Stage:
+    """
+    One stage of a producer/consumer pipeline: `workers` threads draining a bounded queue.
+
+    - `fn(item)` returns an iterable of outputs (a generator streams them) or None; every output
+      that is not None is put on the downstream stage's queue, blocking while that queue is full.
+    - With `batch_size` set, workers collect up to that many items (waiting at most
+      BATCH_WAIT_SECONDS for stragglers) and `fn` receives them as a list.
+    - A stage finishes once every producer feeding it has called close_input() and its queue is
+      drained, then closes its own downstream stage.
+    """
+
+    def __init__(self, name: str, fn, workers: int, queue_size: int, batch_size: int = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(maxsize=max(1, queue_size))
+        self.downstream = None
+        self._producers = 0
+        self._running = self.workers
+        self._lock = threading.Lock()
+        self._batch_lock = threading.Lock()
+        self._threads = []
+
+    def add_producer(self):
+        """
+        Registers one more producer that will call close_input() when it is done.
+        """
+        with self._lock:
+            self._producers += 1
+
+    def feeds(self, stage: "Stage") -> "Stage":
+        """
+        Sends this stage's outputs to `stage`. Returns `stage` so stages can be chained.
+        """
+        self.downstream = stage
+        stage.add_producer()
+        return stage
+
+    def put(self, item):
+        self.inbox.put(item)
+        observe(f"queue_{self.name}", self.inbox.qsize())
+
+    def close_input(self):
+        """
+        Called by a producer when it has nothing more to send. The last one stops the workers.
+        """
+        with self._lock:
+            self._producers -= 1
+            last = self._producers == 0
+        if last:
+            for _ in range(self.workers):
+                self.inbox.put(_DONE)
+
+    def start(self) -> "Stage":
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _next_batch(self):
+        """
+        Returns the next item (or list of items when batching), or _DONE once the input is closed.
+        """
+        if self.batch_size is None:
+            return self.inbox.get()
+
+        # One worker fills its batch at a time, so idle workers do not split the items into partial batches
+        with self._batch_lock:
+            return self._fill_batch()
+
+    def _fill_batch(self):
+        item = self.inbox.get()
+        if item is _DONE:
+            return item
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get(timeout=BATCH_WAIT_SECONDS)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                # Hand the sentinel back so this worker stops after running its partial batch
+                self.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self):
+        try:
+            while True:
+                item = self._next_batch()
+                if item is _DONE:
+                    return
+                try:
+                    outputs = self.fn(item)
+                    for output in outputs or ():
+                        if output is not None and self.downstream is not None:
+                            self.downstream.put(output)
+                except Exception as e:
+                    incr(f"errors_{self.name}")
+                    print(f"[{self.name}] Failed on {item!r:.200}: {e}")
+        finally:
+            # The last worker to finish closes the downstream stage's input
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last and self.downstream is not None:
+                self.downstream.close_input()
@@ -0,0 +1,247 @@
+import asyncio
+import email.utils
+import random
+import sys
+import threading
+import time
+
+import requests
+
+# Retry defaults shared by every provider
+DEFAULT_MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# HTTP statuses worth retrying: request timeout, rate limited, and transient server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Token buckets hold this many seconds of budget, so short bursts are allowed without front-loading a whole minute
+BURST_SECONDS = 10
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute` units per minute.
+
+    `reserve` always succeeds and returns how long the caller must wait before using what it
+    reserved, so concurrent callers queue up fairly instead of spinning.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.available -= amount
+            return 0.0 if self.available >= 0 else -self.available / self.rate
+
+
+def _error_status(error) -> int | None:
+    """
+    Extracts the HTTP status from a requests, openai or aiohttp error, if it has one.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after_seconds(error) -> float | None:
+    """
+    Reads Retry-After (seconds or HTTP date) or retry-after-ms from the error's response headers.
+    """
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(error) -> bool:
+    """
+    True for rate limits, timeouts, dropped connections and transient server errors.
+    """
+    status = _error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+
+    transient = (TimeoutError, ConnectionError, asyncio.TimeoutError,
+                 requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+    # openai and aiohttp are only loaded by the runs that use them, and an error of theirs
+    # means they were, so they are looked up rather than imported here. Another thread may
+    # still be importing one, so its attributes may not exist yet.
+    openai = sys.modules.get("openai")
+    if getattr(openai, "APIConnectionError", None) is not None:
+        transient += (openai.APIConnectionError,)
+    aiohttp = sys.modules.get("aiohttp")
+    if getattr(aiohttp, "ClientPayloadError", None) is not None:
+        transient += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+    return isinstance(error, transient)
+
+
+class ProviderScheduler:
+    """
+    Paces calls to one provider (Jina, OpenAI) and retries the ones that fail transiently.
+
+    - Requests-per-minute and tokens-per-minute budgets are enforced with token buckets.
+    - A 429 pauses the whole provider for its Retry-After, not just the caller that hit it.
+    - Other transient failures retry with jittered exponential backoff.
+
+    Counters: `calls`, `waited` (held back by the local budget), `throttled` (429s from the
+    provider), `retried` and `failed` (gave up or non-retryable).
+    """
+
+    def __init__(self, name: str, rpm: float = None, tpm: float = None, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.calls = 0
+        self.waited = 0
+        self.throttled = 0
+        self.retried = 0
+        self.failed = 0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Reserves budget for one call and returns how long to wait before making it.
+        """
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        delay = max(delay, self._cooldown_until - time.monotonic())
+
+        with self._lock:
+            self.calls += 1
+            if delay > 0:
+                self.waited += 1
+        return delay
+
+    def _retry_delay(self, error, attempt: int) -> float | None:
+        """
+        Returns how long to sleep before retrying `error`, or None if it should not be retried.
+        """
+        if attempt > self.max_retries or not is_retryable(error):
+            with self._lock:
+                self.failed += 1
+            return None
+
+        retry_after = _retry_after_seconds(error)
+        backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        # Full jitter keeps concurrent retries from hitting the provider in lockstep
+        delay = retry_after if retry_after is not None else random.uniform(0, backoff)
+
+        with self._lock:
+            self.retried += 1
+            if _error_status(error) == 429:
+                self.throttled += 1
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+        print(f"[{self.name}] retry {attempt}/{self.max_retries} in {delay:.1f}s after: {error}")
+        return delay
+
+    def call(self, fn, tokens: int = 0):
+        """
+        Calls `fn()` within the provider's budgets, retrying transient failures.
+
+        Args:
+            fn (callable): Makes the request; raises on failure.
+            tokens (int, optional): Estimated tokens the call will use, for the TPM budget.
+
+        Returns:
+            Whatever `fn` returns.
+        """
+        attempt = 0
+        while True:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                return fn()
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, fn, tokens: int = 0):
+        """
+        Async version of call; `fn()` must return a new awaitable on every attempt.
+        """
+        attempt = 0
+        while True:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await fn()
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "waited": self.waited,
+                "throttled": self.throttled,
+                "retried": self.retried,
+                "failed": self.failed
+            }
+
+
+# One scheduler per provider, shared by every thread and coroutine of a run
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def configure_scheduler(name: str, rpm: float = None, tpm: float = None, max_retries: int = DEFAULT_MAX_RETRIES) -> ProviderScheduler:
+    """
+    Creates (or replaces) the scheduler for a provider.
+    """
+    scheduler = ProviderScheduler(name, rpm=rpm, tpm=tpm, max_retries=max_retries)
+    with _schedulers_lock:
+        _schedulers[name] = scheduler
+    return scheduler
+
+
+def get_scheduler(name: str) -> ProviderScheduler:
+    """
+    Returns the scheduler for a provider. Unconfigured providers get retries but no budgets.
+    """
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = ProviderScheduler(name)
+        return _schedulers[name]
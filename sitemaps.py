@@ -0,0 +1,100 @@
+import gzip
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+
+from http_client import DEFAULT_TIMEOUT, get_session, get_text
+
+# Sitemap files read per index, counting the children of sitemap indexes
+MAX_SITEMAPS = 50
+
+
+def _local_name(tag: str) -> str:
+    """
+    Drops the XML namespace from a tag: "{http://www.sitemaps.org/...}loc" -> "loc".
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def find_sitemap_urls(index_url: str) -> list:
+    """
+    Lists the sitemaps of the index's site: the `Sitemap:` lines of robots.txt, or /sitemap.xml.
+
+    Returns:
+        list: Sitemap URLs.
+    """
+    sitemaps = []
+    try:
+        robots = get_text(urljoin(index_url, "/robots.txt"))
+        for line in robots.splitlines():
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sitemap" and value.strip():
+                sitemaps.append(value.strip())
+    except Exception as e:
+        print(f"No robots.txt for {index_url}: {e}")
+    return sitemaps or [urljoin(index_url, "/sitemap.xml")]
+
+
+def _iter_sitemap_file(sitemap_url: str):
+    """
+    Streams one sitemap file with iterparse, so large files are never held in memory.
+
+    Yields:
+        tuple: ("url", loc, lastmod) for pages, ("sitemap", loc, lastmod) for children of a sitemap index.
+    """
+    with get_session().get(sitemap_url, timeout=DEFAULT_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        source = response.raw
+        if sitemap_url.endswith(".gz"):
+            source = gzip.GzipFile(fileobj=source)
+
+        loc = lastmod = None
+        root = None
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            name = _local_name(element.tag)
+            if name == "loc":
+                loc = (element.text or "").strip()
+            elif name == "lastmod":
+                lastmod = (element.text or "").strip()
+            elif name in ("url", "sitemap"):
+                if loc:
+                    yield "url" if name == "url" else "sitemap", loc, lastmod
+                loc = lastmod = None
+                # Free finished entries as we go, and drop them from the root too
+                element.clear()
+                root.clear()
+
+
+def iter_links_from_sitemaps(sitemap_urls: list, max_sitemaps: int = MAX_SITEMAPS):
+    """
+    Yields page URLs from sitemaps, following sitemap indexes depth-first.
+
+    Args:
+        sitemap_urls (list): Sitemaps to start from (see find_sitemap_urls).
+        max_sitemaps (int): Stop after reading this many sitemap files.
+
+    Yields:
+        tuple: (page URL, lastmod or None)
+    """
+    stack = list(reversed(sitemap_urls))
+    seen = set()
+    while stack and len(seen) < max_sitemaps:
+        sitemap_url = stack.pop()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+
+        children = []
+        try:
+            for kind, loc, lastmod in _iter_sitemap_file(sitemap_url):
+                if kind == "url":
+                    yield loc, lastmod
+                else:
+                    children.append(loc)
+        except Exception as e:
+            print(f"Failed to read sitemap {sitemap_url}: {e}")
+        stack.extend(reversed(children))
@@ -0,0 +1,97 @@
+"""
+Shared fixtures: the benchmark stand-in server (benchmarks/standins.py) in place of Jina, OpenAI and
+Google Drive, and a whitespace tokenizer in place of cl100k_base, so the tests need no network or API keys.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+sys.path.insert(0, ROOT_DIR)
+
+from standins import StandInServer  # noqa: E402
+
+# The pipeline reads the stand-in URLs when it is imported, so the server starts before any test imports it
+STANDINS = StandInServer(articles=3).start()
+os.environ.update(STANDINS.env())
+
+
+class WordEncoder:
+    """
+    Tokenizer with the part of tiktoken's interface the chunkers use: one token per whitespace-separated word.
+    """
+
+    def __init__(self):
+        self.words = []
+        self.ids = {}
+
+    def encode(self, text: str) -> list:
+        tokens = []
+        for word in text.split():
+            if word not in self.ids:
+                self.ids[word] = len(self.words)
+                self.words.append(word)
+            tokens.append(self.ids[word])
+        return tokens
+
+    def encode_batch(self, texts: list) -> list:
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: list) -> str:
+        return " ".join(self.words[token] for token in tokens)
+
+    def decode_bytes(self, tokens: list) -> bytes:
+        return self.decode(tokens).encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def word_encoder(monkeypatch):
+    import markdown_chunker
+    import pdf_chunker
+
+    encoder = WordEncoder()
+    monkeypatch.setattr(pdf_chunker, "get_encoder", lambda: encoder)
+    monkeypatch.setattr(markdown_chunker, "get_encoder", lambda: encoder)
+    return encoder
+
+
+@pytest.fixture
+def standins(tmp_path):
+    """
+    The stand-in server, serving the PDFs written to `standins.drive_dir` as Drive files.
+    """
+    STANDINS.drive_dir = str(tmp_path / "drive")
+    os.makedirs(STANDINS.drive_dir)
+    yield STANDINS
+    STANDINS.drive_dir = None
+
+
+@pytest.fixture
+def recorded_urls(standins) -> list:
+    """
+    URLs of the canned Jina pages (benchmarks/data/responses.json).
+    """
+    from fixtures import load_responses
+
+    return [standins.base_url + path for path in load_responses()["jina"]]
+
+
+@pytest.fixture
+def run_ingestion(tmp_path):
+    """
+    Runs main.py's job in this process: `run_ingestion(argv)` returns run_job's result.
+    """
+    from cli import parse_args
+    from main import Runtime, prepare_job, run_job
+
+    def run(argv: list) -> dict:
+        args, journal = prepare_job(parse_args(["--team_id", "team", "--user_id", "user",
+                                                "--cache_dir", str(tmp_path / "cache"), *argv]))
+        runtime = Runtime(args)
+        try:
+            return run_job(args, runtime, journal)
+        finally:
+            runtime.close()
+    return run
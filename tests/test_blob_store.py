@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+import pytest
+
+import blob_store
+from blob_store import BlobStore
+from fixtures import write_pdf
+
+
+@pytest.fixture
+def store(tmp_path, standins, monkeypatch):
+    monkeypatch.setattr(blob_store, "GDRIVE_DOWNLOAD_URL", standins.base_url + "/uc?id={file_id}")
+    store = BlobStore(str(tmp_path / "blobs"))
+    yield store
+    store.close()
+
+
+def drive_file(standins, file_id: str, seed: int = 1) -> bytes:
+    path = write_pdf(os.path.join(standins.drive_dir, f"{file_id}.pdf"), 2, seed=seed)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_interrupted_download_resumes_from_the_partial_file(store, standins, capsys):
+    data = drive_file(standins, "report")
+    with open(os.path.join(store.partial_dir, "report.part"), "wb") as f:
+        f.write(data[:1000])
+
+    path = store.fetch("report")
+
+    # The 206 continues the partial file, and the blob is named after the whole file's hash
+    assert "Resuming Drive download report at 1000 bytes" in capsys.readouterr().out
+    assert read(path) == data
+    assert os.path.basename(path) == hashlib.sha256(data).hexdigest() + ".pdf"
+    assert os.listdir(store.partial_dir) == []
+
+
+def test_stored_file_is_reused_until_it_changes(store, standins):
+    data = drive_file(standins, "report", seed=1)
+    first = store.fetch("report")
+    assert (store.downloaded, store.reused) == (1, 0)
+
+    # Unchanged: the conditional request is answered with a 304
+    assert store.fetch("report") == first
+    assert (store.downloaded, store.reused) == (1, 1)
+    assert read(first) == data
+
+    changed = drive_file(standins, "report", seed=2)
+    second = store.fetch("report")
+    assert (store.downloaded, store.reused) == (2, 1)
+    assert second != first
+    assert read(second) == changed
+
+
+def test_gc_removes_unused_blobs_and_stale_partial_files(store, standins):
+    drive_file(standins, "report")
+    path = store.fetch("report")
+    partial = os.path.join(store.partial_dir, "other.part")
+    with open(partial, "wb") as f:
+        f.write(b"%PDF-")
+    old = os.path.getmtime(partial) - 10
+    os.utime(partial, (old, old))
+
+    # Recently used blobs and partial files are kept
+    assert store.gc(max_age_seconds=60) == 0
+    assert os.path.exists(path) and os.path.exists(partial)
+
+    assert store.gc(max_age_seconds=0) == 2
+    assert not os.path.exists(path) and not os.path.exists(partial)
+    # The file is downloaded again on its next use
+    assert os.path.exists(store.fetch("report"))
+    assert store.downloaded == 2
@@ -0,0 +1,91 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from content_fetcher import FeedHints, extract_article_links, iter_links_from_rss, iter_links_from_sitemap
+from disk_cache import DiskCache
+from http_client import configure_http_cache
+
+
+def test_index_answering_an_error_still_reaches_the_sitemaps(standins):
+    # The site root is a 404 on the stand-in, but robots.txt points at its sitemaps
+    links = extract_article_links(standins.base_url + "/")
+    assert sorted(links) == [f"{standins.base_url}/sitemap/posts/post-{i}" for i in range(3)]
+
+
+FEED = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0"><channel><title>Café notes</title>
+<item><title>Café</title><link>{base}/posts/cafe</link><author>José</author></item>
+</channel></rss>""".encode("utf-8")
+
+
+@pytest.fixture
+def xml_server():
+    """
+    Serves the XML documents in `server.pages` (path -> bytes, "{base}" replaced by the server URL)
+    as text/xml without a charset, with an ETag.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            page = self.server.pages.get(self.path)
+            if page is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = f'"{self.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = page.replace(b"{base}", self.server.base_url.encode())
+            # No charset: requests would decode the body as ISO-8859-1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.pages = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_feed_follows_its_xml_encoding_declaration(tmp_path, xml_server):
+    xml_server.pages["/feed"] = FEED
+    # The second read is a 304 served from the stored copy
+    configure_http_cache(DiskCache(str(tmp_path / "http.sqlite3"), ttl_seconds=None))
+    try:
+        for _ in range(2):
+            hints = FeedHints()
+            links = list(iter_links_from_rss(xml_server.base_url + "/feed", feed_hints=hints))
+            assert links == [xml_server.base_url + "/posts/cafe"]
+            assert hints.author(links[0]) == "José"
+    finally:
+        configure_http_cache(None)
+
+
+def sitemap(paths: list) -> bytes:
+    urls = "".join(f"<url><loc>{{base}}{path}</loc></url>" for path in paths)
+    return f'<?xml version="1.0" encoding="utf-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+
+@pytest.mark.parametrize("index_path", ["/blog/", "/"])
+def test_sitemap_listing_pages_are_not_articles(xml_server, index_path):
+    articles = ["/blog/system-design-primer", "/blog/2023/05/negotiating"]
+    listings = ["/blog/tag/interviews", "/blog/category/career", "/blog/page/2", "/blog/2", "/blog/author/jane", "/blog/feed"]
+    xml_server.pages["/sitemap.xml"] = sitemap(articles + listings)
+
+    links = list(iter_links_from_sitemap(xml_server.base_url + index_path))
+
+    assert links == [xml_server.base_url + path for path in articles]
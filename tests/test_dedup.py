@@ -0,0 +1,57 @@
+import random
+
+from dedup import Deduplicator, estimated_similarity, minhash_signature
+from job_journal import ENRICHED, FETCHED, WRITTEN, JobJournal
+
+WORDS = [f"word{i}" for i in range(3000)]
+
+
+def page(seed: int, length: int = 2000) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def test_signature_similarity_tracks_shared_text():
+    text = page(1)
+    edited = text.rsplit(" ", 40)[0] + " " + " ".join(["edited"] * 40)
+    assert estimated_similarity(minhash_signature(text), minhash_signature(text)) == 1.0
+    assert estimated_similarity(minhash_signature(text), minhash_signature(edited)) > 0.9
+    assert estimated_similarity(minhash_signature(text), minhash_signature(page(2))) < 0.1
+
+
+def test_near_duplicate_pages_and_urls_are_claimed_once():
+    dedup = Deduplicator()
+    text = page(3)
+    assert dedup.claim_url("https://example.com/post?utm_source=feed")
+    assert not dedup.claim_url("http://example.com/post/")
+    assert dedup.claim_content("https://example.com/post", text)
+    assert not dedup.claim_content("https://mirror.example.org/post", text + " footer")
+    assert dedup.claim_content("https://example.com/other", page(4))
+    assert (dedup.duplicate_urls, dedup.duplicate_pages) == (1, 1)
+
+
+def test_resumed_job_remembers_the_articles_it_already_fetched(tmp_path):
+    from main import seed_dedup_from_journal
+
+    journal = JobJournal(str(tmp_path / "job"))
+    fetched, enriched, chunked = page(5), page(6), page(7)
+    key = journal.add("url", "https://example.com/fetched")[0]
+    journal.mark(key, FETCHED, {"markdown": fetched, "url": "https://example.com/fetched", "requested_url": "https://example.com/fetched"})
+    key = journal.add("url", "https://example.com/enriched")[0]
+    journal.mark(key, ENRICHED, {"content": enriched, "source_url": "https://example.com/enriched"})
+    journal.mark(key, WRITTEN)
+    key = journal.add("url", "https://example.com/chunked")[0]
+    halves = chunked.split(" ", 1000)
+    journal.mark(key, ENRICHED, [{"content": " ".join(halves[:1000]), "source_url": "https://example.com/chunked"},
+                                 {"content": halves[1000], "source_url": "https://example.com/chunked"}])
+    journal.add("url", "https://example.com/pending")
+
+    dedup = Deduplicator()
+    assert seed_dedup_from_journal(journal, dedup) == 3
+    journal.close()
+
+    for url in ("http://example.com/fetched/", "https://example.com/enriched?utm_source=feed", "https://example.com/chunked"):
+        assert not dedup.claim_url(url)
+    assert dedup.claim_url("https://example.com/pending")
+    for text in (fetched, enriched, chunked):
+        assert not dedup.claim_content("https://mirror.example.org/post", text)
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from fixtures import write_pdf
+from kb_reader import iter_items
+from output_writer import count_items
+
+FORMATS = ["ndjson", "json", "ndjson.zst", "parquet"]
+
+
+def pdf_chunk_ids(fmt: str, path: str) -> set:
+    return {item["chunk_id"] for item in iter_items(path, fmt=fmt) if not item.get("source_url")}
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_incremental_runs_skip_unchanged_inputs_and_replace_changed_ones(tmp_path, recorded_urls, run_ingestion, fmt, engine):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    if fmt == "ndjson.zst":
+        pytest.importorskip("zstandard")
+
+    pdf = write_pdf(str(tmp_path / "report.pdf"), 3, seed=1)
+    out = str(tmp_path / f"kb.{fmt}")
+    argv = ["--pdfs", pdf, "--urls", *recorded_urls[:2], "--format", fmt, "--out", out, "--engine", engine,
+            "--incremental", "--state_dir", str(tmp_path / "state")]
+
+    first = run_ingestion(argv)
+    total = count_items(fmt, out)
+    old_chunks = pdf_chunk_ids(fmt, out)
+    assert first["items"] == total > 2
+    assert old_chunks
+
+    # Nothing changed: nothing is fetched, enriched or written again
+    assert run_ingestion(argv)["items"] == 0
+    assert count_items(fmt, out) == total
+
+    # A new version of the PDF takes the place of the old one's chunks
+    write_pdf(pdf, 3, seed=2)
+    assert run_ingestion(argv)["items"] > 0
+    new_chunks = pdf_chunk_ids(fmt, out)
+    assert new_chunks and not new_chunks & old_chunks
+    assert count_items(fmt, out) == total - len(old_chunks) + len(new_chunks)
+
+
+def test_unchanged_pdf_is_not_parsed_again(tmp_path, run_ingestion, monkeypatch):
+    import main
+
+    pdf = write_pdf(str(tmp_path / "report.pdf"), 2)
+    argv = ["--pdfs", pdf, "--format", "ndjson", "--out", str(tmp_path / "kb.ndjson"),
+            "--incremental", "--state_dir", str(tmp_path / "state")]
+    run_ingestion(argv)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("an unchanged PDF was parsed")
+    monkeypatch.setattr(main, "handle_pdf_input", fail)
+    assert run_ingestion(argv)["items"] == 0
+    assert os.path.getsize(tmp_path / "kb.ndjson") > 0
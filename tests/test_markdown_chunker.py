@@ -0,0 +1,44 @@
+import pytest
+
+from markdown_chunker import iter_markdown_chunks
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_heading_opens_the_first_window_of_an_oversized_block():
+    markdown = f"# A\n\n{words('intro', 30)}\n\n## B\n\n{words('w', 250)}\n\ntail paragraph"
+
+    chunks = list(iter_markdown_chunks(markdown, chunk_size=100))
+
+    assert all(text.strip() != "## B" for text, _ in chunks)
+    assert chunks[0] == (f"# A\n\n{words('intro', 30)}", "A")
+    text, section = chunks[1]
+    assert text.startswith("## B\n\nw0 w1 ")
+    assert section == "A > B"
+    assert chunks[-1][0].endswith("tail paragraph")
+
+
+@pytest.mark.parametrize("chunk_size, markdown", [
+    (120, "# Guide\n\n" + "\n\n".join(f"## Part {i}\n\n{words(f'p{i}x', 40)}\n\n{words(f'p{i}y', 75)}" for i in range(6))
+     + f"\n\n```\n{words('code', 300)}\n```"),
+    # A heading that cannot move on with the block it introduces without overflowing the next chunk
+    (100, f"# A\n\n{words('intro', 30)}\n\n## B\n\n{words('w', 99)}"),
+])
+def test_chunks_stay_within_the_token_budget(word_encoder, chunk_size, markdown):
+    chunks = list(iter_markdown_chunks(markdown, chunk_size=chunk_size))
+
+    assert all(len(word_encoder.encode(text)) <= chunk_size for text, _ in chunks)
+    # Every word of the article is in some chunk, in order
+    assert " ".join(text for text, _ in chunks).split() == markdown.split()
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    markdown = "\n\n".join(words(f"para{i}x", 50) for i in range(4))
+
+    chunks = [text for text, _ in iter_markdown_chunks(markdown, chunk_size=80, overlap=10)]
+
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split()[:10] == previous.split()[-10:]
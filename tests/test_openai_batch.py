@@ -0,0 +1,66 @@
+import json
+
+from disk_cache import DiskCache
+from metadata_generator import RESPONSE_PARSERS
+from openai_batch import batch_custom_id, load_batch_results
+from output_writer import count_items
+
+
+def result_line(custom_id: str, content: str, status_code: int = 200) -> str:
+    body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+    return json.dumps({"custom_id": custom_id, "response": {"status_code": status_code, "body": body}}) + "\n"
+
+
+def test_only_parseable_results_are_cached(tmp_path):
+    metadata = json.dumps({"title": "T", "author": "A", "content_type": "blog"})
+    results = tmp_path / "results.jsonl"
+    results.write_text(
+        result_line(batch_custom_id("generate_metadata", "good"), metadata)
+        + result_line(batch_custom_id("generate_metadata", "malformed"), "Sorry, I can't help with that.")
+        + result_line("legacy-key", metadata)
+        + result_line(batch_custom_id("unknown_function", "other"), metadata)
+        + result_line(batch_custom_id("generate_metadata", "error"), metadata, status_code=500),
+        encoding="utf-8"
+    )
+    cache = DiskCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=None)
+
+    assert load_batch_results(str(results), cache, RESPONSE_PARSERS) == (1, 4)
+    assert cache.get("good") == metadata
+    for key in ("malformed", "legacy-key", "other", "error"):
+        assert cache.get(key) is None
+
+
+def test_deferred_requests_are_written_by_the_results_run(tmp_path, standins, recorded_urls, run_ingestion):
+    out = str(tmp_path / "kb.ndjson")
+    requests_path = tmp_path / "batch.jsonl"
+    argv = ["--urls", *recorded_urls[:2], "--format", "ndjson", "--out", out]
+
+    # Requests go to the batch file; no fallback items are written for them
+    assert run_ingestion([*argv, "--openai_batch_out", str(requests_path)])["items"] == 0
+    requests = [json.loads(line) for line in requests_path.read_text(encoding="utf-8").splitlines()]
+    assert requests
+
+    results = tmp_path / "results.jsonl"
+    with open(results, "w", encoding="utf-8") as f:
+        for request in requests:
+            answer = standins.completion(request["body"])["choices"][0]["message"]["content"]
+            f.write(result_line(request["custom_id"], answer))
+
+    openai_calls = standins.stats()["requests"].get("openai", 0)
+    assert run_ingestion([*argv, "--openai_batch_results", str(results)])["items"] == 2
+    assert standins.stats()["requests"].get("openai", 0) == openai_calls
+    assert count_items("ndjson", out) == 2
+
+
+def test_results_are_parsed_as_literals_only(tmp_path):
+    marker = tmp_path / "executed"
+    payload = f"__import__('pathlib').Path({str(marker)!r}).touch()"
+    results = tmp_path / "results.jsonl"
+    results.write_text(result_line(batch_custom_id("generate_metadata", "evil"), payload)
+                       + result_line(batch_custom_id("generate_metadata", "python"), "{'title': 'T', 'content_type': 'blog'}"),
+                       encoding="utf-8")
+    cache = DiskCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=None)
+
+    assert load_batch_results(str(results), cache, RESPONSE_PARSERS) == (1, 1)
+    assert not marker.exists()
+    assert cache.get("python") is not None
@@ -0,0 +1,15 @@
+from url_utils import canonical_url_key, strip_tracking_params
+
+
+def test_tracking_parameters_are_removed_and_the_rest_kept_as_written():
+    url = "https://example.com/search?q&term=system%20design&utm_source=feed&fbclid=abc&ref=home"
+    assert strip_tracking_params(url) == "https://example.com/search?q&term=system%20design&ref=home"
+
+
+def test_url_without_tracking_parameters_is_unchanged():
+    url = "https://example.com/post?page=2&sort=new#comments"
+    assert strip_tracking_params(url) == url
+
+
+def test_spellings_of_the_same_page_share_a_key():
+    assert canonical_url_key("http://Example.com:80/post/?utm_medium=email") == canonical_url_key("https://example.com/post")
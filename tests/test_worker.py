@@ -0,0 +1,71 @@
+import json
+import sqlite3
+
+import pytest
+
+import metadata_generator
+import worker as worker_module
+from worker import DONE, Worker
+
+
+@pytest.fixture
+def worker(tmp_path):
+    # No LLM cache, so every job asks the OpenAI stand-in itself
+    args = worker_module.parse_args(["serve", "--queue", str(tmp_path / "jobs.sqlite3"), "--no-cache",
+                                     "--cache_dir", str(tmp_path / "cache"), "--worker_jobs", "1"])
+    worker = Worker(args)
+    worker.warm_up()
+    yield worker
+    worker.runtime.close()
+    worker.queue.close()
+
+
+def test_async_jobs_in_turn_each_get_a_working_openai_client(tmp_path, worker, recorded_urls):
+    outputs = []
+    for i in range(3):
+        out = tmp_path / f"team{i}.ndjson"
+        outputs.append(out)
+        worker.submit(["--team_id", f"team{i}", "--user_id", "user", "--urls", recorded_urls[i],
+                       "--engine", "async", "--format", "ndjson", "--out", str(out)])
+
+    # Each job runs its own event loop, one after the other on the same worker
+    while worker.run_next():
+        pass
+
+    jobs = worker.queue.recent()
+    assert [job["state"] for job in jobs] == [DONE] * 3
+    for out in outputs:
+        items = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+        # The stand-in's answer, not the fallback metadata of a failed call
+        assert [item["author"] for item in items] == ["interviewing.io"]
+    # Clients are closed with the loop they belong to
+    assert metadata_generator._async_clients == {}
+
+
+def test_job_asking_for_a_different_worker_setting_is_rejected(worker):
+    with pytest.raises(ValueError, match="worker setting"):
+        worker.submit(["--team_id", "t", "--user_id", "u", "--urls", "https://example.com/post", "--cache_ttl_hours", "1"])
+
+
+def test_envelope_needs_an_ndjson_output(worker):
+    with pytest.raises(ValueError, match="--envelope"):
+        worker.submit(["--team_id", "t", "--user_id", "u", "--urls", "https://example.com/post",
+                       "--format", "json", "--envelope", "final.json"])
+
+
+def test_queue_errors_do_not_end_a_job_slot(worker, monkeypatch):
+    calls = []
+
+    def run_next():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        worker._stop.set()
+        return True
+    monkeypatch.setattr(worker_module, "POLL_SECONDS", 0.01)
+    monkeypatch.setattr(worker, "run_next", run_next)
+
+    # Returns only once the slot was asked to stop, after claiming again
+    worker._loop()
+
+    assert len(calls) == 2
@@ -0,0 +1,73 @@
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode, unquote_plus
+
+# Ports that are implied by the scheme and can be dropped
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "ref_src"}
+TRACKING_PREFIXES = ("utm_",)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so trivially different spellings of the same page compare equal.
+
+    - Lowercases the scheme and host, and drops default ports.
+    - Drops the #fragment and a trailing slash on the path.
+    - Sorts query parameters.
+
+    Args:
+        url (str): URL to normalize.
+
+    Returns:
+        str: Normalized URL.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+
+    # Keep non-default ports only
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parsed.port}"
+
+    path = parsed.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+
+    return urlunparse((scheme, host, path, parsed.params, query, ""))
+
+
+def strip_tracking_params(url: str) -> str:
+    """
+    Removes utm_* and other click-tracking query parameters, keeping every other parameter byte for byte
+    as written (no re-encoding, so `?q` stays `?q` and `%20` stays `%20`).
+
+    Args:
+        url (str): URL to clean.
+
+    Returns:
+        str: URL without tracking parameters.
+    """
+    parsed = urlparse(url.strip())
+    query = []
+    for pair in parsed.query.split("&"):
+        key = unquote_plus(pair.split("=", 1)[0]).lower()
+        if pair and key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES):
+            query.append(pair)
+    return urlunparse(parsed._replace(query="&".join(query)))
+
+
+def canonical_url_key(url: str) -> str:
+    """
+    Identity of the page a URL points to, used to deduplicate URLs from different sources:
+    normalized, without tracking parameters, and with http and https treated as the same page.
+
+    Args:
+        url (str): URL to identify.
+
+    Returns:
+        str: Canonical key.
+    """
+    key = normalize_url(strip_tracking_params(url))
+    if key.startswith("http://"):
+        key = "https://" + key[len("http://"):]
+    return key
@@ -0,0 +1,486 @@
+"""
+Long-running ingestion worker with a local job queue.
+
+The worker builds the caches, API clients, tokenizer, HTTP session and pools once and runs every
+submitted job with them, so small per-team jobs skip the startup cost of `python main.py`. All jobs
+share the worker's Jina/OpenAI budgets, and up to --worker_jobs of them run at once.
+
+Jobs take the same arguments as main.py. Settings that configure the process rather than a job
+(caches, budgets, chunking, local metadata, profiling; see cli.RUNTIME_SETTINGS) come from the
+worker's own command line.
+
+Jobs go into a SQLite queue, either through the localhost HTTP API or written to the queue file directly:
+    POST /jobs {"argv": [...]}   queue a job, answers {"id": ...}
+    GET  /jobs                   recent jobs
+    GET  /jobs/<id>              state and result of one job
+    GET  /stats                  queue counts, scheduler stats and run metrics
+
+Usage:
+    python worker.py serve --port 8700 --worker_jobs 4 --local_metadata on
+    python worker.py submit -- --team_id t1 --user_id u1 --urls https://example.com/blog/post --out t1.ndjson --format ndjson
+    python worker.py status 3
+"""
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cli import RUNTIME_SETTINGS, build_parser, check_args
+
+# States of a queued job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_QUEUE_PATH = os.path.join(".worker", "jobs.sqlite3")
+DEFAULT_PORT = 8700
+
+# Seconds between checks for jobs written to the queue file by other processes
+POLL_SECONDS = 1.0
+
+# Jobs listed by GET /jobs and `status` without a job ID
+RECENT_JOBS = 50
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue, shared by the worker and any process submitting to the same file.
+
+    A job is queued with its argument list and claimed by one worker thread at a time. When several
+    jobs wait, one from a team with nothing running goes first, so a large backfill of one team does
+    not hold up the others. Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, team_id TEXT, argv TEXT NOT NULL, out TEXT, state TEXT NOT NULL, "
+                "submitted_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+
+    def submit(self, argv: list, team_id: str = None, out: str = None) -> int:
+        """
+        Queues a job.
+
+        Returns:
+            int: Job ID.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (team_id, argv, out, state, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (team_id, json.dumps(argv), out, QUEUED, time.time())
+            )
+        return cursor.lastrowid
+
+    def claim(self) -> tuple | None:
+        """
+        Moves the next job to RUNNING.
+
+        Returns:
+            tuple: (job ID, argument list), or None if nothing is queued.
+        """
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two workers never claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, argv FROM jobs WHERE state = ? "
+                    "ORDER BY team_id IN (SELECT team_id FROM jobs WHERE state = ? AND team_id IS NOT NULL), id LIMIT 1",
+                    (QUEUED, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET state = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def finish(self, job_id: int, result: dict):
+        self._set_final(job_id, DONE, json.dumps(result), None)
+
+    def fail(self, job_id: int, error: str):
+        self._set_final(job_id, FAILED, None, error)
+
+    def _set_final(self, job_id: int, state: str, result: str | None, error: str | None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                (state, time.time(), result, error, job_id)
+            )
+
+    def requeue_running(self) -> int:
+        """
+        Puts jobs left RUNNING by a worker that was killed back in the queue.
+
+        Returns:
+            int: Number of jobs requeued.
+        """
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET state = ?, started_at = NULL WHERE state = ?", (QUEUED, RUNNING))
+        return cursor.rowcount
+
+    def active_outputs(self) -> set:
+        """
+        Output paths of queued and running jobs.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT out FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return {row[0] for row in rows if row[0]}
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def recent(self, limit: int = RECENT_JOBS) -> list:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def counts(self) -> dict:
+        """
+        Number of jobs in each state.
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_JOB_FIELDS = ("id", "team_id", "argv", "out", "state", "submitted_at", "started_at", "finished_at", "result", "error")
+
+
+def _job_dict(row: tuple) -> dict:
+    job = dict(zip(_JOB_FIELDS, row))
+    job["argv"] = json.loads(job["argv"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+def _raise_value_error(message: str = None, *args):
+    raise ValueError(message or "invalid arguments")
+
+
+def parse_job_args(argv: list, worker_args=None) -> argparse.Namespace:
+    """
+    Parses a job's arguments like main.py does, but raises instead of exiting.
+
+    With `worker_args`, settings in cli.RUNTIME_SETTINGS are taken from the worker; a job
+    asking for a different value than the worker's is rejected.
+
+    Raises:
+        ValueError: If the arguments are invalid.
+    """
+    parser = build_parser()
+    parser.error = _raise_value_error
+    parser.exit = lambda status=0, message=None: _raise_value_error(message)
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    if worker_args is not None:
+        for name in RUNTIME_SETTINGS:
+            value = getattr(args, name)
+            if value != parser.get_default(name) and value != getattr(worker_args, name):
+                raise ValueError(f"--{name} is a worker setting ({getattr(worker_args, name)!r}) and cannot be changed per job")
+            setattr(args, name, getattr(worker_args, name))
+    return args
+
+
+class Worker:
+    """
+    Runs queued jobs with one shared Runtime, --worker_jobs at a time.
+
+    Args:
+        args (argparse.Namespace): Worker options and the RUNTIME_SETTINGS shared by all jobs.
+    """
+
+    def __init__(self, args):
+        # Imported here so `submit` and `status` do not load the whole pipeline
+        from main import Runtime
+
+        self.args = args
+        self.queue = JobQueue(args.queue)
+        self.runtime = Runtime(args)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def warm_up(self):
+        """
+        Loads what the first job would otherwise pay for: the tokenizer, the pooled HTTP session and
+        the OpenAI client (with the openai import). AsyncOpenAI clients belong to each job's event loop,
+        so they are created by the jobs themselves.
+        """
+        from http_client import get_session
+        from metadata_generator import get_client
+        from pdf_chunker import get_encoder
+
+        get_encoder()
+        get_session()
+        # Without a key the client cannot be built; jobs that need the LLM report it themselves
+        if os.getenv("OPENAI_API_KEY"):
+            get_client()
+
+    def submit(self, argv: list) -> int:
+        """
+        Validates a job and queues it.
+
+        Raises:
+            ValueError: If the arguments are invalid, or another unfinished job writes the same output.
+        """
+        args = parse_job_args(argv, self.args)
+        if not args.resume and args.out in self.queue.active_outputs():
+            raise ValueError(f"Another queued or running job writes to {args.out}")
+        job_id = self.queue.submit(argv, args.team_id, args.out)
+        self._wake.set()
+        return job_id
+
+    def stats(self) -> dict:
+        from metrics import get_metrics
+
+        return {
+            "jobs": self.queue.counts(),
+            "schedulers": {scheduler.name: scheduler.stats() for scheduler in self.runtime.schedulers},
+            "metrics": get_metrics().snapshot()
+        }
+
+    def run_next(self) -> bool:
+        """
+        Claims and runs one job.
+
+        Returns:
+            bool: False if the queue was empty.
+        """
+        from main import prepare_job, run_job
+        from metrics import get_metrics
+
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, argv = claimed
+        print(f"Job {job_id} started: {' '.join(argv)}")
+        try:
+            args, journal = prepare_job(parse_job_args(argv, self.args))
+            # A resumed job's stored settings give way to the worker's too
+            for name in RUNTIME_SETTINGS:
+                setattr(args, name, getattr(self.args, name))
+            result = run_job(args, self.runtime, journal)
+        except (Exception, SystemExit) as e:
+            print(f"Job {job_id} failed: {e}")
+            self.queue.fail(job_id, str(e))
+            return True
+
+        self.queue.finish(job_id, result)
+        print(f"Job {job_id} finished: {result['items']} items in {result['seconds']}s")
+        if self.args.metrics_out:
+            get_metrics().export(self.args.metrics_out)
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_next()
+            except Exception as e:
+                # Queue errors (e.g. "database is locked") must not end this job slot
+                print(f"Worker slot error, retrying: {e}")
+                self._stop.wait(POLL_SECONDS)
+                continue
+            if not ran:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+
+    def start(self):
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f" Requeued {requeued} jobs left running by a previous worker")
+        self.warm_up()
+        for _ in range(self.args.worker_jobs):
+            thread = threading.Thread(target=self._loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Lets running jobs finish, then shuts the runtime down.
+        """
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self.runtime.close()
+        self.queue.close()
+
+
+def _handler_for(worker: Worker):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/jobs":
+                self._send(200, {"jobs": worker.queue.recent()})
+            elif path.startswith("/jobs/") and path[len("/jobs/"):].isdigit():
+                job = worker.queue.get(int(path[len("/jobs/"):]))
+                if job is None:
+                    self._send(404, {"error": "no such job"})
+                else:
+                    self._send(200, job)
+            elif path == "/stats":
+                self._send(200, worker.stats())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                argv = request.get("argv")
+                if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                    raise ValueError('Expected {"argv": [...]} with the job\'s command line arguments')
+                job_id = worker.submit(argv)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(201, {"id": job_id, "state": QUEUED})
+
+    return Handler
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(args):
+    """
+    Runs the worker and its HTTP API until interrupted (Ctrl+C or SIGTERM).
+    """
+    from metrics import profiled
+
+    worker = Worker(args)
+    server = ThreadingHTTPServer((args.host, args.port), _handler_for(worker))
+    server.daemon_threads = True
+    # SIGTERM stops the worker like Ctrl+C, letting running jobs finish
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    with profiled(args.profile, args.profile_out):
+        worker.start()
+        print(f" Worker listening on http://{args.host}:{server.server_port} with {args.worker_jobs} job slots, queue {args.queue}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(" Stopping: waiting for running jobs to finish")
+        finally:
+            server.server_close()
+            worker.stop()
+    worker.runtime.report()
+
+
+def _request(url: str, data: dict = None) -> dict:
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise SystemExit(json.load(e).get("error", str(e)))
+
+
+def submit(args):
+    """
+    Queues a job through a worker's HTTP API, or straight into the queue file when no --url is given
+    (the worker then checks its settings when the job runs).
+    """
+    argv = args.job_args[1:] if args.job_args[:1] == ["--"] else args.job_args
+    if args.url:
+        response = _request(f"{args.url.rstrip('/')}/jobs", {"argv": argv})
+        print(json.dumps(response))
+        return
+    try:
+        job_args = parse_job_args(argv)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    queue = JobQueue(args.queue)
+    print(json.dumps({"id": queue.submit(argv, job_args.team_id, job_args.out), "state": QUEUED}))
+    queue.close()
+
+
+def status(args):
+    """
+    Prints one job, or the recent jobs, as JSON.
+    """
+    if args.url:
+        path = f"/jobs/{args.job_id}" if args.job_id is not None else "/jobs"
+        print(json.dumps(_request(f"{args.url.rstrip('/')}{path}"), indent=2))
+        return
+    queue = JobQueue(args.queue)
+    if args.job_id is not None:
+        job = queue.get(args.job_id)
+        if job is None:
+            raise SystemExit(f"No job {args.job_id} in {args.queue}")
+        print(json.dumps(job, indent=2))
+    else:
+        print(json.dumps({"jobs": queue.recent()}, indent=2))
+    queue.close()
+
+
+def parse_args(argv: list = None):
+    parser = argparse.ArgumentParser(description="Long-running ingestion worker with a local job queue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", parents=[build_parser(add_help=False)],
+                                       help="Run the worker. Takes main.py's options as the settings shared by all jobs.")
+    serve_parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="SQLite job queue file.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address of the HTTP API (keep it local).")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port of the HTTP API (0 picks a free one).")
+    serve_parser.add_argument("--worker_jobs", type=int, default=2, help="Jobs run at once.")
+
+    submit_parser = commands.add_parser("submit", help="Queue a job: main.py's arguments after --.")
+    submit_parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="SQLite job queue file.")
+    submit_parser.add_argument("--url", help="Submit through this worker's HTTP API instead of the queue file.")
+    submit_parser.add_argument("job_args", nargs=argparse.REMAINDER, help="The job's main.py arguments.")
+
+    status_parser = commands.add_parser("status", help="Show a job, or the recent jobs.")
+    status_parser.add_argument("job_id", type=int, nargs="?", help="Job to show.")
+    status_parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="SQLite job queue file.")
+    status_parser.add_argument("--url", help="Ask this worker's HTTP API instead of reading the queue file.")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        check_args(serve_parser, args, require_team=False)
+    return args
+
+
+def main():
+    args = parse_args()
+    {"serve": serve, "submit": submit, "status": status}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()